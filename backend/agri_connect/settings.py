@@ -4,6 +4,7 @@ from datetime import timedelta
 import os
 from pathlib import Path
 
+from celery.schedules import crontab
 from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
@@ -54,6 +55,7 @@ INSTALLED_APPS = [
     'inventory',
     'analytics',
     'notifications',
+    'reports',
 ]
 
 MIDDLEWARE = [
@@ -158,7 +160,50 @@ if not CORS_ALLOW_ALL_ORIGINS:
     ]
 
 
+CACHE_URL = os.environ.get('CACHE_URL', '')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'agriconnect',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'agriconnect',
+        }
+    }
+
+# Sorted-set store for regional leaderboards; Redis in production, in-process when empty.
+LEADERBOARD_URL = os.environ.get('LEADERBOARD_URL', CACHE_URL)
+
+# Pub/sub feeding the notification event stream: 'postgres' (LISTEN/NOTIFY) or 'local' (in-process only).
+NOTIFICATION_BROKER = os.environ.get('NOTIFICATION_BROKER', 'postgres')
+
+# Days a read notification stays in the inbox before it is archived, per category.
+NOTIFICATION_RETENTION_DAYS = {
+    'system': int(os.environ.get('NOTIFICATION_RETENTION_SYSTEM_DAYS', '90')),
+    'marketplace': int(os.environ.get('NOTIFICATION_RETENTION_MARKETPLACE_DAYS', '60')),
+    'inventory': int(os.environ.get('NOTIFICATION_RETENTION_INVENTORY_DAYS', '90')),
+    'analytics': int(os.environ.get('NOTIFICATION_RETENTION_ANALYTICS_DAYS', '30')),
+}
+NOTIFICATION_ARCHIVE_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_ARCHIVE_RETENTION_DAYS', '730'))
+
+
 EMAIL_BACKEND = os.environ.get('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'False').lower() == 'true'
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', '30'))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'alerts@agriconnect.local')
+# Outbox delivery: messages per minute across all workers (0 disables pacing) and attempts before giving up.
+EMAIL_RATE_LIMIT_PER_MINUTE = int(os.environ.get('EMAIL_RATE_LIMIT_PER_MINUTE', '120'))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '5'))
 
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
@@ -167,6 +212,56 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'False').lower() == 'true'
+CELERY_BEAT_SCHEDULE = {
+    'rebuild-listing-similarities': {
+        'task': 'marketplace.tasks.rebuild_listing_similarities',
+        'schedule': crontab(hour=2, minute=30),
+    },
+    'refresh-listing-fair-prices': {
+        'task': 'marketplace.tasks.refresh_listing_fair_prices',
+        'schedule': crontab(minute=15),
+    },
+    'refresh-farm-metric-rollups': {
+        'task': 'analytics.tasks.refresh_farm_metric_rollups',
+        'schedule': crontab(minute='*/5'),
+    },
+    'detect-farm-metric-anomalies': {
+        'task': 'analytics.tasks.detect_farm_metric_anomalies',
+        'schedule': crontab(minute='*/15'),
+    },
+    'refresh-analytics-warehouse': {
+        'task': 'analytics.tasks.refresh_analytics_warehouse',
+        'schedule': crontab(minute='*/10'),
+    },
+    'prune-analytics-warehouse': {
+        'task': 'analytics.tasks.prune_analytics_warehouse',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'rebuild-region-leaderboards': {
+        'task': 'farms.tasks.rebuild_region_leaderboards',
+        'schedule': crontab(hour=1, minute=30),
+    },
+    'archive-read-notifications': {
+        'task': 'notifications.tasks.archive_read_notifications',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    'fail-stale-broadcasts': {
+        'task': 'notifications.tasks.fail_stale_broadcasts',
+        'schedule': crontab(minute='*/15'),
+    },
+    'deliver-outbound-email': {
+        'task': 'notifications.tasks.deliver_outbound_email',
+        'schedule': crontab(minute='*'),
+    },
+    'purge-expired-report-jobs': {
+        'task': 'reports.tasks.purge_expired_report_jobs',
+        'schedule': crontab(minute=45),
+    },
+    'fail-stale-report-jobs': {
+        'task': 'reports.tasks.fail_stale_report_jobs',
+        'schedule': crontab(minute='*/10'),
+    },
+}
 
 
 SESSION_COOKIE_SECURE = not DEBUG
@@ -35,6 +35,7 @@ api_urlpatterns = [
     path('', include('inventory.urls')),
     path('analytics/', include('analytics.urls')),
     path('', include('notifications.urls')),
+    path('', include('reports.urls')),
     path('auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
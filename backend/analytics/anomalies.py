@@ -0,0 +1,246 @@
+"""Vectorized outlier detection over recent farm metric readings."""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+import numpy as np
+from django.db import transaction
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+from numpy.lib.stride_tricks import sliding_window_view
+
+from farms.models import Farm
+
+from .models import FarmMetric, RollupWatermark
+from .series import epoch_seconds
+from .services import _fold_horizon, _ingest_xid, _unfolded, _watermark_position
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_WATERMARK = 'farm-metric-anomalies'
+_MAD_TO_SIGMA = 1.4826
+
+
+@dataclass(frozen=True)
+class AnomalyConfig:
+    """Tuning knobs for the anomaly job.
+
+    Each new reading is compared with up to ``window`` preceding readings of
+    its series (at least ``min_history``). Scores are robust z-scores, the
+    deviation from the rolling median over 1.4826 x MAD, with the scale
+    floored at ``min_scale`` (the storage resolution) so flat series still
+    flag sudden jumps.
+    """
+
+    lookback: timedelta = timedelta(days=30)
+    alert_window: timedelta = timedelta(days=1)
+    window: int = 48
+    min_history: int = 8
+    threshold: float = 3.5
+    min_scale: float = 0.01
+    score_chunk_size: int = 50_000
+    fetch_chunk_size: int = 20_000
+
+
+def robust_scores(
+    values: np.ndarray,
+    series_start: np.ndarray,
+    candidates: np.ndarray,
+    config: AnomalyConfig,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Rolling median/MAD z-scores of ``values[candidates]`` against their own series history.
+
+    ``values`` holds every series back to back in time order and
+    ``series_start[i]`` is the index where the series of row ``i`` begins.
+    History windows are strided views over a NaN-padded copy; slots that
+    belong to an earlier series are masked, so all series are scored in the
+    same array operations, ``score_chunk_size`` candidates at a time.
+    """
+
+    window = config.window
+    padded = np.concatenate((np.full(window, np.nan), values))
+    windows = sliding_window_view(padded, window)
+    offsets = np.arange(window)
+    scores = np.zeros(len(candidates))
+    medians = np.zeros(len(candidates))
+    for low in range(0, len(candidates), config.score_chunk_size):
+        rows = candidates[low:low + config.score_chunk_size]
+        history = windows[rows].copy()
+        median = np.empty(len(rows))
+        mad = np.empty(len(rows))
+        full = rows - series_start[rows] >= window
+        if full.any():
+            # Complete windows need no masking and take the faster non-NaN median.
+            median[full] = np.median(history[full], axis=1)
+            mad[full] = np.median(np.abs(history[full] - median[full, None]), axis=1)
+        if not full.all():
+            partial = history[~full]
+            partial[offsets[None, :] < (series_start[rows[~full]] - rows[~full] + window)[:, None]] = np.nan
+            median[~full] = np.nanmedian(partial, axis=1)
+            mad[~full] = np.nanmedian(np.abs(partial - median[~full, None]), axis=1)
+        scale = np.maximum(_MAD_TO_SIGMA * mad, config.min_scale)
+        scores[low:low + len(rows)] = (values[rows] - median) / scale
+        medians[low:low + len(rows)] = median
+    return scores, medians
+
+
+def _load_recent(since, config: AnomalyConfig):
+    """Fetch recent readings ordered by series and time into column arrays."""
+
+    rows = (
+        FarmMetric.objects.filter(recorded_at__gte=since)
+        .annotate(
+            reading=Cast('value', FloatField()), epoch=Cast(epoch_seconds('recorded_at'), FloatField()), xid=_ingest_xid()
+        )
+        .order_by('farm_id', 'metric_type', 'recorded_at', 'id')
+        .values_list('id', 'xid', 'farm_id', 'metric_type', 'reading', 'epoch')
+        .iterator(chunk_size=config.fetch_chunk_size)
+    )
+    metric_codes: dict[str, int] = {}
+    columns: dict[str, list[np.ndarray]] = {'id': [], 'xid': [], 'farm': [], 'metric': [], 'value': [], 'epoch': []}
+    while True:
+        chunk = list(islice(rows, config.fetch_chunk_size))
+        if not chunk:
+            break
+        ids, xids, farms, metric_types, readings, recorded = zip(*chunk)
+        columns['id'].append(np.array(ids, dtype=np.int64))
+        columns['xid'].append(np.array(xids, dtype=np.int64))
+        columns['farm'].append(np.array(farms, dtype=np.int64))
+        columns['metric'].append(
+            np.fromiter((metric_codes.setdefault(name, len(metric_codes)) for name in metric_types), dtype=np.int32)
+        )
+        columns['value'].append(np.array(readings, dtype=np.float64))
+        columns['epoch'].append(np.array(recorded, dtype=np.float64))
+    if not columns['id']:
+        return None, []
+    arrays = {name: np.concatenate(parts) for name, parts in columns.items()}
+    return arrays, list(metric_codes)
+
+
+def _series_starts(farms: np.ndarray, metrics: np.ndarray) -> np.ndarray:
+    boundary = np.ones(len(farms), dtype=bool)
+    boundary[1:] = (farms[1:] != farms[:-1]) | (metrics[1:] != metrics[:-1])
+    return np.maximum.accumulate(np.where(boundary, np.arange(len(farms)), 0))
+
+
+def _notify(outliers: list[dict]) -> int:
+    from notifications.models import Notification
+
+    farms = {
+        farm_id: (owner_id, name)
+        for farm_id, owner_id, name in Farm.objects.filter(pk__in={row['farm'] for row in outliers}).values_list(
+            'id', 'owner_id', 'name'
+        )
+    }
+    notifications = []
+    for row in outliers:
+        if row['farm'] not in farms:
+            continue
+        owner_id, farm_name = farms[row['farm']]
+        direction = 'spike' if row['score'] > 0 else 'drop'
+        notifications.append(
+            Notification(
+                recipient_id=owner_id,
+                title=f"Unusual {row['metric_type']} {direction} on {farm_name}",
+                message=(
+                    f"{row['metric_type']} read {row['value']:g} at {timezone.localtime(row['recorded_at']):%Y-%m-%d %H:%M}, "
+                    f"against a recent typical value of {row['median']:g}."
+                ),
+                category='analytics',
+                metadata={
+                    'farm': row['farm'],
+                    'metric': row['metric'],
+                    'metric_type': row['metric_type'],
+                    'value': row['value'],
+                    'median': row['median'],
+                    'score': round(row['score'], 2),
+                },
+            )
+        )
+    Notification.objects.bulk_create(notifications, batch_size=2000)
+    return len(notifications)
+
+
+def _after(arrays: dict, position: tuple[int, int]) -> np.ndarray:
+    """Rows whose ``(ingest_xid, id)`` comes after ``position``."""
+
+    xid, metric_id = position
+    return (arrays['xid'] > xid) | ((arrays['xid'] == xid) & (arrays['id'] > metric_id))
+
+
+def detect_metric_anomalies(config: AnomalyConfig | None = None) -> int:
+    """Score readings added since the last run and notify farm owners of outliers.
+
+    Readings are consumed in ``(ingest_xid, id)`` order up to the same
+    finished-transaction horizon as the rollups (see
+    :func:`analytics.services.refresh_metric_rollups`), so a reading that
+    commits after a higher id is scored by a later run instead of skipped.
+    Only readings past the job's watermark and inside ``alert_window`` are
+    candidates; older readings of the ``lookback`` period only serve as
+    history. Each series raises at most one notification per run, for its
+    most extreme reading. Returns the number of notifications written.
+
+    The range is scored without holding a lock; notifications are written in
+    the short transaction that advances the watermark, and only if no other
+    run advanced it first.
+    """
+
+    config = config or AnomalyConfig()
+    now = timezone.now()
+    horizon = _fold_horizon()
+    watermark, _ = RollupWatermark.objects.get_or_create(name=ANOMALY_WATERMARK)
+    start = _watermark_position(watermark)
+    upper = (
+        _unfolded(start)
+        .annotate(ingest_xid=_ingest_xid())
+        .filter(ingest_xid__lt=horizon)
+        .order_by('-ingest_xid', '-id')
+        .values_list('ingest_xid', 'id')
+        .first()
+    )
+    if upper is None:
+        return 0
+
+    arrays, metric_types = _load_recent(now - config.lookback, config)
+    outliers = []
+    if arrays is not None:
+        starts = _series_starts(arrays['farm'], arrays['metric'])
+        position = np.arange(len(starts)) - starts
+        recent = arrays['epoch'] >= (now - config.alert_window).timestamp()
+        candidates = np.flatnonzero(
+            _after(arrays, start) & ~_after(arrays, upper) & recent & (position >= config.min_history)
+        )
+        scores, medians = robust_scores(arrays['value'], starts, candidates, config)
+        flagged = np.abs(scores) >= config.threshold
+        worst: dict[int, int] = {}
+        for slot in np.flatnonzero(flagged):
+            series = int(starts[candidates[slot]])
+            if series not in worst or abs(scores[slot]) > abs(scores[worst[series]]):
+                worst[series] = slot
+        outliers = [
+            {
+                'farm': int(arrays['farm'][candidates[slot]]),
+                'metric': int(arrays['id'][candidates[slot]]),
+                'metric_type': metric_types[arrays['metric'][candidates[slot]]],
+                'value': float(arrays['value'][candidates[slot]]),
+                'recorded_at': datetime.fromtimestamp(arrays['epoch'][candidates[slot]], tz=dt_timezone.utc),
+                'median': float(medians[slot]),
+                'score': float(scores[slot]),
+            }
+            for slot in worst.values()
+        ]
+        logger.info('Scored %s readings, %s outlier series', len(candidates), len(outliers))
+
+    with transaction.atomic():
+        claimed = RollupWatermark.objects.filter(
+            name=ANOMALY_WATERMARK, last_xid=start[0], last_metric_id=start[1]
+        ).update(last_xid=upper[0], last_metric_id=upper[1], updated_at=now)
+        if not claimed:
+            # A concurrent run scored this range and notified already.
+            return 0
+        return _notify(outliers) if outliers else 0
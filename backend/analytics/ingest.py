@@ -0,0 +1,200 @@
+"""Streaming bulk ingestion of farm metric readings through PostgreSQL ``COPY``."""
+
+from __future__ import annotations
+
+import codecs
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Iterable, Iterator
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from psycopg import sql
+
+from farms.models import Farm
+
+from .models import FarmMetric
+
+INGEST_BATCH_SIZE = 5000
+INGEST_MAX_REPORTED_ERRORS = 100
+INGEST_FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+}
+
+_COPY_FIELDS = ('farm', 'metric_type', 'value', 'unit', 'notes', 'recorded_at')
+_VALUE_LIMIT = Decimal('1e12')
+_CENT = Decimal('0.01')
+
+
+@dataclass
+class IngestReport:
+    received: int = 0
+    inserted: int = 0
+    rejected: int = 0
+    errors: list[dict] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    def reject(self, line: int, message: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < INGEST_MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self) -> dict:
+        return {
+            'received': self.received,
+            'inserted': self.inserted,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'errors_truncated': self.rejected > len(self.errors),
+            'elapsed_seconds': round(self.elapsed_seconds, 3),
+            'rows_per_second': round(self.received / self.elapsed_seconds) if self.elapsed_seconds else None,
+        }
+
+
+def _records(lines: Iterable[str], fmt: str) -> Iterator[tuple[int, object, str | None]]:
+    """Yield ``(line number, record, parse error)`` for every non-blank input row."""
+
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, None, 'Row has more columns than the header.'
+            else:
+                yield reader.line_num, record, None
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line, parse_float=Decimal), None
+        except ValueError:
+            yield number, None, 'Line is not valid JSON.'
+
+
+def _clean(record, default_farm: int | None, now) -> tuple:
+    """Validate one record into a ``COPY`` row, raising ``ValueError`` with a readable reason."""
+
+    if not isinstance(record, dict):
+        raise ValueError('Row must be an object.')
+    try:
+        farm_id = int(record.get('farm') or default_farm)
+    except (TypeError, ValueError):
+        raise ValueError('farm must be a farm id.')
+
+    metric_type = str(record.get('metric_type') or '').strip()
+    if not metric_type or len(metric_type) > 100:
+        raise ValueError('metric_type is required and limited to 100 characters.')
+
+    try:
+        value = Decimal(str(record.get('value')).strip())
+    except InvalidOperation:
+        raise ValueError('value must be a number.')
+    if not value.is_finite() or abs(value) >= _VALUE_LIMIT:
+        raise ValueError('value is out of range.')
+
+    unit = str(record.get('unit') or '').strip()
+    if len(unit) > 32:
+        raise ValueError('unit is limited to 32 characters.')
+
+    recorded_at = now
+    if record.get('recorded_at'):
+        recorded_at = parse_datetime(str(record['recorded_at']).strip())
+        if recorded_at is None:
+            raise ValueError('recorded_at must be an ISO 8601 datetime.')
+        if timezone.is_naive(recorded_at):
+            recorded_at = timezone.make_aware(recorded_at)
+
+    return (
+        farm_id,
+        metric_type,
+        value.quantize(_CENT, rounding=ROUND_HALF_UP),
+        unit,
+        str(record.get('notes') or ''),
+        recorded_at,
+    )
+
+
+def _copy_rows(rows: list[tuple]) -> None:
+    # Each batch commits on its own while other writers insert readings, so
+    # ids here can commit after higher ones. The rollup job orders by the
+    # inserting transaction instead of the id (see refresh_metric_rollups).
+    opts = FarmMetric._meta
+    statement = sql.SQL('COPY {} ({}) FROM STDIN').format(
+        sql.Identifier(opts.db_table),
+        sql.SQL(', ').join(sql.Identifier(opts.get_field(name).column) for name in _COPY_FIELDS),
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        with cursor.cursor.copy(statement) as copy:
+            for row in rows:
+                copy.write_row(row)
+
+
+def _flush(batch: list[tuple[int, tuple]], user, permitted: dict[int, bool], report: IngestReport) -> None:
+    """Check farm ownership once for the farms new to this batch, then ``COPY`` the permitted rows."""
+
+    unseen = {row[0] for _line, row in batch} - permitted.keys()
+    if unseen:
+        farms = Farm.objects.filter(pk__in=unseen)
+        if not user.is_staff:
+            farms = farms.filter(owner=user)
+        allowed = set(farms.values_list('pk', flat=True))
+        permitted.update({farm_id: farm_id in allowed for farm_id in unseen})
+
+    rows = []
+    for line, row in batch:
+        if permitted[row[0]]:
+            rows.append(row)
+        else:
+            report.reject(line, f"You cannot submit metrics for farm {row[0]}.")
+    if rows:
+        _copy_rows(rows)
+        report.inserted += len(rows)
+
+
+def ingest_metrics(
+    stream: Iterable[bytes],
+    fmt: str,
+    *,
+    user,
+    default_farm: int | None = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+) -> IngestReport:
+    """Load NDJSON or CSV readings from a byte-line stream into ``FarmMetric``.
+
+    Rows are validated as they stream in and loaded ``batch_size`` at a time
+    with one ``COPY`` per batch, so memory stays bounded by the batch. Invalid
+    rows and rows for farms the user does not own are skipped and reported by
+    line number without aborting the load.
+    """
+
+    started = time.perf_counter()
+    report = IngestReport()
+    permitted: dict[int, bool] = {}
+    now = timezone.now()
+    batch: list[tuple[int, tuple]] = []
+
+    for line, record, error in _records(codecs.iterdecode(stream, 'utf-8-sig', errors='replace'), fmt):
+        report.received += 1
+        if error:
+            report.reject(line, error)
+            continue
+        try:
+            batch.append((line, _clean(record, default_farm, now)))
+        except ValueError as exc:
+            report.reject(line, str(exc))
+            continue
+        if len(batch) >= batch_size:
+            _flush(batch, user, permitted, report)
+            batch = []
+    if batch:
+        _flush(batch, user, permitted, report)
+
+    report.elapsed_seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,30 @@
+"""Rebuild the farm metric rollup tables from the raw readings."""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analytics.models import RollupWatermark
+from analytics.services import ROLLUP_RESOLUTIONS, ROLLUP_WATERMARK, refresh_metric_rollups
+
+
+class Command(BaseCommand):
+    help = 'Discard the hourly/daily/monthly metric rollups and refold every reading from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            RollupWatermark.objects.update_or_create(name=ROLLUP_WATERMARK, defaults={'last_xid': 0, 'last_metric_id': 0})
+            for model, _kind, _width in ROLLUP_RESOLUTIONS.values():
+                model.objects.all().delete()
+
+        started = time.perf_counter()
+        kwargs = {'batch_size': options['batch_size']} if options['batch_size'] else {}
+        folded = refresh_metric_rollups(**kwargs)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Folded {folded} readings in {elapsed:.1f}s ({folded / max(elapsed, 1e-9):,.0f} readings/s)")
@@ -0,0 +1,41 @@
+"""Load operational changes into the analytics warehouse, optionally from scratch."""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analytics.models import DimCommodity, DimDate, DimFarm, DimField, WarehouseWatermark
+from analytics.warehouse import WAREHOUSE_SOURCES, prune_warehouse, refresh_warehouse
+
+
+class Command(BaseCommand):
+    help = 'Copy changed farms, fields, activities, inventory movements and listings into the warehouse.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Empty the warehouse and reload every row.')
+        parser.add_argument('--prune', action='store_true', help='Also drop rows deleted from the operational tables.')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options['full']:
+            with transaction.atomic():
+                WarehouseWatermark.objects.all().delete()
+                for source in WAREHOUSE_SOURCES.values():
+                    if source.fact is not None:
+                        source.fact.objects.all().delete()
+                for model in (DimField, DimFarm, DimCommodity, DimDate):
+                    model.objects.all().delete()
+
+        started = time.perf_counter()
+        kwargs = {'batch_size': options['batch_size']} if options['batch_size'] else {}
+        loaded = refresh_warehouse(**kwargs)
+        if options['prune']:
+            removed = prune_warehouse()
+            self.stdout.write('Pruned ' + ', '.join(f"{name}: {count}" for name, count in removed.items()))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            'Loaded ' + ', '.join(f"{name}: {count}" for name, count in loaded.items()) + f" in {elapsed:.1f}s"
+        )
@@ -0,0 +1,115 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0005_geohash'),
+        ('analytics', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmMetricDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric_type', models.CharField(max_length=100)),
+                ('bucket', models.DateTimeField()),
+                ('sample_count', models.PositiveIntegerField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('minimum', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('maximum', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'ordering': ['farm', 'metric_type', 'bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='FarmMetricHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric_type', models.CharField(max_length=100)),
+                ('bucket', models.DateTimeField()),
+                ('sample_count', models.PositiveIntegerField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('minimum', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('maximum', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'ordering': ['farm', 'metric_type', 'bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='FarmMetricMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric_type', models.CharField(max_length=100)),
+                ('bucket', models.DateTimeField()),
+                ('sample_count', models.PositiveIntegerField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('minimum', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('maximum', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'ordering': ['farm', 'metric_type', 'bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_metric_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='farmmetric',
+            index=models.Index(fields=['farm', 'metric_type', 'recorded_at'], name='farm_metric_series_idx'),
+        ),
+        migrations.AddField(
+            model_name='farmmetricmonthly',
+            name='farm',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='farms.farm'),
+        ),
+        migrations.AddField(
+            model_name='farmmetrichourly',
+            name='farm',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='farms.farm'),
+        ),
+        migrations.AddField(
+            model_name='farmmetricdaily',
+            name='farm',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='farms.farm'),
+        ),
+        migrations.AddIndex(
+            model_name='farmmetricmonthly',
+            index=models.Index(fields=['metric_type', 'bucket'], name='farmmetricmonthly_type_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='farmmetricmonthly',
+            constraint=models.UniqueConstraint(fields=('farm', 'metric_type', 'bucket'), name='farmmetricmonthly_bucket_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='farmmetrichourly',
+            index=models.Index(fields=['metric_type', 'bucket'], name='farmmetrichourly_type_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='farmmetrichourly',
+            constraint=models.UniqueConstraint(fields=('farm', 'metric_type', 'bucket'), name='farmmetrichourly_bucket_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='farmmetricdaily',
+            index=models.Index(fields=['metric_type', 'bucket'], name='farmmetricdaily_type_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='farmmetricdaily',
+            constraint=models.UniqueConstraint(fields=('farm', 'metric_type', 'bucket'), name='farmmetricdaily_bucket_unique'),
+        ),
+    ]
@@ -0,0 +1,148 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_metric_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DimCommodity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('category', models.CharField(max_length=20)),
+            ],
+            options={
+                'db_table': 'warehouse_dim_commodity',
+                'ordering': ['category', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DimDate',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('year', models.PositiveSmallIntegerField()),
+                ('quarter', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('iso_year', models.PositiveSmallIntegerField()),
+                ('iso_week', models.PositiveSmallIntegerField()),
+                ('day_of_week', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'db_table': 'warehouse_dim_date',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DimFarm',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('owner_id', models.BigIntegerField()),
+                ('name', models.CharField(max_length=255)),
+                ('location', models.CharField(max_length=255)),
+                ('soil_type', models.CharField(max_length=10)),
+                ('irrigation_type', models.CharField(max_length=12)),
+                ('total_area', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_active', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'warehouse_dim_farm',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DimField',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('field_name', models.CharField(max_length=255)),
+                ('field_number', models.PositiveIntegerField()),
+                ('area', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('current_crop', models.CharField(blank=True, max_length=255)),
+                ('is_active', models.BooleanField()),
+                ('farm', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='fields', to='analytics.dimfarm')),
+            ],
+            options={
+                'db_table': 'warehouse_dim_field',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WarehouseWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100, unique=True)),
+                ('last_changed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FactListing',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('category', models.CharField(max_length=20)),
+                ('quality_grade', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('unit', models.CharField(max_length=50)),
+                ('price_per_unit', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('listed_value', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('commodity', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.dimcommodity')),
+                ('date', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.dimdate')),
+                ('farm', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.dimfarm')),
+            ],
+            options={
+                'db_table': 'warehouse_fact_listing',
+                'ordering': ['date', 'id'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='FactInventoryMovement',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('item_id', models.BigIntegerField()),
+                ('transaction_type', models.CharField(max_length=20)),
+                ('quantity_change', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('unit', models.CharField(max_length=32)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=16, null=True)),
+                ('commodity', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.dimcommodity')),
+                ('date', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.dimdate')),
+                ('farm', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.dimfarm')),
+            ],
+            options={
+                'db_table': 'warehouse_fact_inventory_movement',
+                'ordering': ['date', 'id'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='FactActivity',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('activity_type', models.CharField(max_length=20)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unit', models.CharField(max_length=50)),
+                ('cost', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('commodity', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.dimcommodity')),
+                ('date', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.dimdate')),
+                ('farm', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.dimfarm')),
+                ('field', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.dimfield')),
+            ],
+            options={
+                'db_table': 'warehouse_fact_activity',
+                'ordering': ['date', 'id'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dimcommodity',
+            constraint=models.UniqueConstraint(fields=('category', 'name'), name='warehouse_commodity_unique'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+# ``ingest_xid`` records the inserting transaction so the rollup job only folds
+# readings of transactions that have finished (see analytics.services). It is
+# filled by a column default, not by the ORM, so it is not a model field.
+# Existing rows get 0 through a constant default, which needs no table rewrite;
+# they keep their place behind the current id watermark.
+ADD_INGEST_XID = """
+ALTER TABLE analytics_farmmetric ADD COLUMN ingest_xid bigint NOT NULL DEFAULT 0;
+ALTER TABLE analytics_farmmetric ALTER COLUMN ingest_xid SET DEFAULT (pg_current_xact_id()::text::bigint);
+CREATE INDEX farm_metric_ingest_idx ON analytics_farmmetric (ingest_xid, id);
+"""
+
+DROP_INGEST_XID = """
+DROP INDEX IF EXISTS farm_metric_ingest_idx;
+ALTER TABLE analytics_farmmetric DROP COLUMN IF EXISTS ingest_xid;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_warehouse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollupwatermark',
+            name='last_xid',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunSQL(ADD_INGEST_XID, DROP_INGEST_XID),
+    ]
@@ -5,6 +5,9 @@ from django.utils import timezone
 
 
 class FarmMetric(models.Model):
+	# The table also has an ``ingest_xid`` column, filled by a database default
+	# with the inserting transaction id and read by the rollup job; see
+	# analytics.services.refresh_metric_rollups.
 	farm = models.ForeignKey('farms.Farm', on_delete=models.CASCADE, related_name='metrics')
 	metric_type = models.CharField(max_length=100)
 	value = models.DecimalField(max_digits=14, decimal_places=2)
@@ -14,8 +17,233 @@ class FarmMetric(models.Model):
 
 	class Meta:
 		ordering = ['-recorded_at']
+		indexes = [
+			models.Index(fields=['farm', 'metric_type', 'recorded_at'], name='farm_metric_series_idx'),
+		]
 
 	def __str__(self) -> str:
 		return f"{self.metric_type} - {self.farm.name}"
 
-# Create your models here.
+	def save(self, *args, **kwargs):
+		previous = None
+		if self.pk and not self._state.adding:
+			previous = FarmMetric.objects.filter(pk=self.pk).values_list('farm_id', 'metric_type', 'recorded_at').first()
+		super().save(*args, **kwargs)
+		if previous:
+			self.recompute_rollups(previous)
+
+	def delete(self, *args, **kwargs):
+		key = (self.farm_id, self.metric_type, self.recorded_at)
+		result = super().delete(*args, **kwargs)
+		self.recompute_rollups(key)
+		return result
+
+	def recompute_rollups(self, previous_key: tuple | None = None) -> None:
+		"""Rebuild the rollup buckets this reading moved out of or changed within."""
+
+		from .services import recompute_metric_buckets
+
+		keys = {(self.farm_id, self.metric_type, self.recorded_at)}
+		if previous_key:
+			keys.add(tuple(previous_key))
+		recompute_metric_buckets(keys)
+
+
+class MetricRollup(models.Model):
+	"""Aggregates of the raw readings of one farm and metric type within a time bucket."""
+
+	farm = models.ForeignKey('farms.Farm', on_delete=models.CASCADE, related_name='+')
+	metric_type = models.CharField(max_length=100)
+	bucket = models.DateTimeField()
+	sample_count = models.PositiveIntegerField()
+	total = models.DecimalField(max_digits=20, decimal_places=2)
+	minimum = models.DecimalField(max_digits=14, decimal_places=2)
+	maximum = models.DecimalField(max_digits=14, decimal_places=2)
+
+	class Meta:
+		abstract = True
+		ordering = ['farm', 'metric_type', 'bucket']
+		constraints = [
+			models.UniqueConstraint(fields=['farm', 'metric_type', 'bucket'], name='%(class)s_bucket_unique'),
+		]
+		indexes = [
+			models.Index(fields=['metric_type', 'bucket'], name='%(class)s_type_idx'),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.metric_type} @ {self.bucket:%Y-%m-%d %H:%M} ({self.farm_id})"
+
+	@property
+	def average(self):
+		return self.total / self.sample_count if self.sample_count else None
+
+
+class FarmMetricHourly(MetricRollup):
+	class Meta(MetricRollup.Meta):
+		pass
+
+
+class FarmMetricDaily(MetricRollup):
+	class Meta(MetricRollup.Meta):
+		pass
+
+
+class FarmMetricMonthly(MetricRollup):
+	class Meta(MetricRollup.Meta):
+		pass
+
+
+class RollupWatermark(models.Model):
+	"""Position of an incremental metric job in the ``FarmMetric`` table.
+
+	Both the rollup job and the anomaly scan track the last
+	``(ingest_xid, id)`` they consumed, so readings whose transaction commits
+	late are not skipped.
+	"""
+
+	name = models.CharField(max_length=100, unique=True)
+	last_metric_id = models.BigIntegerField(default=0)
+	last_xid = models.BigIntegerField(default=0)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	def __str__(self) -> str:
+		return f"{self.name} @ {self.last_metric_id}"
+
+
+class WarehouseWatermark(models.Model):
+	"""Position of the incremental warehouse load for one operational source table."""
+
+	source = models.CharField(max_length=100, unique=True)
+	last_changed_at = models.DateTimeField(null=True, blank=True)
+	last_id = models.BigIntegerField(default=0)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	def __str__(self) -> str:
+		return f"{self.source} @ {self.last_changed_at or '-'} / {self.last_id}"
+
+
+class DimDate(models.Model):
+	"""Calendar dimension, one row for every day referenced by a fact."""
+
+	date = models.DateField(primary_key=True)
+	year = models.PositiveSmallIntegerField()
+	quarter = models.PositiveSmallIntegerField()
+	month = models.PositiveSmallIntegerField()
+	iso_year = models.PositiveSmallIntegerField()
+	iso_week = models.PositiveSmallIntegerField()
+	day_of_week = models.PositiveSmallIntegerField()
+
+	class Meta:
+		db_table = 'warehouse_dim_date'
+		ordering = ['date']
+
+	def __str__(self) -> str:
+		return self.date.isoformat()
+
+
+class DimFarm(models.Model):
+	"""Farm dimension keyed by the operational farm id and overwritten in place on change."""
+
+	id = models.BigIntegerField(primary_key=True)
+	owner_id = models.BigIntegerField()
+	name = models.CharField(max_length=255)
+	location = models.CharField(max_length=255)
+	soil_type = models.CharField(max_length=10)
+	irrigation_type = models.CharField(max_length=12)
+	total_area = models.DecimalField(max_digits=10, decimal_places=2)
+	is_active = models.BooleanField()
+
+	class Meta:
+		db_table = 'warehouse_dim_farm'
+		ordering = ['id']
+
+	def __str__(self) -> str:
+		return self.name
+
+
+class DimField(models.Model):
+	"""Field dimension keyed by the operational field id."""
+
+	id = models.BigIntegerField(primary_key=True)
+	farm = models.ForeignKey(DimFarm, on_delete=models.DO_NOTHING, db_constraint=False, related_name='fields')
+	field_name = models.CharField(max_length=255)
+	field_number = models.PositiveIntegerField()
+	area = models.DecimalField(max_digits=10, decimal_places=2)
+	current_crop = models.CharField(max_length=255, blank=True)
+	is_active = models.BooleanField()
+
+	class Meta:
+		db_table = 'warehouse_dim_field'
+		ordering = ['id']
+
+	def __str__(self) -> str:
+		return self.field_name
+
+
+class DimCommodity(models.Model):
+	"""Commodity dimension shared by crops, stock items and listings, keyed by normalised name."""
+
+	name = models.CharField(max_length=255)
+	category = models.CharField(max_length=20)
+
+	class Meta:
+		db_table = 'warehouse_dim_commodity'
+		ordering = ['category', 'name']
+		constraints = [
+			models.UniqueConstraint(fields=['category', 'name'], name='warehouse_commodity_unique'),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.name} ({self.category})"
+
+
+class WarehouseFact(models.Model):
+	"""Fact row keyed by the id of the operational row it was loaded from.
+
+	Dimension keys are not enforced as database constraints so facts and
+	dimensions can be loaded in independent batches.
+	"""
+
+	id = models.BigIntegerField(primary_key=True)
+	date = models.ForeignKey(DimDate, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+	farm = models.ForeignKey(DimFarm, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+	commodity = models.ForeignKey(DimCommodity, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+
+	class Meta:
+		abstract = True
+		ordering = ['date', 'id']
+
+
+class FactActivity(WarehouseFact):
+	field = models.ForeignKey(DimField, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+	activity_type = models.CharField(max_length=20)
+	quantity = models.DecimalField(max_digits=10, decimal_places=2)
+	unit = models.CharField(max_length=50)
+	cost = models.DecimalField(max_digits=12, decimal_places=2)
+
+	class Meta(WarehouseFact.Meta):
+		db_table = 'warehouse_fact_activity'
+
+
+class FactInventoryMovement(WarehouseFact):
+	item_id = models.BigIntegerField()
+	transaction_type = models.CharField(max_length=20)
+	quantity_change = models.DecimalField(max_digits=12, decimal_places=2)
+	unit = models.CharField(max_length=32)
+	value = models.DecimalField(max_digits=16, decimal_places=2, null=True)
+
+	class Meta(WarehouseFact.Meta):
+		db_table = 'warehouse_fact_inventory_movement'
+
+
+class FactListing(WarehouseFact):
+	category = models.CharField(max_length=20)
+	quality_grade = models.CharField(max_length=20)
+	status = models.CharField(max_length=20)
+	quantity = models.DecimalField(max_digits=12, decimal_places=2)
+	unit = models.CharField(max_length=50)
+	price_per_unit = models.DecimalField(max_digits=12, decimal_places=2)
+	listed_value = models.DecimalField(max_digits=16, decimal_places=2)
+
+	class Meta(WarehouseFact.Meta):
+		db_table = 'warehouse_fact_listing'
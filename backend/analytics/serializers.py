@@ -1,8 +1,12 @@
 """Analytics serializers."""
 
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 
 from .models import FarmMetric
+from .services import MAX_HISTOGRAM_BINS, MAX_PERCENTILES, ROLLUP_RESOLUTIONS, STATS_INTERVALS
 
 
 class FarmMetricSerializer(serializers.ModelSerializer):
@@ -21,3 +25,84 @@ class FarmMetricSerializer(serializers.ModelSerializer):
             'recorded_at',
         )
         read_only_fields = ('id', 'farm_name')
+
+
+class MetricRollupQuerySerializer(serializers.Serializer):
+    farm = serializers.IntegerField(required=False, min_value=1)
+    metric_type = serializers.CharField(max_length=100, required=False)
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    points = serializers.IntegerField(min_value=2, max_value=5000, default=500)
+    resolution = serializers.ChoiceField(choices=tuple(ROLLUP_RESOLUTIONS), required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault('end', timezone.now())
+        attrs.setdefault('start', attrs['end'] - timedelta(days=30))
+        if attrs['start'] >= attrs['end']:
+            raise serializers.ValidationError('start must be before end.')
+        return attrs
+
+
+class MetricSummaryQuerySerializer(serializers.Serializer):
+    metric_type = serializers.CharField(max_length=100, required=False)
+    farm = serializers.IntegerField(required=False, min_value=1)
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    interval = serializers.ChoiceField(choices=STATS_INTERVALS, required=False)
+    percentiles = serializers.CharField(required=False)
+    stddev = serializers.BooleanField(required=False, default=False)
+    histogram = serializers.IntegerField(required=False, min_value=2, max_value=MAX_HISTOGRAM_BINS)
+
+    DISTRIBUTION_FIELDS = ('farm', 'start', 'end', 'interval', 'percentiles', 'stddev', 'histogram')
+
+    def validate_percentiles(self, value):
+        try:
+            fractions = sorted({float(part) for part in value.split(',') if part.strip()})
+        except ValueError:
+            raise serializers.ValidationError('percentiles must be a comma separated list of numbers.')
+        if not fractions or len(fractions) > MAX_PERCENTILES:
+            raise serializers.ValidationError(f"Provide between 1 and {MAX_PERCENTILES} percentiles.")
+        if not all(0 <= fraction <= 1 for fraction in fractions):
+            raise serializers.ValidationError('percentiles must be fractions between 0 and 1, e.g. 0.5,0.9.')
+        return fractions
+
+    def validate(self, attrs):
+        start, end = attrs.get('start'), attrs.get('end')
+        if start and end and start > end:
+            raise serializers.ValidationError('start must be on or before end.')
+        return attrs
+
+    @property
+    def wants_distribution(self) -> bool:
+        return any(self.validated_data.get(field) for field in self.DISTRIBUTION_FIELDS)
+
+
+class MetricSeriesQuerySerializer(serializers.Serializer):
+    farm = serializers.IntegerField(min_value=1)
+    metric_type = serializers.CharField(max_length=100)
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    points = serializers.IntegerField(min_value=3, max_value=10000, default=1000)
+
+    def validate(self, attrs):
+        start, end = attrs.get('start'), attrs.get('end')
+        if start and end and start > end:
+            raise serializers.ValidationError('start must be on or before end.')
+        return attrs
+
+
+class WarehouseReportQuerySerializer(serializers.Serializer):
+    group_by = serializers.CharField(required=False, default='')
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    farm = serializers.IntegerField(required=False, min_value=1)
+    commodity = serializers.CharField(max_length=255, required=False)
+
+    def validate_group_by(self, value):
+        return [part.strip() for part in value.split(',') if part.strip()]
+
+    def validate(self, attrs):
+        start, end = attrs.get('start'), attrs.get('end')
+        if start and end and start > end:
+            raise serializers.ValidationError('start must be on or before end.')
+        return attrs
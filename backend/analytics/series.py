@@ -0,0 +1,102 @@
+"""Largest-Triangle-Three-Buckets downsampling of metric series for charts."""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+from typing import Iterator
+
+import numpy as np
+from django.db.models import Count, FloatField, Max
+from django.db.models.functions import Cast, Extract
+
+SERIES_FETCH_CHUNK_SIZE = 10_000
+
+
+def epoch_seconds(field: str) -> Extract:
+    """Unix time of a timestamp column.
+
+    Pinned to UTC: with ``USE_TZ`` Django extracts in the current time zone,
+    and the epoch of a local wall-clock time is off by the UTC offset.
+    """
+
+    return Extract(field, 'epoch', tzinfo=dt_timezone.utc)
+
+
+def _take(rows: Iterator[tuple[float, float]], count: int) -> tuple[np.ndarray, np.ndarray]:
+    block = np.array(list(islice(rows, count)), dtype=np.float64).reshape(-1, 2)
+    return block[:, 0], block[:, 1]
+
+
+def lttb(rows: Iterator[tuple[float, float]], total: int, threshold: int) -> tuple[np.ndarray, np.ndarray]:
+    """Downsample ``total`` ``(x, y)`` rows, sorted by x, to ``threshold`` points.
+
+    Rows are consumed one bucket at a time: only the current bucket and the
+    next one (whose mean is the third triangle vertex) are held in memory,
+    and the triangle areas of a bucket are evaluated in one NumPy expression.
+    The first and last points are always kept.
+    """
+
+    if threshold < 3 or threshold >= total:
+        return _take(rows, total)
+
+    every = (total - 2) / (threshold - 2)
+    bounds = [math.floor(index * every) + 1 for index in range(threshold - 1)]
+    out_x = np.empty(threshold)
+    out_y = np.empty(threshold)
+
+    first_x, first_y = _take(rows, 1)
+    anchor_x, anchor_y = first_x[0], first_y[0]
+    out_x[0], out_y[0] = anchor_x, anchor_y
+    current = _take(rows, bounds[1] - bounds[0])
+    for index in range(threshold - 2):
+        if index + 2 < len(bounds):
+            following = _take(rows, bounds[index + 2] - bounds[index + 1])
+        else:
+            following = _take(rows, 1)
+        bucket_x, bucket_y = current
+        if not len(bucket_x) or not len(following[0]):
+            # Rows vanished between counting and reading; return what was selected.
+            return out_x[: index + 1], out_y[: index + 1]
+        mean_x, mean_y = following[0].mean(), following[1].mean()
+        areas = np.abs((anchor_x - mean_x) * (bucket_y - anchor_y) - (anchor_x - bucket_x) * (mean_y - anchor_y))
+        chosen = int(np.argmax(areas))
+        anchor_x, anchor_y = bucket_x[chosen], bucket_y[chosen]
+        out_x[index + 1], out_y[index + 1] = anchor_x, anchor_y
+        current = following
+
+    out_x[-1], out_y[-1] = current[0][-1], current[1][-1]
+    return out_x, out_y
+
+
+def downsample_series(metrics, points: int) -> dict:
+    """Stream a metric queryset in time order and reduce it to at most ``points`` points.
+
+    The row count and highest id are read first so rows inserted while
+    streaming do not shift the bucket boundaries; readings are fetched in
+    chunks of ``SERIES_FETCH_CHUNK_SIZE`` as ``(epoch seconds, value)`` floats.
+    """
+
+    metrics = metrics.order_by()
+    stats = metrics.aggregate(total=Count('id'), last_id=Max('id'))
+    total = stats['total']
+    if not total:
+        return {'total': 0, 'points': 0, 'series': []}
+
+    rows = (
+        metrics.filter(id__lte=stats['last_id'])
+        .annotate(epoch=Cast(epoch_seconds('recorded_at'), FloatField()), reading=Cast('value', FloatField()))
+        .order_by('recorded_at', 'id')
+        .values_list('epoch', 'reading')
+        .iterator(chunk_size=SERIES_FETCH_CHUNK_SIZE)
+    )
+    xs, ys = lttb(rows, total, points)
+    return {
+        'total': total,
+        'points': len(xs),
+        'series': [
+            {'recorded_at': datetime.fromtimestamp(x, tz=dt_timezone.utc), 'value': y}
+            for x, y in zip(xs.tolist(), ys.tolist())
+        ],
+    }
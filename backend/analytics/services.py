@@ -0,0 +1,524 @@
+"""Analytics domain services for farm metric rollups and distribution statistics."""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Sequence
+
+from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import (
+    Aggregate,
+    Avg,
+    BigIntegerField,
+    BooleanField,
+    Case,
+    Count,
+    F,
+    FloatField,
+    Func,
+    IntegerField,
+    Max,
+    Min,
+    StdDev,
+    Sum,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Least, Trunc
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from users.models import CustomUser
+
+from .models import FarmMetric, FarmMetricDaily, FarmMetricHourly, FarmMetricMonthly, RollupWatermark
+
+ROLLUP_WATERMARK = 'farm-metric-rollups'
+ROLLUP_BATCH_SIZE = 50_000
+ROLLUP_FIELDS = ('sample_count', 'total', 'minimum', 'maximum')
+
+STATS_CACHE_TIMEOUT = 60 * 15
+_STATS_VERSION_KEY = 'analytics:distribution:version'
+STATS_INTERVALS = ('hour', 'day', 'week', 'month')
+MAX_PERCENTILES = 10
+MAX_HISTOGRAM_BINS = 100
+
+# Resolution name -> (rollup model, Trunc kind, nominal bucket width), finest first.
+ROLLUP_RESOLUTIONS = {
+    'hour': (FarmMetricHourly, 'hour', timedelta(hours=1)),
+    'day': (FarmMetricDaily, 'day', timedelta(days=1)),
+    'month': (FarmMetricMonthly, 'month', timedelta(days=30)),
+}
+
+
+def _aggregate_buckets(metrics, kind: str) -> dict[tuple, dict]:
+    """Group raw readings into ``kind`` buckets keyed by (farm, metric type, bucket)."""
+
+    rows = (
+        metrics.annotate(bucket=Trunc('recorded_at', kind))
+        .values('farm_id', 'metric_type', 'bucket')
+        .annotate(sample_count=Count('id'), total=Sum('value'), minimum=Min('value'), maximum=Max('value'))
+        .order_by()
+    )
+    return {(row.pop('farm_id'), row.pop('metric_type'), row.pop('bucket')): row for row in rows}
+
+
+def _existing_rollups(model, keys: Iterable[tuple]) -> dict[tuple, object]:
+    """Stored rollup rows for ``keys``, fetched with one query over the key components."""
+
+    keys = set(keys)
+    if not keys:
+        return {}
+    candidates = model.objects.filter(
+        farm_id__in={key[0] for key in keys},
+        metric_type__in={key[1] for key in keys},
+        bucket__in={key[2] for key in keys},
+    )
+    existing = {}
+    for rollup in candidates:
+        key = (rollup.farm_id, rollup.metric_type, rollup.bucket)
+        if key in keys:
+            existing[key] = rollup
+    return existing
+
+
+def _merge_delta(model, delta: dict[tuple, dict]) -> None:
+    """Fold aggregates of newly ingested readings into existing rollup rows."""
+
+    existing = _existing_rollups(model, delta)
+    rows = []
+    for (farm_id, metric_type, bucket), values in delta.items():
+        current = existing.get((farm_id, metric_type, bucket))
+        if current is not None:
+            values = {
+                'sample_count': current.sample_count + values['sample_count'],
+                'total': current.total + values['total'],
+                'minimum': min(current.minimum, values['minimum']),
+                'maximum': max(current.maximum, values['maximum']),
+            }
+        rows.append(model(farm_id=farm_id, metric_type=metric_type, bucket=bucket, **values))
+    model.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['farm', 'metric_type', 'bucket'],
+        update_fields=list(ROLLUP_FIELDS),
+        batch_size=2000,
+    )
+
+
+def _ingest_xid() -> RawSQL:
+    """The ``ingest_xid`` column, which the ORM does not manage (see the 0005 migration)."""
+
+    table = connection.ops.quote_name(FarmMetric._meta.db_table)
+    return RawSQL(f'{table}."ingest_xid"', (), output_field=BigIntegerField())
+
+
+def _compare_position(operator: str, position: tuple[int, int]) -> RawSQL:
+    table = connection.ops.quote_name(FarmMetric._meta.db_table)
+    return RawSQL(f'({table}."ingest_xid", {table}."id") {operator} (%s, %s)', position, output_field=BooleanField())
+
+
+def _unfolded(position: tuple[int, int]):
+    """Readings after ``position`` in ``(ingest_xid, id)`` order, i.e. not yet in the rollups."""
+
+    return FarmMetric.objects.filter(_compare_position('>', position))
+
+
+def _folded(position: tuple[int, int]):
+    return FarmMetric.objects.filter(_compare_position('<=', position))
+
+
+def _watermark_position(watermark: RollupWatermark) -> tuple[int, int]:
+    return watermark.last_xid, watermark.last_metric_id
+
+
+def _fold_horizon() -> int:
+    """Transaction id below which every transaction that could insert readings has finished.
+
+    This is the oldest transaction still running, from
+    ``pg_snapshot_xmin``. The current transaction is included when nothing
+    older is running: its own readings are visible to it, and folding them
+    commits or rolls back with them.
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT CASE WHEN oldest >= own THEN GREATEST(oldest, own + 1) ELSE oldest END
+            FROM (
+                SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS oldest,
+                       pg_current_xact_id()::text::bigint AS own
+            ) AS ids
+            """
+        )
+        return cursor.fetchone()[0]
+
+
+def refresh_metric_rollups(batch_size: int = ROLLUP_BATCH_SIZE) -> int:
+    """Fold readings past the watermark into the hourly, daily and monthly tables.
+
+    Ids are assigned when a row is inserted, not when it commits, so an id
+    watermark would skip a reading whose transaction commits after a higher
+    id was folded. Readings are therefore consumed in ``(ingest_xid, id)``
+    order, and only from transactions older than :func:`_fold_horizon`. All
+    of those have committed or rolled back, so nothing can still appear
+    behind the watermark. Readings of transactions still running wait for a
+    later run, and the readers below add them from the raw table meanwhile.
+
+    Each batch of ``batch_size`` readings is aggregated once per resolution
+    and merged into the affected buckets only. The watermark advances in the
+    same transaction, so an interrupted run resumes without double counting.
+    Returns the number of readings folded.
+    """
+
+    horizon = _fold_horizon()
+    processed = 0
+    while True:
+        with transaction.atomic():
+            watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=ROLLUP_WATERMARK)
+            pending = (
+                _unfolded(_watermark_position(watermark))
+                .annotate(ingest_xid=_ingest_xid())
+                .filter(ingest_xid__lt=horizon)
+                .order_by('ingest_xid', 'id')
+            )
+            positions = pending.values_list('ingest_xid', 'id')
+            upper = positions[batch_size - 1:batch_size].first() or positions.last()
+            if upper is None:
+                return processed
+            batch = pending.filter(_compare_position('<=', upper))
+            for model, kind, _width in ROLLUP_RESOLUTIONS.values():
+                delta = _aggregate_buckets(batch, kind)
+                _merge_delta(model, delta)
+            processed += sum(values['sample_count'] for values in delta.values())
+            watermark.last_xid, watermark.last_metric_id = upper
+            watermark.save(update_fields=['last_xid', 'last_metric_id', 'updated_at'])
+            transaction.on_commit(invalidate_metric_statistics)
+
+
+def recompute_metric_buckets(keys: Iterable[tuple[int, str, datetime]]) -> None:
+    """Recompute the buckets holding the given (farm, metric type, moment) keys from raw rows.
+
+    Used when a reading is edited or deleted, which incremental merging cannot
+    express. Only readings at or before the watermark are counted; later ones
+    are still to be merged by :func:`refresh_metric_rollups`.
+    """
+
+    keys = list(keys)
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=ROLLUP_WATERMARK)
+        transaction.on_commit(invalidate_metric_statistics)
+        folded = _folded(_watermark_position(watermark))
+        for model, kind, _width in ROLLUP_RESOLUTIONS.values():
+            for farm_id, metric_type, moment in keys:
+                start = _truncate(moment, kind)
+                readings = folded.filter(
+                    farm_id=farm_id,
+                    metric_type=metric_type,
+                    recorded_at__gte=start,
+                    recorded_at__lt=_next_bucket(start, kind),
+                )
+                bucket = _aggregate_buckets(readings, kind).get((farm_id, metric_type, start))
+                if bucket is None:
+                    model.objects.filter(farm_id=farm_id, metric_type=metric_type, bucket=start).delete()
+                else:
+                    model.objects.update_or_create(
+                        farm_id=farm_id, metric_type=metric_type, bucket=start, defaults=bucket
+                    )
+
+
+def _truncate(moment: datetime, kind: str) -> datetime:
+    moment = timezone.localtime(moment)
+    if kind == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if kind == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_bucket(start: datetime, kind: str) -> datetime:
+    if kind == 'month':
+        year, month = divmod(start.month, 12)
+        return start.replace(year=start.year + year, month=month + 1)
+    naive = timezone.make_naive(start) + (timedelta(hours=1) if kind == 'hour' else timedelta(days=1))
+    return timezone.make_aware(naive)
+
+
+def can_view_all_farms(user) -> bool:
+    """Staff, platform admins and analysts read the cross-farm warehouse reports."""
+
+    return user.is_staff or getattr(user, 'role', None) in (CustomUser.Roles.ANALYST, CustomUser.Roles.ADMIN)
+
+
+def _scoped(queryset, user, farm_field: str = 'farm'):
+    """Per-farm analytics: staff see every farm, everyone else their own."""
+
+    return queryset if user.is_staff else queryset.filter(**{f"{farm_field}__owner": user})
+
+
+def _stats_cache_version() -> int:
+    """Return the current distribution cache generation, seeding it on first use."""
+
+    version = cache.get(_STATS_VERSION_KEY)
+    if version is None:
+        version = int(time.time())
+        cache.add(_STATS_VERSION_KEY, version, None)
+        version = cache.get(_STATS_VERSION_KEY, version)
+    return version
+
+
+def invalidate_metric_statistics() -> None:
+    """Retire every cached distribution by bumping the cache generation."""
+
+    try:
+        cache.incr(_STATS_VERSION_KEY)
+    except ValueError:
+        cache.set(_STATS_VERSION_KEY, int(time.time()), None)
+
+
+def _rollup_position() -> tuple[int, int]:
+    position = RollupWatermark.objects.filter(name=ROLLUP_WATERMARK).values_list('last_xid', 'last_metric_id').first()
+    return position or (0, 0)
+
+
+def choose_resolution(start: datetime, end: datetime, max_points: int) -> str:
+    """Finest rollup resolution whose bucket count over ``start``-``end`` fits ``max_points``.
+
+    Falls back to monthly buckets when even those exceed the budget.
+    """
+
+    span = end - start
+    for name, (_model, _kind, width) in ROLLUP_RESOLUTIONS.items():
+        if span / width <= max_points:
+            return name
+    return 'month'
+
+
+def metric_rollups(
+    *,
+    user,
+    start: datetime,
+    end: datetime,
+    max_points: int,
+    farm: int | None = None,
+    metric_type: str | None = None,
+    resolution: str | None = None,
+) -> dict:
+    """Bucketed sum/count/min/max/avg per farm and metric type from the rollup tables.
+
+    Readings past the watermark, not yet folded by the periodic job, are
+    aggregated from the raw table and merged in so results are never stale.
+    """
+
+    resolution = resolution or choose_resolution(start, end, max_points)
+    model, kind, _width = ROLLUP_RESOLUTIONS[resolution]
+    filters = {'bucket__gte': _truncate(start, kind), 'bucket__lte': end}
+    if farm:
+        filters['farm_id'] = farm
+    if metric_type:
+        filters['metric_type'] = metric_type
+
+    buckets = {
+        (row.farm_id, row.metric_type, row.bucket): {field: getattr(row, field) for field in ROLLUP_FIELDS}
+        for row in _scoped(model.objects.filter(**filters), user)
+    }
+    tail = _unfolded(_rollup_position()).filter(
+        recorded_at__gte=filters['bucket__gte'],
+        recorded_at__lte=end,
+        **{key: value for key, value in filters.items() if not key.startswith('bucket')},
+    )
+    for key, values in _aggregate_buckets(_scoped(tail, user), kind).items():
+        current = buckets.get(key)
+        if current is not None:
+            values = {
+                'sample_count': current['sample_count'] + values['sample_count'],
+                'total': current['total'] + values['total'],
+                'minimum': min(current['minimum'], values['minimum']),
+                'maximum': max(current['maximum'], values['maximum']),
+            }
+        buckets[key] = values
+
+    return {
+        'resolution': resolution,
+        'start': start,
+        'end': end,
+        'buckets': [
+            {
+                'farm': farm_id,
+                'metric_type': metric,
+                'bucket': bucket,
+                'count': values['sample_count'],
+                'sum': values['total'],
+                'min': values['minimum'],
+                'max': values['maximum'],
+                'avg': values['total'] / values['sample_count'],
+            }
+            for (farm_id, metric, bucket), values in sorted(buckets.items())
+        ],
+    }
+
+
+def farm_metric_summary(user, metric_type: str | None = None) -> list[dict]:
+    """Per-farm totals read from the monthly rollups plus the not yet folded tail."""
+
+    monthly = _scoped(FarmMetricMonthly.objects.all(), user)
+    tail = _scoped(_unfolded(_rollup_position()), user)
+    if metric_type:
+        monthly = monthly.filter(metric_type=metric_type)
+        tail = tail.filter(metric_type=metric_type)
+
+    farms: dict[int, dict] = {}
+    for rows in (
+        monthly.values('farm__id', 'farm__name').annotate(total_value=Sum('total'), metric_count=Sum('sample_count')),
+        tail.values('farm__id', 'farm__name').annotate(total_value=Sum('value'), metric_count=Count('id')),
+    ):
+        for row in rows.order_by():
+            entry = farms.setdefault(
+                row['farm__id'],
+                {'farm__id': row['farm__id'], 'farm__name': row['farm__name'], 'total_value': 0, 'metric_count': 0},
+            )
+            entry['total_value'] += row['total_value']
+            entry['metric_count'] += row['metric_count']
+
+    summary = sorted(farms.values(), key=lambda entry: (entry['farm__name'], entry['farm__id']))
+    for entry in summary:
+        entry['average_value'] = entry['total_value'] / entry['metric_count']
+    return summary
+
+
+class PercentileCont(Aggregate):
+    """``percentile_cont(fractions) WITHIN GROUP (ORDER BY expression)`` returning one value per fraction."""
+
+    function = 'PERCENTILE_CONT'
+    output_field = ArrayField(FloatField())
+
+    def __init__(self, expression, fractions: Sequence[float], **extra):
+        self.fractions = list(fractions)
+        super().__init__(expression, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        expression, params = compiler.compile(self.get_source_expressions()[0])
+        return f"{self.function}(%s::double precision[]) WITHIN GROUP (ORDER BY {expression})", (self.fractions, *params)
+
+
+class WidthBucket(Func):
+    function = 'WIDTH_BUCKET'
+    output_field = IntegerField()
+
+
+def _percentile_label(fraction: float) -> str:
+    return f"p{fraction * 100:g}"
+
+
+def _histograms(metrics, group: list[str], bins: int) -> dict[tuple, list[int]]:
+    """Count readings per equal-width bin between each group's min and max.
+
+    Bounds come from window aggregates over the group so the data is binned
+    with ``width_bucket`` in one scan; only ``(group, bin, count)`` rows leave
+    the database. The maximum is folded into the last bin.
+    """
+
+    value = Cast('value', FloatField())
+    low = Window(Min(value), partition_by=[F(field) for field in group])
+    high = Window(Max(value), partition_by=[F(field) for field in group])
+    binned = metrics.annotate(
+        bin=Least(
+            WidthBucket(value, low, Case(When(GreaterThan(high, low), then=high), default=low + Value(1.0)), Value(bins)),
+            Value(bins),
+        )
+    ).values(*group, 'bin')
+    inner, params = binned.query.sql_with_params()
+    columns = ', '.join(connection.ops.quote_name(field) for field in (*group, 'bin'))
+    positions = ', '.join(str(index) for index in range(1, len(group) + 2))
+
+    histograms: dict[tuple, list[int]] = {}
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {columns}, COUNT(*) FROM ({inner}) AS binned GROUP BY {positions}", params)
+        for *key, bin_number, count in cursor.fetchall():
+            histograms.setdefault(tuple(key), [0] * bins)[bin_number - 1] = count
+    return histograms
+
+
+def metric_distribution(
+    *,
+    user,
+    metric_type: str | None = None,
+    farm: int | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    interval: str | None = None,
+    percentiles: Sequence[float] = (),
+    stddev: bool = False,
+    histogram: int | None = None,
+) -> list[dict]:
+    """Distribution statistics per farm and metric type, optionally per time bucket.
+
+    Quantiles (``percentile_cont``), standard deviation and ``width_bucket``
+    histograms are computed by PostgreSQL; only one row per group (plus one
+    per histogram bin) is fetched. Results are cached per query signature and
+    cache generation, which moves when readings are folded, edited or deleted.
+    """
+
+    signature = (
+        'all' if user.is_staff else f"owner-{user.pk}",
+        metric_type,
+        farm,
+        start and start.isoformat(),
+        end and end.isoformat(),
+        interval,
+        tuple(percentiles),
+        stddev,
+        histogram,
+    )
+    key = f"analytics:distribution:{_stats_cache_version()}:" + hashlib.md5(repr(signature).encode('utf-8')).hexdigest()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    metrics = _scoped(FarmMetric.objects.all(), user)
+    if metric_type:
+        metrics = metrics.filter(metric_type=metric_type)
+    if farm:
+        metrics = metrics.filter(farm_id=farm)
+    if start:
+        metrics = metrics.filter(recorded_at__gte=start)
+    if end:
+        metrics = metrics.filter(recorded_at__lte=end)
+    group = ['farm_id', 'metric_type']
+    if interval:
+        metrics = metrics.annotate(bucket=Trunc('recorded_at', interval))
+        group.append('bucket')
+
+    aggregates = {
+        'metric_count': Count('id'),
+        'total_value': Sum('value'),
+        'average_value': Avg('value'),
+        'min_value': Min('value'),
+        'max_value': Max('value'),
+    }
+    if stddev:
+        aggregates['stddev'] = StdDev('value', sample=True)
+    if percentiles:
+        aggregates['quantiles'] = PercentileCont('value', percentiles)
+    rows = list(metrics.values(*group, 'farm__name').annotate(**aggregates).order_by('farm__name', *group))
+
+    histograms = _histograms(metrics.order_by(), group, histogram) if histogram else {}
+    for row in rows:
+        row['farm__id'] = row.pop('farm_id')
+        if percentiles:
+            row['percentiles'] = dict(zip(map(_percentile_label, percentiles), row.pop('quantiles')))
+        if histogram:
+            key_values = tuple(row['farm__id'] if field == 'farm_id' else row[field] for field in group)
+            row['histogram'] = {
+                'min': row['min_value'],
+                'max': row['max_value'],
+                'counts': histograms.get(key_values, [0] * histogram),
+            }
+
+    cache.set(key, rows, STATS_CACHE_TIMEOUT)
+    return rows
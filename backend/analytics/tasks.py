@@ -0,0 +1,41 @@
+"""Celery tasks for analytics workflows."""
+
+from __future__ import annotations
+
+from celery import shared_task
+
+
+@shared_task
+def refresh_farm_metric_rollups() -> int:
+    """Fold newly recorded farm metrics into the hourly, daily and monthly rollups."""
+
+    from .services import refresh_metric_rollups
+
+    return refresh_metric_rollups()
+
+
+@shared_task
+def detect_farm_metric_anomalies() -> int:
+    """Flag outlying recent readings and notify the farm owners."""
+
+    from .anomalies import detect_metric_anomalies
+
+    return detect_metric_anomalies()
+
+
+@shared_task
+def refresh_analytics_warehouse() -> dict:
+    """Copy operational changes since the last run into the warehouse tables."""
+
+    from .warehouse import refresh_warehouse
+
+    return refresh_warehouse()
+
+
+@shared_task
+def prune_analytics_warehouse() -> dict:
+    """Remove warehouse rows whose operational rows were deleted."""
+
+    from .warehouse import prune_warehouse
+
+    return prune_warehouse()
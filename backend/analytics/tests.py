@@ -1,3 +1,495 @@
-from django.test import TestCase
+from __future__ import annotations
 
-# Create your tests here.
+import json
+import threading
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from farms.models import Activity, Farm, Field
+from inventory.models import InventoryTransaction
+from marketplace.models import Listing
+from notifications.models import Notification
+
+from .anomalies import detect_metric_anomalies
+from .models import (
+	DimFarm,
+	FactActivity,
+	FactInventoryMovement,
+	FactListing,
+	FarmMetric,
+	FarmMetricDaily,
+	FarmMetricHourly,
+	FarmMetricMonthly,
+	RollupWatermark,
+	WarehouseWatermark,
+)
+from .services import choose_resolution, refresh_metric_rollups
+from .warehouse import prune_warehouse, refresh_warehouse
+
+
+def _at(day: int, hour: int = 0, minute: int = 0) -> datetime:
+	return datetime(2025, 3, day, hour, minute, tzinfo=dt_timezone.utc)
+
+
+@override_settings(TIME_ZONE='UTC')
+class MetricRollupTestCase(APITestCase):
+	"""Incrementally maintained hourly/daily/monthly metric rollups."""
+
+	def setUp(self):
+		User = get_user_model()
+		self.owner = User.objects.create_user(email='rollup-owner@example.com', password='Testpass123!')
+		self.other = User.objects.create_user(email='rollup-other@example.com', password='Testpass123!')
+		self.farm = Farm.objects.create(owner=self.owner, name='Rollup farm', location='Nyeri', total_area=Decimal('3.00'))
+		self.other_farm = Farm.objects.create(owner=self.other, name='Other farm', location='Meru', total_area=Decimal('2.00'))
+		self.client.force_authenticate(self.owner)
+
+	def _record(self, value: str, moment: datetime, farm=None, metric_type='soil_moisture') -> FarmMetric:
+		return FarmMetric.objects.create(
+			farm=farm or self.farm, metric_type=metric_type, value=Decimal(value), recorded_at=moment
+		)
+
+	def test_refresh_folds_new_readings_incrementally(self):
+		self._record('10.00', _at(1, 8, 5))
+		self._record('20.00', _at(1, 8, 50))
+		self._record('30.00', _at(2, 9))
+		self.assertEqual(refresh_metric_rollups(batch_size=2), 3)
+
+		late = self._record('5.00', _at(1, 8, 30))
+		self.assertEqual(refresh_metric_rollups(), 1)
+		self.assertEqual(refresh_metric_rollups(), 0)
+
+		hour = FarmMetricHourly.objects.get(farm=self.farm, bucket=_at(1, 8))
+		self.assertEqual((hour.sample_count, hour.total, hour.minimum, hour.maximum), (3, Decimal('35.00'), Decimal('5.00'), Decimal('20.00')))
+		self.assertEqual(FarmMetricDaily.objects.count(), 2)
+		month = FarmMetricMonthly.objects.get()
+		self.assertEqual((month.sample_count, month.total), (4, Decimal('65.00')))
+		self.assertEqual(RollupWatermark.objects.get().last_metric_id, late.id)
+
+	def test_edits_and_deletes_recompute_buckets(self):
+		reading = self._record('10.00', _at(1, 8))
+		self._record('20.00', _at(1, 8, 30))
+		refresh_metric_rollups()
+
+		reading.value = Decimal('40.00')
+		reading.save()
+		self.assertEqual(FarmMetricHourly.objects.get().total, Decimal('60.00'))
+
+		reading.recorded_at = _at(3, 10)
+		reading.save()
+		self.assertEqual(FarmMetricDaily.objects.get(bucket=_at(1)).total, Decimal('20.00'))
+		self.assertEqual(FarmMetricDaily.objects.get(bucket=_at(3)).total, Decimal('40.00'))
+
+		reading.delete()
+		self.assertFalse(FarmMetricDaily.objects.filter(bucket=_at(3)).exists())
+		self.assertEqual(FarmMetricMonthly.objects.get().sample_count, 1)
+
+	def test_choose_resolution_respects_point_budget(self):
+		self.assertEqual(choose_resolution(_at(1), _at(3), 100), 'hour')
+		self.assertEqual(choose_resolution(_at(1), _at(1) + timedelta(days=90), 100), 'day')
+		self.assertEqual(choose_resolution(_at(1), _at(1) + timedelta(days=3650), 100), 'month')
+
+	def test_rollup_endpoint_merges_unfolded_tail(self):
+		self._record('10.00', _at(1, 8))
+		self._record('99.00', _at(1, 8), farm=self.other_farm)
+		refresh_metric_rollups()
+		self._record('30.00', _at(1, 8, 45))
+
+		response = self.client.get(
+			reverse('metric-rollups'),
+			{'start': _at(1).isoformat(), 'end': _at(2).isoformat(), 'points': 48, 'metric_type': 'soil_moisture'},
+		)
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(response.data['resolution'], 'hour')
+		self.assertEqual(len(response.data['buckets']), 1)
+		bucket = response.data['buckets'][0]
+		self.assertEqual((bucket['farm'], bucket['count'], bucket['sum'], bucket['avg']), (self.farm.id, 2, Decimal('40.00'), Decimal('20.00')))
+
+		response = self.client.get(
+			reverse('metric-rollups'), {'start': _at(1).isoformat(), 'end': _at(2).isoformat(), 'resolution': 'month'}
+		)
+		self.assertEqual(response.data['resolution'], 'month')
+		self.assertEqual(response.data['buckets'][0]['max'], Decimal('30.00'))
+
+	def test_summary_reads_rollups_and_scopes_to_owner(self):
+		self._record('10.00', _at(1, 8))
+		self._record('99.00', _at(1, 8), farm=self.other_farm)
+		refresh_metric_rollups()
+		self._record('20.00', _at(4, 8))
+
+		response = self.client.get(reverse('farm-metric-summary'))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(len(response.data), 1)
+		self.assertEqual(response.data[0]['farm__id'], self.farm.id)
+		self.assertEqual(response.data[0]['metric_count'], 2)
+		self.assertEqual(response.data[0]['total_value'], Decimal('30.00'))
+		self.assertEqual(response.data[0]['average_value'], Decimal('15.00'))
+
+
+@override_settings(TIME_ZONE='UTC')
+class MetricRollupCommitOrderTestCase(TransactionTestCase):
+	"""Readings that commit after newer ones are still folded exactly once."""
+
+	def test_reading_committed_after_a_newer_one_is_folded(self):
+		owner = get_user_model().objects.create_user(email='late-commit@example.com', password='Testpass123!')
+		farm = Farm.objects.create(owner=owner, name='Late farm', location='Nyeri', total_area=Decimal('1.00'))
+		inserted, release = threading.Event(), threading.Event()
+
+		def slow_writer():
+			try:
+				with transaction.atomic():
+					FarmMetric.objects.create(farm=farm, metric_type='rain', value=Decimal('1.00'), recorded_at=_at(1, 8))
+					inserted.set()
+					release.wait(10)
+			finally:
+				connection.close()
+
+		writer = threading.Thread(target=slow_writer)
+		writer.start()
+		self.assertTrue(inserted.wait(10))
+		FarmMetric.objects.create(farm=farm, metric_type='rain', value=Decimal('2.00'), recorded_at=_at(1, 9))
+		# The newer reading waits while the older transaction is still open.
+		self.assertEqual(refresh_metric_rollups(), 0)
+		release.set()
+		writer.join(10)
+
+		self.assertEqual(refresh_metric_rollups(), 2)
+		month = FarmMetricMonthly.objects.get()
+		self.assertEqual((month.sample_count, month.total), (2, Decimal('3.00')))
+		self.assertEqual(refresh_metric_rollups(), 0)
+
+
+class MetricAnomalyCommitOrderTestCase(TransactionTestCase):
+	"""A reading that commits after a newer one is still scored."""
+
+	def test_late_committed_spike_is_scored(self):
+		owner = get_user_model().objects.create_user(email='late-spike@example.com', password='Testpass123!')
+		farm = Farm.objects.create(owner=owner, name='Spike farm', location='Nyeri', total_area=Decimal('1.00'))
+		now = timezone.now()
+		FarmMetric.objects.bulk_create(
+			FarmMetric(farm=farm, metric_type='soil_ph', value=Decimal('6.50'), recorded_at=now - timedelta(hours=12 - index))
+			for index in range(10)
+		)
+		inserted, release = threading.Event(), threading.Event()
+
+		def slow_writer():
+			try:
+				with transaction.atomic():
+					FarmMetric.objects.create(
+						farm=farm, metric_type='soil_ph', value=Decimal('9.10'), recorded_at=now - timedelta(hours=1)
+					)
+					inserted.set()
+					release.wait(10)
+			finally:
+				connection.close()
+
+		writer = threading.Thread(target=slow_writer)
+		writer.start()
+		self.assertTrue(inserted.wait(10))
+		FarmMetric.objects.create(farm=farm, metric_type='soil_ph', value=Decimal('6.50'), recorded_at=now)
+		self.assertEqual(detect_metric_anomalies(), 0)
+		release.set()
+		writer.join(10)
+
+		self.assertEqual(detect_metric_anomalies(), 1)
+		self.assertEqual(Notification.objects.get(recipient=owner).metadata['value'], 9.1)
+		self.assertEqual(detect_metric_anomalies(), 0)
+
+
+class MetricIngestTestCase(APITestCase):
+	"""NDJSON/CSV metric streams loaded through COPY."""
+
+	def setUp(self):
+		User = get_user_model()
+		self.owner = User.objects.create_user(email='ingest-owner@example.com', password='Testpass123!')
+		other = User.objects.create_user(email='ingest-other@example.com', password='Testpass123!')
+		self.farm = Farm.objects.create(owner=self.owner, name='Station farm', location='Kericho', total_area=Decimal('8.00'))
+		self.foreign = Farm.objects.create(owner=other, name='Foreign farm', location='Bomet', total_area=Decimal('4.00'))
+		self.client.force_authenticate(self.owner)
+		self.url = reverse('metric-ingest')
+
+	def test_ndjson_loads_valid_rows_and_reports_rejects(self):
+		lines = [
+			{'farm': self.farm.id, 'metric_type': 'soil_moisture', 'value': 31.456, 'unit': '%', 'recorded_at': '2025-03-01T08:00:00Z'},
+			{'farm': self.farm.id, 'metric_type': 'soil_moisture', 'value': 'wet'},
+			{'farm': self.foreign.id, 'metric_type': 'soil_moisture', 'value': 12},
+			{'farm': self.farm.id, 'metric_type': 'air_temperature', 'value': 19.5},
+		]
+		body = '\n'.join(json.dumps(line) for line in lines) + '\n{broken\n'
+		response = self.client.post(self.url, data=body, content_type='application/x-ndjson')
+
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual((response.data['received'], response.data['inserted'], response.data['rejected']), (5, 2, 3))
+		self.assertEqual([error['line'] for error in response.data['errors']], [2, 5, 3])
+		reading = FarmMetric.objects.get(metric_type='soil_moisture')
+		self.assertEqual(reading.value, Decimal('31.46'))
+		self.assertEqual(reading.recorded_at, _at(1, 8))
+		self.assertFalse(FarmMetric.objects.filter(farm=self.foreign).exists())
+
+	def test_csv_with_default_farm(self):
+		body = (
+			'metric_type,value,unit,recorded_at\n'
+			'rainfall,4.2,mm,2025-03-01T06:00:00+00:00\n'
+			'rainfall,,mm,2025-03-01T07:00:00+00:00\n'
+			'rainfall,1.0,mm,yesterday\n'
+			'rainfall,0.8,mm,2025-03-01T08:00:00+00:00\n'
+		)
+		response = self.client.post(f"{self.url}?farm={self.farm.id}", data=body, content_type='text/csv')
+
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(response.data['inserted'], 2)
+		self.assertEqual([error['line'] for error in response.data['errors']], [3, 4])
+		self.assertEqual(FarmMetric.objects.filter(farm=self.farm, metric_type='rainfall').count(), 2)
+
+	def test_body_without_content_length_or_empty_is_rejected(self):
+		response = self.client.generic('POST', self.url, b'', content_type='application/x-ndjson', CONTENT_LENGTH='')
+		self.assertEqual(response.status_code, status.HTTP_411_LENGTH_REQUIRED)
+		response = self.client.generic('POST', self.url, b'', content_type='text/csv')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertFalse(FarmMetric.objects.exists())
+
+	def test_unsupported_media_type(self):
+		response = self.client.post(self.url, data={'farm': self.farm.id}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+
+@override_settings(TIME_ZONE='UTC')
+class MetricDistributionTestCase(APITestCase):
+	"""Quantiles, stddev and histograms computed by PostgreSQL for the summary endpoint."""
+
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		User = get_user_model()
+		self.owner = User.objects.create_user(email='stats-owner@example.com', password='Testpass123!')
+		self.analyst = User.objects.create_user(
+			email='stats-analyst@example.com', password='Testpass123!', role=User.Roles.ANALYST
+		)
+		self.farm = Farm.objects.create(owner=self.owner, name='Stats farm', location='Embu', total_area=Decimal('5.00'))
+		for day, value in enumerate(['1.00', '2.00', '3.00', '4.00', '10.00'], start=1):
+			FarmMetric.objects.create(farm=self.farm, metric_type='ph', value=Decimal(value), recorded_at=_at(day, 6))
+		self.url = reverse('farm-metric-summary')
+
+	def test_percentiles_stddev_and_histogram(self):
+		self.client.force_authenticate(self.owner)
+		response = self.client.get(self.url, {'percentiles': '0.5,0.9', 'stddev': 'true', 'histogram': 3})
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		row = response.data[0]
+		self.assertEqual((row['farm__id'], row['metric_type'], row['metric_count']), (self.farm.id, 'ph', 5))
+		self.assertEqual(row['percentiles']['p50'], 3.0)
+		self.assertAlmostEqual(row['percentiles']['p90'], 7.6)
+		self.assertAlmostEqual(row['stddev'], 3.5355, places=4)
+		self.assertEqual(row['histogram']['counts'], [3, 1, 1])
+
+	def test_interval_grouping_and_owner_scope(self):
+		self.client.force_authenticate(self.owner)
+		response = self.client.get(self.url, {'interval': 'month', 'histogram': 2})
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(len(response.data), 1)
+		self.assertEqual(response.data[0]['bucket'], _at(1))
+		self.assertEqual(response.data[0]['histogram']['counts'], [4, 1])
+
+		self.client.force_authenticate(self.analyst)
+		self.assertEqual(self.client.get(self.url, {'interval': 'month'}).data, [])
+		self.assertEqual(self.client.get(self.url).data, [])
+
+	def test_cached_statistics_refresh_after_an_edit(self):
+		self.client.force_authenticate(self.owner)
+		self.assertEqual(self.client.get(self.url, {'stddev': 'true'}).data[0]['max_value'], Decimal('10.00'))
+		reading = FarmMetric.objects.get(value=Decimal('10.00'))
+		reading.value = Decimal('5.00')
+		with self.captureOnCommitCallbacks(execute=True):
+			reading.save()
+		self.assertEqual(self.client.get(self.url, {'stddev': 'true'}).data[0]['max_value'], Decimal('5.00'))
+
+	def test_invalid_percentiles(self):
+		self.client.force_authenticate(self.owner)
+		response = self.client.get(self.url, {'percentiles': '50'})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# Not UTC, so epoch seconds extracted in the local time zone would shift every point.
+@override_settings(TIME_ZONE='Africa/Nairobi')
+class MetricSeriesTestCase(APITestCase):
+	"""LTTB-downsampled chart series."""
+
+	def setUp(self):
+		User = get_user_model()
+		self.owner = User.objects.create_user(email='series-owner@example.com', password='Testpass123!')
+		self.farm = Farm.objects.create(owner=self.owner, name='Series farm', location='Thika', total_area=Decimal('2.00'))
+		values = [10, 11, 10, 12, 40, 11, 10, 9, 10, 11, 10, 2, 10, 11, 10, 12, 10, 11, 10, 15]
+		FarmMetric.objects.bulk_create(
+			FarmMetric(farm=self.farm, metric_type='temperature', value=Decimal(value), recorded_at=_at(1, hour))
+			for hour, value in enumerate(values)
+		)
+		self.url = reverse('metric-series')
+
+	def test_downsampled_series_keeps_endpoints_and_extremes(self):
+		self.client.force_authenticate(self.owner)
+		response = self.client.get(self.url, {'farm': self.farm.id, 'metric_type': 'temperature', 'points': 6})
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual((response.data['total'], response.data['points']), (20, 6))
+		series = response.data['series']
+		self.assertEqual(series[0]['recorded_at'], _at(1, 0))
+		self.assertEqual(series[-1]['value'], 15.0)
+		values = [point['value'] for point in series]
+		self.assertIn(40.0, values)
+		self.assertIn(2.0, values)
+		self.assertEqual([point['recorded_at'] for point in series], sorted(point['recorded_at'] for point in series))
+
+	def test_short_range_returns_raw_points_and_scopes_owner(self):
+		self.client.force_authenticate(self.owner)
+		response = self.client.get(
+			self.url,
+			{'farm': self.farm.id, 'metric_type': 'temperature', 'start': _at(1, 2).isoformat(), 'end': _at(1, 5).isoformat()},
+		)
+		self.assertEqual([point['value'] for point in response.data['series']], [10.0, 12.0, 40.0, 11.0])
+
+		stranger = get_user_model().objects.create_user(email='series-stranger@example.com', password='Testpass123!')
+		self.client.force_authenticate(stranger)
+		response = self.client.get(self.url, {'farm': self.farm.id, 'metric_type': 'temperature'})
+		self.assertEqual(response.data['series'], [])
+
+
+@override_settings(TIME_ZONE='Africa/Nairobi')
+class MetricAnomalyTestCase(APITestCase):
+	"""Robust rolling z-score scan notifying owners of outlying readings."""
+
+	def setUp(self):
+		self.owner = get_user_model().objects.create_user(email='anomaly-owner@example.com', password='Testpass123!')
+		self.farm = Farm.objects.create(owner=self.owner, name='Anomaly farm', location='Naivasha', total_area=Decimal('6.00'))
+		self.now = timezone.now()
+
+	def _series(self, metric_type, values, start_hours_ago):
+		FarmMetric.objects.bulk_create(
+			FarmMetric(
+				farm=self.farm, metric_type=metric_type, value=Decimal(value),
+				recorded_at=self.now - timedelta(hours=start_hours_ago - index),
+			)
+			for index, value in enumerate(values)
+		)
+
+	def test_spike_notifies_owner_once(self):
+		self._series('soil_ph', ['6.50', '6.52', '6.48', '6.51', '6.49', '6.50', '6.53', '6.47', '6.50', '6.51', '9.10'], 12)
+		self._series('yield', ['40.00', '1.00'], 6)
+
+		self.assertEqual(detect_metric_anomalies(), 1)
+		notification = Notification.objects.get(recipient=self.owner)
+		self.assertEqual(notification.category, 'analytics')
+		self.assertEqual(notification.metadata['metric_type'], 'soil_ph')
+		self.assertEqual(notification.metadata['value'], 9.1)
+		self.assertIn('spike', notification.title)
+		spike_at = self.now - timedelta(hours=2)
+		self.assertIn(f"at {timezone.localtime(spike_at):%Y-%m-%d %H:%M},", notification.message)
+
+		self.assertEqual(detect_metric_anomalies(), 0)
+		self._series('soil_ph', ['6.50'], 0)
+		self.assertEqual(detect_metric_anomalies(), 0)
+		self.assertEqual(Notification.objects.count(), 1)
+
+	def test_drop_in_stable_series(self):
+		self._series('moisture', ['30.00'] * 12 + ['12.00'], 14)
+		self.assertEqual(detect_metric_anomalies(), 1)
+		self.assertIn('drop', Notification.objects.get().title)
+
+
+class WarehouseTestCase(APITestCase):
+	"""Incremental star-schema load and the analyst reports that read from it."""
+
+	def setUp(self):
+		User = get_user_model()
+		self.owner = User.objects.create_user(email='warehouse-owner@example.com', password='Testpass123!')
+		self.analyst = User.objects.create_user(
+			email='warehouse-analyst@example.com', password='Testpass123!', role=User.Roles.ANALYST
+		)
+		self.farm = Farm.objects.create(owner=self.owner, name='Warehouse farm', location='Kitale', total_area=Decimal('8.00'))
+		self.field = Field.objects.create(farm=self.farm, field_name='North', field_number=1, area=Decimal('2.00'), current_crop='Maize')
+		self.harvest = Activity.objects.create(
+			field=self.field,
+			activity_type=Activity.ActivityType.HARVESTING,
+			date=date(2025, 3, 4),
+			quantity=Decimal('120.00'),
+			cost=Decimal('50.00'),
+		)
+		self.listing = Listing.objects.create(
+			farm=self.farm,
+			seller=self.owner,
+			title='White Maize',
+			description='Dry maize',
+			quantity=Decimal('100.00'),
+			price_per_unit=Decimal('45.00'),
+		)
+		self.url = lambda cube: reverse('warehouse-report', args=[cube])
+
+	def test_refresh_loads_facts_and_dimensions_incrementally(self):
+		loaded = refresh_warehouse()
+		self.assertEqual(loaded['farms'], 1)
+		self.assertEqual(loaded['activities'], 1)
+		self.assertEqual(loaded['inventory_movements'], InventoryTransaction.objects.count())
+
+		fact = FactActivity.objects.select_related('commodity', 'date').get(pk=self.harvest.pk)
+		self.assertEqual((fact.farm_id, fact.field_id, fact.cost), (self.farm.pk, self.field.pk, Decimal('50.00')))
+		self.assertEqual((fact.commodity.name, fact.date.quarter), ('maize', 1))
+		self.assertTrue(FactInventoryMovement.objects.filter(farm_id=self.farm.pk).exists())
+		self.assertEqual(FactListing.objects.get(pk=self.listing.pk).listed_value, Decimal('4500.00'))
+
+		self.harvest.cost = Decimal('75.00')
+		self.harvest.save()
+		self.farm.location = 'Eldoret'
+		self.farm.save()
+		refresh_warehouse(batch_size=1)
+		self.assertEqual(FactActivity.objects.get(pk=self.harvest.pk).cost, Decimal('75.00'))
+		self.assertEqual(DimFarm.objects.get(pk=self.farm.pk).location, 'Eldoret')
+
+	def test_late_committed_movement_is_picked_up_by_the_overlap(self):
+		refresh_warehouse()
+		movement = InventoryTransaction.objects.filter(item__farm=self.farm).latest('id')
+		mark = WarehouseWatermark.objects.get(source='inventory_movements')
+
+		# As if its transaction had committed after the load, stamped before the watermark.
+		FactInventoryMovement.objects.filter(pk=movement.pk).delete()
+		InventoryTransaction.objects.filter(pk=movement.pk).update(updated_at=mark.last_changed_at - timedelta(minutes=5))
+		refresh_warehouse()
+		self.assertTrue(FactInventoryMovement.objects.filter(pk=movement.pk).exists())
+
+	def test_prune_removes_deleted_rows(self):
+		refresh_warehouse()
+		self.listing.delete()
+		removed = prune_warehouse()
+		self.assertEqual(removed['listings'], 1)
+		self.assertFalse(FactListing.objects.filter(pk=self.listing.pk).exists())
+		self.assertTrue(FactActivity.objects.filter(pk=self.harvest.pk).exists())
+
+	def test_reports_are_limited_to_analysts(self):
+		refresh_warehouse()
+		self.client.force_authenticate(self.owner)
+		self.assertEqual(self.client.get(self.url('activities')).status_code, status.HTTP_403_FORBIDDEN)
+
+		self.client.force_authenticate(self.analyst)
+		response = self.client.get(self.url('activities'), {'group_by': 'year,commodity,activity_type'})
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(response.data['rows'][0]['year'], 2025)
+		self.assertEqual(response.data['rows'][0]['commodity'], 'maize')
+		self.assertEqual(response.data['rows'][0]['total_quantity'], Decimal('120.00'))
+
+		response = self.client.get(self.url('listings'), {'group_by': 'location,status', 'commodity': 'White  MAIZE'})
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(response.data['rows'], [
+			{'location': 'Kitale', 'status': 'active', 'listings': 1, 'total_quantity': Decimal('100.00'),
+			'total_listed_value': Decimal('4500.00'), 'average_price': Decimal('45.00')},
+		])
+
+	def test_unknown_report_or_dimension(self):
+		self.client.force_authenticate(self.analyst)
+		self.assertEqual(self.client.get(self.url('orders')).status_code, status.HTTP_404_NOT_FOUND)
+		response = self.client.get(self.url('inventory'), {'group_by': 'activity_type'})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertIn('group_by', response.data)
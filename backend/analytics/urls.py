@@ -3,7 +3,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import FarmAnalyticsSummaryView, FarmMetricViewSet
+from .views import FarmAnalyticsSummaryView, FarmMetricViewSet, WarehouseReportView
 
 router = DefaultRouter()
 router.register('metrics', FarmMetricViewSet, basename='metric')
@@ -11,4 +11,5 @@ router.register('metrics', FarmMetricViewSet, basename='metric')
 urlpatterns = [
     path('', include(router.urls)),
     path('summary/', FarmAnalyticsSummaryView.as_view(), name='farm-metric-summary'),
+    path('warehouse/<slug:cube>/', WarehouseReportView.as_view(), name='warehouse-report'),
 ]
@@ -1,13 +1,23 @@
 """Analytics API views."""
 
-from django.db.models import Avg, Count, Sum
-from rest_framework import permissions, viewsets
-from rest_framework.exceptions import PermissionDenied
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ParseError, PermissionDenied, UnsupportedMediaType, ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .ingest import INGEST_FORMATS, ingest_metrics
 from .models import FarmMetric
-from .serializers import FarmMetricSerializer
+from .serializers import (
+	FarmMetricSerializer,
+	MetricRollupQuerySerializer,
+	MetricSeriesQuerySerializer,
+	MetricSummaryQuerySerializer,
+	WarehouseReportQuerySerializer,
+)
+from .series import downsample_series
+from .services import can_view_all_farms, farm_metric_summary, metric_distribution, metric_rollups
+from .warehouse import WAREHOUSE_CUBES, warehouse_report
 
 
 class FarmMetricViewSet(viewsets.ModelViewSet):
@@ -29,25 +39,92 @@ class FarmMetricViewSet(viewsets.ModelViewSet):
 			raise PermissionDenied('You cannot submit metrics for another farmer.')
 		serializer.save()
 
+	@action(detail=False, methods=['post'], url_path='ingest')
+	def ingest(self, request):
+		"""Stream NDJSON or CSV readings into the metrics table through COPY.
+
+		Farm ownership is checked once per batch; rejected rows are reported by
+		line number while the rest of the stream is loaded.
+		"""
+
+		media_type = (request.content_type or '').split(';')[0].strip().lower()
+		if media_type not in INGEST_FORMATS:
+			raise UnsupportedMediaType(media_type, detail=f"Send {' or '.join(INGEST_FORMATS)}.")
+		default_farm = request.query_params.get('farm')
+		if default_farm is not None and not default_farm.isdigit():
+			raise ValidationError({'farm': 'farm must be a farm id.'})
+		if request.stream is None:
+			# Without Content-Length the body is never read, which would report an empty load.
+			if not request.META.get('CONTENT_LENGTH'):
+				return Response(
+					{'detail': 'Send the readings with a Content-Length header; chunked uploads are not supported.'},
+					status=status.HTTP_411_LENGTH_REQUIRED,
+				)
+			raise ParseError('The request body is empty.')
+
+		report = ingest_metrics(
+			request.stream,
+			INGEST_FORMATS[media_type],
+			user=request.user,
+			default_farm=int(default_farm) if default_farm else None,
+		)
+		return Response(report.as_dict())
+
+	@action(detail=False, methods=['get'], url_path='series')
+	def series(self, request):
+		"""Chart-ready series for one farm and metric, reduced with LTTB to the requested point count."""
+
+		params = MetricSeriesQuerySerializer(data=request.query_params)
+		params.is_valid(raise_exception=True)
+		options = params.validated_data
+		metrics = self.get_queryset().select_related(None).filter(farm_id=options['farm'], metric_type=options['metric_type'])
+		if options.get('start'):
+			metrics = metrics.filter(recorded_at__gte=options['start'])
+		if options.get('end'):
+			metrics = metrics.filter(recorded_at__lte=options['end'])
+		payload = downsample_series(metrics, options['points'])
+		return Response({'farm': options['farm'], 'metric_type': options['metric_type'], **payload})
+
+	@action(detail=False, methods=['get'], url_path='rollups')
+	def rollups(self, request):
+		"""Bucketed aggregates at the finest resolution that fits the requested point budget."""
+
+		params = MetricRollupQuerySerializer(data=request.query_params)
+		params.is_valid(raise_exception=True)
+		options = dict(params.validated_data)
+		return Response(metric_rollups(user=request.user, max_points=options.pop('points'), **options))
+
 
 class FarmAnalyticsSummaryView(APIView):
 	permission_classes = [permissions.IsAuthenticated]
 
 	def get(self, request):
-		qs = FarmMetric.objects.select_related('farm')
-		metric_type = request.query_params.get('metric_type')
-		if metric_type:
-			qs = qs.filter(metric_type=metric_type)
-		if not request.user.is_staff:
-			qs = qs.filter(farm__owner=request.user)
-
-		data = (
-			qs.values('farm__id', 'farm__name')
-			.annotate(
-				total_value=Sum('value'),
-				metric_count=Count('id'),
-				average_value=Avg('value'),
-			)
-			.order_by('farm__name')
-		)
-		return Response(list(data))
+		"""Per-farm totals, or distribution statistics when any statistic or range is requested."""
+
+		params = MetricSummaryQuerySerializer(data=request.query_params)
+		params.is_valid(raise_exception=True)
+		if params.wants_distribution:
+			return Response(metric_distribution(user=request.user, **params.validated_data))
+		return Response(farm_metric_summary(request.user, params.validated_data.get('metric_type')))
+
+
+
+class IsAnalyst(permissions.BasePermission):
+	def has_permission(self, request, view):
+		return bool(request.user and request.user.is_authenticated and can_view_all_farms(request.user))
+
+
+class WarehouseReportView(APIView):
+	permission_classes = [permissions.IsAuthenticated, IsAnalyst]
+
+	def get(self, request, cube):
+		"""Cross-farm aggregates of one warehouse fact table, grouped by the requested dimensions."""
+
+		if cube not in WAREHOUSE_CUBES:
+			raise NotFound(f"Unknown report; choose from {', '.join(WAREHOUSE_CUBES)}.")
+		params = WarehouseReportQuerySerializer(data=request.query_params)
+		params.is_valid(raise_exception=True)
+		try:
+			return Response(warehouse_report(cube, **params.validated_data))
+		except ValueError as exc:
+			raise ValidationError({'group_by': str(exc)})
@@ -0,0 +1,407 @@
+"""Star-schema analytics warehouse loaded incrementally from the operational tables.
+
+Facts for activities, inventory movements and listings share date, farm and
+commodity dimensions (activities also reference a field). The ETL copies the
+rows changed since each source's watermark in keyset batches and upserts
+them, so analyst reports aggregate the warehouse tables without touching the
+tables farmers write to.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Callable, Iterable
+
+from django.db import transaction
+from django.db.models import Aggregate, Avg, Count, Q, QuerySet, Sum
+from django.utils import timezone
+
+from farms.models import Activity, Farm, Field
+from inventory.models import InventoryTransaction
+from marketplace.models import Listing
+
+from .models import (
+    DimCommodity,
+    DimDate,
+    DimFarm,
+    DimField,
+    FactActivity,
+    FactInventoryMovement,
+    FactListing,
+    WarehouseWatermark,
+)
+
+WAREHOUSE_BATCH_SIZE = 5000
+# Rows whose change committed late with an older ``updated_at`` are picked up
+# by re-reading this much history at the start of every run; upserts make the
+# re-read idempotent.
+WAREHOUSE_OVERLAP = timedelta(minutes=10)
+WAREHOUSE_MAX_ROWS = 5000
+
+CROPS = Listing.Category.CROPS
+
+
+def _commodity_key(name: str, category: str) -> tuple[str, str] | None:
+    name = ' '.join((name or '').lower().split())[:255]
+    return (category, name) if name else None
+
+
+def _ensure_dates(days: Iterable[date]) -> None:
+    DimDate.objects.bulk_create(
+        [
+            DimDate(
+                date=day,
+                year=day.year,
+                quarter=(day.month - 1) // 3 + 1,
+                month=day.month,
+                iso_year=day.isocalendar()[0],
+                iso_week=day.isocalendar()[1],
+                day_of_week=day.isoweekday(),
+            )
+            for day in set(days)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _ensure_commodities(keys: Iterable[tuple[str, str] | None]) -> dict[tuple[str, str], int]:
+    keys = {key for key in keys if key}
+    if not keys:
+        return {}
+    DimCommodity.objects.bulk_create(
+        [DimCommodity(category=category, name=name) for category, name in keys],
+        ignore_conflicts=True,
+    )
+    lookup = Q()
+    for category, name in keys:
+        lookup |= Q(category=category, name=name)
+    return {(category, name): pk for pk, category, name in DimCommodity.objects.filter(lookup).values_list('id', 'category', 'name')}
+
+
+def _upsert(model, rows: list) -> None:
+    update_fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+    model.objects.bulk_create(rows, update_conflicts=True, unique_fields=['id'], update_fields=update_fields, batch_size=1000)
+
+
+def _load_dimension(model, rows: list[dict]) -> None:
+    columns = {field.attname for field in model._meta.concrete_fields}
+    _upsert(model, [model(**{key: value for key, value in row.items() if key in columns}) for row in rows])
+
+
+def _load_activities(rows: list[dict]) -> None:
+    _ensure_dates(row['date'] for row in rows)
+    commodities = _ensure_commodities(_commodity_key(row['field__current_crop'], CROPS) for row in rows)
+    _upsert(
+        FactActivity,
+        [
+            FactActivity(
+                id=row['id'],
+                date_id=row['date'],
+                farm_id=row['field__farm_id'],
+                field_id=row['field_id'],
+                commodity_id=commodities.get(_commodity_key(row['field__current_crop'], CROPS)),
+                activity_type=row['activity_type'],
+                quantity=row['quantity'],
+                unit=row['unit'],
+                cost=row['cost'],
+            )
+            for row in rows
+        ],
+    )
+
+
+def _load_movements(rows: list[dict]) -> None:
+    days = {row['id']: timezone.localdate(row['transaction_date']) for row in rows}
+    _ensure_dates(days.values())
+    commodities = _ensure_commodities(_commodity_key(row['item__name'], row['item__category']) for row in rows)
+    facts = []
+    for row in rows:
+        price = row['item__selling_price'] or row['item__purchase_price']
+        facts.append(
+            FactInventoryMovement(
+                id=row['id'],
+                date_id=days[row['id']],
+                farm_id=row['item__farm_id'],
+                commodity_id=commodities.get(_commodity_key(row['item__name'], row['item__category'])),
+                item_id=row['item_id'],
+                transaction_type=row['transaction_type'],
+                quantity_change=row['quantity_change'],
+                unit=row['item__unit'],
+                value=(row['quantity_change'] * price).quantize(Decimal('0.01')) if price else None,
+            )
+        )
+    _upsert(FactInventoryMovement, facts)
+
+
+def _listing_commodity(row: dict) -> tuple[str, str] | None:
+    return _commodity_key(row['fair_price_commodity'] or row['title'], row['category'])
+
+
+def _load_listings(rows: list[dict]) -> None:
+    days = {row['id']: timezone.localdate(row['created_at']) for row in rows}
+    _ensure_dates(days.values())
+    commodities = _ensure_commodities(_listing_commodity(row) for row in rows)
+    _upsert(
+        FactListing,
+        [
+            FactListing(
+                id=row['id'],
+                date_id=days[row['id']],
+                farm_id=row['farm_id'],
+                commodity_id=commodities.get(_listing_commodity(row)),
+                category=row['category'],
+                quality_grade=row['quality_grade'],
+                status=row['status'],
+                quantity=row['quantity'],
+                unit=row['unit'],
+                price_per_unit=row['price_per_unit'],
+                listed_value=(row['quantity'] * row['price_per_unit']).quantize(Decimal('0.01')),
+            )
+            for row in rows
+        ],
+    )
+
+
+@dataclass(frozen=True)
+class WarehouseSource:
+    """Operational table feeding the warehouse.
+
+    ``changed_field`` is the row's last-modified timestamp. Ids alone are not a
+    safe cursor: a transaction holding a lower id can commit after a higher
+    one was loaded, so every source is read by ``(changed_field, id)`` with
+    the overlap window.
+    """
+
+    rows: QuerySet
+    changed_field: str
+    load: Callable[[list[dict]], None]
+    fact: type | None = None
+
+
+# Loaded in this order so dimensions land before the facts that reference them.
+WAREHOUSE_SOURCES = {
+    'farms': WarehouseSource(
+        Farm.objects.values(
+            'id', 'owner_id', 'name', 'location', 'soil_type', 'irrigation_type', 'total_area', 'is_active', 'updated_at'
+        ),
+        'updated_at',
+        lambda rows: _load_dimension(DimFarm, rows),
+    ),
+    'fields': WarehouseSource(
+        Field.objects.values(
+            'id', 'farm_id', 'field_name', 'field_number', 'area', 'current_crop', 'is_active', 'updated_at'
+        ),
+        'updated_at',
+        lambda rows: _load_dimension(DimField, rows),
+    ),
+    'activities': WarehouseSource(
+        Activity.objects.values(
+            'id', 'field_id', 'field__farm_id', 'field__current_crop', 'activity_type', 'date', 'quantity', 'unit',
+            'cost', 'updated_at',
+        ),
+        'updated_at',
+        _load_activities,
+        FactActivity,
+    ),
+    'inventory_movements': WarehouseSource(
+        InventoryTransaction.objects.values(
+            'id', 'item_id', 'item__farm_id', 'item__name', 'item__category', 'item__unit', 'item__selling_price',
+            'item__purchase_price', 'transaction_type', 'quantity_change', 'transaction_date', 'updated_at',
+        ),
+        'updated_at',
+        _load_movements,
+        FactInventoryMovement,
+    ),
+    'listings': WarehouseSource(
+        Listing.objects.values(
+            'id', 'farm_id', 'title', 'fair_price_commodity', 'category', 'quality_grade', 'status', 'quantity', 'unit',
+            'price_per_unit', 'created_at', 'updated_at',
+        ),
+        'updated_at',
+        _load_listings,
+        FactListing,
+    ),
+}
+
+
+def _refresh_source(name: str, source: WarehouseSource, batch_size: int) -> int:
+    """Copy rows of one source changed since its watermark, ``batch_size`` at a time.
+
+    Batches are read in ``(changed_field, id)`` keyset order, and each batch is
+    loaded and the watermark advanced in one transaction, so an interrupted run
+    resumes where it stopped.
+    """
+
+    watermark, _ = WarehouseWatermark.objects.get_or_create(source=name)
+    changed_after = watermark.last_changed_at - WAREHOUSE_OVERLAP if watermark.last_changed_at else None
+    last_id = 0
+    processed = 0
+    while True:
+        rows = source.rows.all()
+        if changed_after is not None:
+            rows = rows.filter(
+                Q(**{f"{source.changed_field}__gt": changed_after})
+                | Q(**{source.changed_field: changed_after, 'id__gt': last_id})
+            )
+        rows = rows.order_by(source.changed_field, 'id')
+        batch = list(rows[:batch_size])
+        if not batch:
+            WarehouseWatermark.objects.filter(source=name).update(updated_at=timezone.now())
+            return processed
+
+        last_id = batch[-1]['id']
+        changed_after = batch[-1][source.changed_field]
+        with transaction.atomic():
+            source.load(batch)
+            WarehouseWatermark.objects.filter(source=name).update(
+                last_changed_at=changed_after, last_id=last_id, updated_at=timezone.now()
+            )
+        processed += len(batch)
+
+
+def refresh_warehouse(batch_size: int = WAREHOUSE_BATCH_SIZE) -> dict[str, int]:
+    """Load every source's changes into the warehouse; returns rows copied per source."""
+
+    return {name: _refresh_source(name, source, batch_size) for name, source in WAREHOUSE_SOURCES.items()}
+
+
+def prune_warehouse() -> dict[str, int]:
+    """Drop facts and dimension rows whose operational rows were deleted.
+
+    Deletes leave nothing behind for the change watermarks to see, so this
+    anti-join sweep runs separately on a slower schedule.
+    """
+
+    removed = {}
+    for name, source in WAREHOUSE_SOURCES.items():
+        if source.fact is not None:
+            removed[name], _ = source.fact.objects.exclude(id__in=source.rows.values('id')).delete()
+    removed['fields'], _ = DimField.objects.exclude(id__in=Field.objects.values('id')).delete()
+    removed['farms'], _ = DimFarm.objects.exclude(id__in=Farm.objects.values('id')).delete()
+    return removed
+
+
+def warehouse_freshness() -> dict:
+    """When each source was last checked for changes."""
+
+    marks = WarehouseWatermark.objects.values_list('source', 'updated_at')
+    return {source: loaded_at for source, loaded_at in marks}
+
+
+_SHARED_DIMENSIONS = {
+    'year': 'date__year',
+    'quarter': 'date__quarter',
+    'month': 'date__month',
+    'iso_week': 'date__iso_week',
+    'date': 'date',
+    'farm': 'farm_id',
+    'farm_name': 'farm__name',
+    'location': 'farm__location',
+    'soil_type': 'farm__soil_type',
+    'irrigation_type': 'farm__irrigation_type',
+    'commodity': 'commodity__name',
+    'commodity_category': 'commodity__category',
+}
+
+
+@dataclass(frozen=True)
+class WarehouseCube:
+    fact: type
+    dimensions: dict[str, str]
+    measures: dict[str, Aggregate]
+
+
+WAREHOUSE_CUBES = {
+    'activities': WarehouseCube(
+        FactActivity,
+        {
+            **_SHARED_DIMENSIONS,
+            'field': 'field_id',
+            'field_name': 'field__field_name',
+            'activity_type': 'activity_type',
+            'unit': 'unit',
+        },
+        {
+            'activities': Count('id'),
+            'total_quantity': Sum('quantity'),
+            'total_cost': Sum('cost'),
+        },
+    ),
+    'inventory': WarehouseCube(
+        FactInventoryMovement,
+        {**_SHARED_DIMENSIONS, 'transaction_type': 'transaction_type', 'unit': 'unit'},
+        {
+            'movements': Count('id'),
+            'quantity_in': Sum('quantity_change', filter=Q(quantity_change__gt=0)),
+            'quantity_out': Sum('quantity_change', filter=Q(quantity_change__lt=0)),
+            'total_value': Sum('value'),
+        },
+    ),
+    'listings': WarehouseCube(
+        FactListing,
+        {
+            **_SHARED_DIMENSIONS,
+            'category': 'category',
+            'quality_grade': 'quality_grade',
+            'status': 'status',
+            'unit': 'unit',
+        },
+        {
+            'listings': Count('id'),
+            'total_quantity': Sum('quantity'),
+            'total_listed_value': Sum('listed_value'),
+            'average_price': Avg('price_per_unit'),
+        },
+    ),
+}
+
+
+def warehouse_report(
+    cube: str,
+    *,
+    group_by: Iterable[str] = (),
+    start: date | None = None,
+    end: date | None = None,
+    farm: int | None = None,
+    commodity: str | None = None,
+) -> dict:
+    """Aggregate one fact table by the requested dimensions, reading warehouse tables only.
+
+    Raises ``KeyError`` for an unknown cube and ``ValueError`` for dimensions
+    the cube does not have.
+    """
+
+    definition = WAREHOUSE_CUBES[cube]
+    group_by = list(dict.fromkeys(group_by))
+    unknown = [name for name in group_by if name not in definition.dimensions]
+    if unknown:
+        raise ValueError(f"Unknown dimension(s) {', '.join(unknown)}; choose from {', '.join(definition.dimensions)}.")
+
+    facts = definition.fact.objects.order_by()
+    if start:
+        facts = facts.filter(date__gte=start)
+    if end:
+        facts = facts.filter(date__lte=end)
+    if farm:
+        facts = facts.filter(farm_id=farm)
+    if commodity:
+        facts = facts.filter(commodity__name=' '.join(commodity.lower().split()))
+
+    if group_by:
+        paths = [definition.dimensions[name] for name in group_by]
+        grouped = facts.values(*paths).annotate(**definition.measures).order_by(*paths)[:WAREHOUSE_MAX_ROWS + 1]
+        rows = [
+            {**{name: row.pop(path) for name, path in zip(group_by, paths)}, **row}
+            for row in grouped
+        ]
+    else:
+        rows = [facts.aggregate(**definition.measures)]
+    return {
+        'cube': cube,
+        'group_by': group_by,
+        'rows': rows[:WAREHOUSE_MAX_ROWS],
+        'truncated': len(rows) > WAREHOUSE_MAX_ROWS,
+        'loaded_at': warehouse_freshness(),
+    }
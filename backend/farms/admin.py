@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Activity, Farm, Field
+from .models import Activity, Farm, Field, Region
 
 
 class FieldInline(admin.TabularInline):
@@ -10,11 +10,19 @@ class FieldInline(admin.TabularInline):
 	show_change_link = True
 
 
+@admin.register(Region)
+class RegionAdmin(admin.ModelAdmin):
+	list_display = ('name', 'level', 'parent', 'path')
+	search_fields = ('name', 'aliases')
+	list_filter = ('level',)
+	readonly_fields = ('path',)
+
+
 @admin.register(Farm)
 class FarmAdmin(admin.ModelAdmin):
 	list_display = ('name', 'owner', 'location', 'total_area', 'soil_type', 'irrigation_type', 'is_active', 'created_at')
 	search_fields = ('name', 'location', 'owner__email')
-	list_filter = ('soil_type', 'irrigation_type', 'is_active')
+	list_filter = ('soil_type', 'irrigation_type', 'is_active', 'region')
 	inlines = [FieldInline]
 
 
@@ -0,0 +1,133 @@
+"""Geohash helpers for proximity search without PostGIS."""
+
+from __future__ import annotations
+
+import math
+from decimal import Decimal
+
+from django.db.models import F, FloatField, Q, QuerySet, Value
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
+
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude: float | Decimal, longitude: float | Decimal, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a coordinate into a base32 geohash of ``precision`` characters."""
+
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars: list[str] = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        target, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if target >= middle:
+            bits = (bits << 1) | 1
+            bounds[0] = middle
+        else:
+            bits <<= 1
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """Return the (height, width) in degrees of a geohash cell at ``precision``."""
+
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 - lng_bits
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> list[str]:
+    """Geohash prefixes whose 3x3 block around the point contains the whole radius.
+
+    Picks the finest precision whose cells are at least as large as the radius,
+    so the centre cell plus its eight neighbours cover the search circle. An
+    empty list means the radius is too large for prefix pruning to help.
+    """
+
+    lat_span = radius_km / KM_PER_DEGREE
+    lng_span = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    precision = 0
+    for candidate in range(1, GEOHASH_PRECISION + 1):
+        height, width = cell_size(candidate)
+        if height < lat_span or width < lng_span:
+            break
+        precision = candidate
+    if not precision:
+        return []
+
+    height, width = cell_size(precision)
+    cells = set()
+    for lat_step in (-1, 0, 1):
+        for lng_step in (-1, 0, 1):
+            lat = min(max(latitude + lat_step * height, -90.0), 90.0)
+            lng = (longitude + lng_step * width + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(lat, lng, precision))
+    return sorted(cells)
+
+
+def parse_near(value: str) -> tuple[float, float]:
+    """Parse a ``lat,lng`` query value, raising ``ValueError`` when malformed."""
+
+    try:
+        latitude, longitude = (float(part) for part in value.split(','))
+    except (TypeError, ValueError):
+        raise ValueError('near must be formatted as "lat,lng".')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('near is outside valid latitude/longitude bounds.')
+    return latitude, longitude
+
+
+def haversine_km(lat_field: str, lng_field: str, latitude: float, longitude: float):
+    """Great-circle distance in kilometres from a point to the given coordinate fields."""
+
+    row_lat = Radians(Cast(F(lat_field), FloatField()))
+    row_lng = Radians(Cast(F(lng_field), FloatField()))
+    origin_lat = math.radians(latitude)
+    origin_lng = math.radians(longitude)
+    half_chord = (
+        Power(Sin((row_lat - Value(origin_lat)) / 2), 2)
+        + Value(math.cos(origin_lat)) * Cos(row_lat) * Power(Sin((row_lng - Value(origin_lng)) / 2), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(half_chord), Value(1.0)))
+
+
+def within_radius(
+    queryset: QuerySet,
+    *,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    geohash_field: str = 'geohash',
+    lat_field: str = 'latitude',
+    lng_field: str = 'longitude',
+) -> QuerySet:
+    """Filter to rows within ``radius_km`` and annotate ``distance_km``.
+
+    Candidates are pruned with ``LIKE 'prefix%'`` on the indexed geohash
+    column before the exact haversine check runs on the survivors.
+    """
+
+    cells = covering_cells(latitude, longitude, radius_km)
+    if cells:
+        prefix_filter = Q()
+        for cell in cells:
+            prefix_filter |= Q(**{f"{geohash_field}__startswith": cell})
+        queryset = queryset.filter(prefix_filter)
+    return queryset.annotate(distance_km=haversine_km(lat_field, lng_field, latitude, longitude)).filter(
+        distance_km__lte=radius_km
+    )
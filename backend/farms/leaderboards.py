@@ -0,0 +1,291 @@
+"""Per-region leaderboards kept in a sorted-set store.
+
+Two boards exist for every region and year: harvest yield per hectare by
+farm, and sales revenue by seller. Harvests and orders increment the boards
+of the farm's region and all of its ancestors as they are committed, so a
+county board also ranks the farms of its sub-counties. ``rebuild_leaderboards``
+recomputes a year from the database to correct drift from edits and deletes;
+increments that land while it runs are journaled and replayed onto the
+rebuilt boards, so they are not overwritten by the older snapshot.
+
+The store is Redis (``ZINCRBY``/``ZREVRANGE``) when ``LEADERBOARD_URL`` is
+configured and an in-process stand-in otherwise.
+"""
+
+from __future__ import annotations
+
+import heapq
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Activity, Farm, Region
+
+BOARDS = ('yield', 'sellers')
+LEADERBOARD_DEFAULT_LIMIT = 10
+LEADERBOARD_MAX_LIMIT = 100
+_KEY = 'leaderboard:{board}:{year}:{region}'
+_REBUILD_KEY = 'leaderboard:rebuild'
+# Bounds how long a crashed rebuild keeps increments journaled.
+LEADERBOARD_REBUILD_TIMEOUT = 60 * 60
+
+
+def leaderboard_key(board: str, year: int, region_id: int) -> str:
+    return _KEY.format(board=board, year=year, region=region_id)
+
+
+class LocalLeaderboardStore:
+    """Thread-safe in-memory stand-in for a Redis sorted-set store."""
+
+    def __init__(self):
+        self._sets: dict[str, dict[str, float]] = defaultdict(dict)
+        self._journal: dict[str, dict[str, float]] | None = None
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, member: str, amount: float) -> None:
+        with self._lock:
+            targets = [self._sets[key]]
+            if self._journal is not None:
+                targets.append(self._journal.setdefault(key, {}))
+            for members in targets:
+                members[member] = members.get(member, 0.0) + amount
+
+    @contextmanager
+    def rebuilding(self):
+        with self._lock:
+            if self._journal is not None:
+                raise RuntimeError('A leaderboard rebuild is already running.')
+            self._journal = {}
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._journal = None
+
+    def replace(self, key: str, scores: dict[str, float]) -> None:
+        with self._lock:
+            members = dict(scores)
+            for member, amount in (self._journal or {}).get(key, {}).items():
+                members[member] = members.get(member, 0.0) + amount
+            self._sets[key] = members
+
+    def top(self, key: str, limit: int) -> list[tuple[str, float]]:
+        with self._lock:
+            members = list(self._sets.get(key, {}).items())
+        return heapq.nlargest(limit, members, key=lambda item: (item[1], item[0]))
+
+    def flush(self) -> None:
+        with self._lock:
+            self._sets.clear()
+
+
+# While a rebuild runs every increment is also added to the board's journal,
+# in the same script so it cannot fall between a rebuild's swap and replay.
+_INCR_SCRIPT = """
+if redis.call('exists', KEYS[3]) == 1 then
+    redis.call('zincrby', KEYS[2], ARGV[1], ARGV[2])
+end
+return redis.call('zincrby', KEYS[1], ARGV[1], ARGV[2])
+"""
+
+
+class RedisLeaderboardStore:
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._incr = self._client.register_script(_INCR_SCRIPT)
+
+    def incr(self, key: str, member: str, amount: float) -> None:
+        self._incr(keys=[key, f"{key}:journal", _REBUILD_KEY], args=[amount, member])
+
+    def _drop_journals(self) -> None:
+        keys = list(self._client.scan_iter(match=_KEY.format(board='*', year='*', region='*') + ':journal'))
+        if keys:
+            self._client.delete(*keys)
+
+    @contextmanager
+    def rebuilding(self):
+        if not self._client.set(_REBUILD_KEY, 1, nx=True, ex=LEADERBOARD_REBUILD_TIMEOUT):
+            raise RuntimeError('A leaderboard rebuild is already running.')
+        self._drop_journals()
+        try:
+            yield
+        finally:
+            self._client.delete(_REBUILD_KEY)
+            self._drop_journals()
+
+    def replace(self, key: str, scores: dict[str, float]) -> None:
+        # Build aside and swap in one transaction so readers never see a
+        # half-written board; the union adds the increments journaled since
+        # the rebuild read the database.
+        staging = f"{key}:rebuild"
+        with self._client.pipeline() as pipe:
+            pipe.delete(staging)
+            if scores:
+                pipe.zadd(staging, scores)
+            pipe.zunionstore(key, [staging, f"{key}:journal"])
+            pipe.delete(staging)
+            pipe.execute()
+
+    def top(self, key: str, limit: int) -> list[tuple[str, float]]:
+        return [(member.decode(), score) for member, score in self._client.zrevrange(key, 0, limit - 1, withscores=True)]
+
+    def flush(self) -> None:
+        keys = list(self._client.scan_iter(match=_KEY.format(board='*', year='*', region='*')))
+        if keys:
+            self._client.delete(*keys)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def leaderboard_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                url = getattr(settings, 'LEADERBOARD_URL', '')
+                _store = RedisLeaderboardStore(url) if url else LocalLeaderboardStore()
+    return _store
+
+
+def _region_path(region_id: int | None) -> list[int]:
+    if not region_id:
+        return []
+    path = Region.objects.filter(pk=region_id).values_list('path', flat=True).first() or ''
+    return [int(part) for part in path.strip('/').split('/') if part]
+
+
+def _increment(board: str, year: int, region_id: int | None, member: int, amount: float) -> None:
+    regions = _region_path(region_id)
+    if not regions or not amount:
+        return
+
+    def apply():
+        store = leaderboard_store()
+        for region in regions:
+            store.incr(leaderboard_key(board, year, region), str(member), amount)
+
+    transaction.on_commit(apply)
+
+
+def harvest_kilograms(activity: Activity) -> Decimal | None:
+    from marketplace.services import unit_in_kilograms  # Local import to avoid circulars
+
+    factor = unit_in_kilograms(activity.unit or '')
+    return Decimal(activity.quantity) * factor if factor is not None else None
+
+
+def record_harvest(activity: Activity) -> None:
+    """Add a newly logged harvest to the yield-per-hectare boards of its farm's regions."""
+
+    farm = activity.field.farm
+    kilograms = harvest_kilograms(activity)
+    if kilograms is None or not farm.total_area:
+        return
+    _increment('yield', activity.date.year, farm.region_id, farm.pk, float(kilograms / farm.total_area))
+
+
+def record_sale(order, sign: int = 1) -> None:
+    """Add (or with ``sign=-1`` withdraw) an order's value on its seller's sales boards."""
+
+    listing = order.listing
+    region_id = Farm.objects.filter(pk=listing.farm_id).values_list('region_id', flat=True).first()
+    _increment('sellers', order.created_at.year, region_id, listing.seller_id, sign * float(order.total_price))
+
+
+def _subtree_scores(rows: Iterable[tuple[str, int, float]]) -> dict[int, dict[str, float]]:
+    """Spread ``(region path, member, score)`` rows onto every region of each path."""
+
+    boards: dict[int, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for path, member, score in rows:
+        for region in (int(part) for part in path.strip('/').split('/') if part):
+            boards[region][str(member)] += float(score)
+    return boards
+
+
+def rebuild_leaderboards(year: int | None = None) -> int:
+    """Recompute both boards of ``year`` (default: this year) for every region; returns boards written.
+
+    Journaling starts before the database is read, so an increment committed
+    after the read is replayed onto the rebuilt board instead of lost.
+    """
+
+    year = year or timezone.localdate().year
+    store = leaderboard_store()
+    with store.rebuilding():
+        return _rebuild_year(store, year)
+
+
+def _rebuild_year(store, year: int) -> int:
+    from marketplace.models import Order  # Local import to avoid circulars
+    from marketplace.services import unit_in_kilograms
+
+    harvests = (
+        Activity.objects.filter(
+            activity_type=Activity.ActivityType.HARVESTING,
+            date__year=year,
+            field__farm__region__isnull=False,
+            field__farm__total_area__gt=0,
+        )
+        .values('field__farm_id', 'field__farm__region__path', 'field__farm__total_area', 'unit')
+        .annotate(total_quantity=Sum('quantity'))
+        .order_by()
+    )
+    yield_rows = []
+    for row in harvests:
+        factor = unit_in_kilograms(row['unit'] or '')
+        if factor is not None:
+            per_hectare = row['total_quantity'] * factor / row['field__farm__total_area']
+            yield_rows.append((row['field__farm__region__path'], row['field__farm_id'], per_hectare))
+
+    sales = (
+        Order.objects.exclude(status=Order.Status.CANCELLED)
+        .filter(created_at__year=year, listing__farm__region__isnull=False)
+        .values(path=F('listing__farm__region__path'), seller=F('listing__seller_id'))
+        .annotate(total=Sum('total_price'))
+        .order_by()
+    )
+    sales_rows = [(row['path'], row['seller'], row['total']) for row in sales]
+
+    written = 0
+    for board, rows in (('yield', yield_rows), ('sellers', sales_rows)):
+        boards = _subtree_scores(rows)
+        for region_id in Region.objects.values_list('id', flat=True):
+            store.replace(leaderboard_key(board, year, region_id), boards.get(region_id, {}))
+            written += 1
+    return written
+
+
+def leaderboard(board: str, region: Region, *, year: int | None = None, limit: int = LEADERBOARD_DEFAULT_LIMIT) -> list[dict]:
+    """Top entries of one board with farm or seller details attached."""
+
+    year = year or timezone.localdate().year
+    entries = leaderboard_store().top(leaderboard_key(board, year, region.pk), limit)
+    ids = [int(member) for member, _score in entries]
+    if board == 'yield':
+        names = dict(Farm.objects.filter(pk__in=ids).values_list('id', 'name'))
+        label = 'farm'
+    else:
+        from users.models import CustomUser
+
+        names = {
+            pk: ' '.join(part for part in (first, last) if part) or email
+            for pk, first, last, email in CustomUser.objects.filter(pk__in=ids).values_list(
+                'id', 'first_name', 'last_name', 'email'
+            )
+        }
+        label = 'seller'
+    return [
+        {'rank': rank, label: member, 'name': names.get(member, ''), 'score': round(score, 3)}
+        for rank, (member, (_raw, score)) in enumerate(zip(ids, entries), start=1)
+    ]
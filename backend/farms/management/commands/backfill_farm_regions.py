@@ -0,0 +1,31 @@
+"""Assign regions to farms from their free-text locations."""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from farms.models import Farm
+from farms.regions import region_matcher
+
+
+class Command(BaseCommand):
+    help = 'Match farm locations to regions, with one UPDATE per distinct location.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help='Also rematch farms that already have a region.')
+
+    def handle(self, *args, **options):
+        farms = Farm.objects.all()
+        if not options['overwrite']:
+            farms = farms.filter(region__isnull=True)
+        matcher = region_matcher()
+        updated = unmatched = 0
+        with transaction.atomic():
+            for location in farms.order_by().values_list('location', flat=True).distinct():
+                region_id = matcher.match(location)
+                if region_id is None:
+                    unmatched += farms.filter(location=location).count()
+                    continue
+                updated += farms.filter(location=location).exclude(region_id=region_id).update(region_id=region_id)
+        self.stdout.write(f"Assigned regions to {updated} farms; {unmatched} farms have unrecognised locations")
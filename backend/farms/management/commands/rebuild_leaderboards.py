@@ -0,0 +1,19 @@
+"""Recompute regional yield and seller leaderboards from the database."""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from farms.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-region yield and seller leaderboards for one or more years.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('years', nargs='*', type=int, help='Years to rebuild (default: the current year).')
+
+    def handle(self, *args, **options):
+        for year in options['years'] or [None]:
+            written = rebuild_leaderboards(year)
+            self.stdout.write(f"Rebuilt {written} leaderboards for {year or 'the current year'}")
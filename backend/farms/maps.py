@@ -0,0 +1,167 @@
+"""Server-side map clustering for farms and marketplace listings."""
+
+from __future__ import annotations
+
+import math
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q
+from django.db.models.functions import Left
+from django.utils import timezone
+
+from marketplace.models import Listing
+
+from .geo import GEOHASH_PRECISION, cell_size
+from .models import Farm
+
+CLUSTER_CACHE_TIMEOUT = 60 * 5
+MAX_CELLS_PER_AXIS = 8
+CELLS_PER_TILE = 4
+MAX_ZOOM = 22
+
+
+def parse_bbox(value: str) -> tuple[float, float, float, float]:
+    """Parse ``min_lng,min_lat,max_lng,max_lat``, raising ``ValueError`` when malformed."""
+
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in value.split(','))
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError('bbox must be formatted as "min_lng,min_lat,max_lng,max_lat".')
+    if not (-180 <= min_lng < max_lng <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise ValueError('bbox is outside valid bounds or its corners are swapped.')
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def cluster_precision(zoom: int, bbox: tuple[float, float, float, float]) -> int:
+    """Geohash precision giving about ``CELLS_PER_TILE`` cells per map tile.
+
+    The precision is lowered further whenever the bounding box would touch more
+    than ``MAX_CELLS_PER_AXIS`` cells on either axis, so a response carries at
+    most ``MAX_CELLS_PER_AXIS ** 2`` clusters whatever the viewport size.
+    """
+
+    min_lng, min_lat, max_lng, max_lat = bbox
+    tile_width = 360.0 / (2 ** zoom)
+    precision = 1
+    for candidate in range(1, GEOHASH_PRECISION + 1):
+        if cell_size(candidate)[1] < tile_width / CELLS_PER_TILE:
+            break
+        precision = candidate
+    while precision > 1:
+        height, width = cell_size(precision)
+        lng_cells = math.ceil((max_lng + 180) / width) - math.floor((min_lng + 180) / width)
+        lat_cells = math.ceil((max_lat + 90) / height) - math.floor((min_lat + 90) / height)
+        if lng_cells <= MAX_CELLS_PER_AXIS and lat_cells <= MAX_CELLS_PER_AXIS:
+            break
+        precision -= 1
+    return precision
+
+
+def _snap_bbox(bbox: tuple[float, float, float, float], precision: int) -> tuple[float, float, float, float]:
+    """Expand the box to whole cells so nearby viewports share a cache entry."""
+
+    height, width = cell_size(precision)
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return (
+        max(math.floor((min_lng + 180) / width) * width - 180, -180.0),
+        max(math.floor((min_lat + 90) / height) * height - 90, -90.0),
+        min(math.ceil((max_lng + 180) / width) * width - 180, 180.0),
+        min(math.ceil((max_lat + 90) / height) * height - 90, 90.0),
+    )
+
+
+def _cluster_rows(queryset, precision: int, bbox, lat_field: str, lng_field: str, **extra_aggregates) -> list[dict]:
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return list(
+        queryset.filter(
+            **{
+                f"{lat_field}__gte": min_lat,
+                f"{lat_field}__lte": max_lat,
+                f"{lng_field}__gte": min_lng,
+                f"{lng_field}__lte": max_lng,
+            }
+        )
+        .exclude(geohash='')
+        .annotate(cell=Left('geohash', precision))
+        .values('cell')
+        .annotate(count=Count('id'), centroid_lat=Avg(lat_field), centroid_lng=Avg(lng_field), **extra_aggregates)
+        .order_by()
+    )
+
+
+def _listing_clusters(precision: int, bbox) -> list[dict]:
+    key = f"maps:clusters:listings:{precision}:" + ':'.join(f"{edge:.6f}" for edge in bbox)
+    rows = cache.get(key)
+    if rows is None:
+        categories = {
+            value: Count('id', filter=Q(category=value)) for value in Listing.Category.values
+        }
+        rows = _cluster_rows(
+            # Listings past expires_at stay ACTIVE until Listing.expire_outdated() runs.
+            Listing.objects.filter(status=Listing.Status.ACTIVE, expires_at__gt=timezone.now()),
+            precision,
+            bbox,
+            'farm__latitude',
+            'farm__longitude',
+            **categories,
+        )
+        cache.set(key, rows, CLUSTER_CACHE_TIMEOUT)
+    return rows
+
+
+def _farm_clusters(user, precision: int, bbox) -> list[dict]:
+    scope = 'all' if user.is_staff else f"owner-{user.pk}"
+    key = f"maps:clusters:farms:{scope}:{precision}:" + ':'.join(f"{edge:.6f}" for edge in bbox)
+    rows = cache.get(key)
+    if rows is None:
+        farms = Farm.objects.filter(is_active=True)
+        if not user.is_staff:
+            farms = farms.filter(owner=user)
+        rows = _cluster_rows(farms, precision, bbox, 'latitude', 'longitude')
+        cache.set(key, rows, CLUSTER_CACHE_TIMEOUT)
+    return rows
+
+
+def map_clusters(user, bbox: tuple[float, float, float, float], zoom: int) -> dict:
+    """Aggregate farms and active listings into geohash-cell clusters.
+
+    Counts, centroids and per-category listing counts are computed with one
+    ``GROUP BY left(geohash, p)`` query per layer; only one row per cell
+    reaches Python. Public listing clusters are shared between users, while
+    farm clusters are scoped to what the user may see.
+    """
+
+    zoom = max(0, min(zoom, MAX_ZOOM))
+    precision = cluster_precision(zoom, bbox)
+    snapped = _snap_bbox(bbox, precision)
+
+    clusters: dict[str, dict] = {}
+
+    def _cell(row: dict) -> dict:
+        return clusters.setdefault(
+            row['cell'],
+            {'cell': row['cell'], 'farms': 0, 'listings': 0, 'categories': {}, '_points': []},
+        )
+
+    for row in _farm_clusters(user, precision, snapped):
+        cluster = _cell(row)
+        cluster['farms'] = row['count']
+        cluster['_points'].append((row['count'], row['centroid_lat'], row['centroid_lng']))
+    for row in _listing_clusters(precision, snapped):
+        cluster = _cell(row)
+        cluster['listings'] = row['count']
+        cluster['categories'] = {value: row[value] for value in Listing.Category.values if row[value]}
+        cluster['_points'].append((row['count'], row['centroid_lat'], row['centroid_lng']))
+
+    for cluster in clusters.values():
+        points = cluster.pop('_points')
+        total = sum(weight for weight, _lat, _lng in points)
+        cluster['latitude'] = round(sum(weight * float(lat) for weight, lat, _lng in points) / total, 5)
+        cluster['longitude'] = round(sum(weight * float(lng) for weight, _lat, lng in points) / total, 5)
+
+    return {
+        'zoom': zoom,
+        'precision': precision,
+        'bbox': snapped,
+        'clusters': sorted(clusters.values(), key=lambda cluster: cluster['cell']),
+    }
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:17
+
+from django.db import migrations, models
+
+# Frozen copy of farms.geo.encode_geohash at precision 9, so later edits to
+# the live helper cannot change what this migration writes.
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9
+
+
+def encode_geohash(latitude, longitude):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars = []
+    bits = 0
+    even = True
+    for bit in range(PRECISION * 5):
+        target, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if target >= middle:
+            bits = (bits << 1) | 1
+            bounds[0] = middle
+        else:
+            bits <<= 1
+            bounds[1] = middle
+        even = not even
+        if bit % 5 == 4:
+            chars.append(BASE32[bits])
+            bits = 0
+    return ''.join(chars)
+
+
+def backfill_geohash(apps, schema_editor):
+    Farm = apps.get_model('farms', 'Farm')
+    farms = Farm.objects.filter(latitude__isnull=False, longitude__isnull=False).only('id', 'latitude', 'longitude')
+    for farm in farms.iterator(chunk_size=2000):
+        farm.geohash = encode_geohash(farm.latitude, farm.longitude)
+        farm.save(update_fields=['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0004_alter_farm_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='farm',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0005_geohash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['updated_at', 'id'], name='activity_changed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='farm',
+            index=models.Index(fields=['updated_at', 'id'], name='farm_changed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='field',
+            index=models.Index(fields=['updated_at', 'id'], name='field_changed_idx'),
+        ),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:46
+
+import re
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Kenya's 47 counties with other spellings and the main farming towns in each.
+COUNTIES = {
+    'Mombasa': ['Likoni', 'Nyali'],
+    'Kwale': ['Ukunda', 'Msambweni'],
+    'Kilifi': ['Malindi', 'Mtwapa', 'Watamu'],
+    'Tana River': ['Hola', 'Garsen'],
+    'Lamu': ['Mpeketoni'],
+    'Taita-Taveta': ['Taita Taveta', 'Voi', 'Wundanyi', 'Taveta'],
+    'Garissa': ['Dadaab'],
+    'Wajir': ['Habaswein'],
+    'Mandera': ['Elwak'],
+    'Marsabit': ['Moyale'],
+    'Isiolo': [],
+    'Meru': ['Maua', 'Timau', 'Nkubu'],
+    'Tharaka-Nithi': ['Tharaka Nithi', 'Chuka', 'Chogoria'],
+    'Embu': ['Runyenjes', 'Siakago'],
+    'Kitui': ['Mwingi'],
+    'Machakos': ['Athi River', 'Mavoko', 'Kangundo', 'Masii'],
+    'Makueni': ['Wote', 'Emali', 'Mtito Andei'],
+    'Nyandarua': ['Ol Kalou', 'Njabini'],
+    'Nyeri': ['Karatina', 'Othaya', 'Mweiga'],
+    'Kirinyaga': ['Kerugoya', 'Kutus', 'Mwea', 'Sagana'],
+    "Murang'a": ['Muranga', 'Kangema', 'Kenol', 'Maragua'],
+    'Kiambu': ['Thika', 'Limuru', 'Ruiru', 'Githunguri', 'Kikuyu', 'Gatundu'],
+    'Turkana': ['Lodwar', 'Kakuma'],
+    'West Pokot': ['Kapenguria', 'Makutano'],
+    'Samburu': ['Maralal'],
+    'Trans-Nzoia': ['Trans Nzoia', 'Kitale', 'Endebess', 'Kiminini'],
+    'Uasin Gishu': ['Eldoret', 'Turbo', 'Moiben', 'Burnt Forest'],
+    'Elgeyo-Marakwet': ['Elgeyo Marakwet', 'Iten', 'Kapsowar'],
+    'Nandi': ['Kapsabet', 'Nandi Hills'],
+    'Baringo': ['Kabarnet', 'Eldama Ravine', 'Marigat'],
+    'Laikipia': ['Nanyuki', 'Nyahururu', 'Rumuruti'],
+    'Nakuru': ['Naivasha', 'Molo', 'Njoro', 'Gilgil', 'Subukia', 'Rongai'],
+    'Narok': ['Kilgoris', 'Ololulunga'],
+    'Kajiado': ['Kitengela', 'Ngong', 'Loitokitok', 'Isinya'],
+    'Kericho': ['Litein', 'Londiani', 'Kipkelion'],
+    'Bomet': ['Sotik', 'Longisa'],
+    'Kakamega': ['Mumias', 'Malava', 'Butere'],
+    'Vihiga': ['Mbale', 'Luanda'],
+    'Bungoma': ['Webuye', 'Kimilili', 'Chwele'],
+    'Busia': ['Malaba', 'Nambale'],
+    'Siaya': ['Bondo', 'Ugunja', 'Usenge'],
+    'Kisumu': ['Ahero', 'Muhoroni', 'Maseno'],
+    'Homa Bay': ['Homabay', 'Mbita', 'Oyugis', 'Kendu Bay'],
+    'Migori': ['Awendo', 'Rongo', 'Isebania'],
+    'Kisii': ['Ogembo', 'Keroka'],
+    'Nyamira': ['Nyansiongo'],
+    'Nairobi': ['Embakasi', 'Kasarani', 'Ruai'],
+}
+
+
+# A frozen copy of farms.regions as it was when this migration was written, so
+# later changes to the matcher cannot change what this migration does.
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+_NOISE_WORDS = {'county', 'sub', 'subcounty', 'district', 'town', 'village', 'ward', 'area', 'near', 'the', 'of'}
+MAX_NAME_WORDS = 3
+
+
+def normalise_place(text):
+    words = _NON_WORD_RE.sub(' ', (text or '').lower()).split()
+    return ' '.join(word for word in words if word not in _NOISE_WORDS)
+
+
+class RegionMatcher:
+    def __init__(self, regions):
+        self.names = {}
+        for region_id, name, aliases, level in regions:
+            for label in (name, *aliases):
+                key = normalise_place(label)
+                if key and (key not in self.names or self.names[key][1] < level):
+                    self.names[key] = (region_id, level)
+
+    def match(self, location):
+        words = normalise_place(location).split()
+        best = None
+        for start in range(len(words)):
+            for size in range(min(MAX_NAME_WORDS, len(words) - start), 0, -1):
+                hit = self.names.get(' '.join(words[start:start + size]))
+                if hit and (best is None or hit[1] > best[1]):
+                    best = hit
+                if hit:
+                    break
+        return best[0] if best else None
+
+
+def seed_regions(apps, schema_editor):
+    Region = apps.get_model('farms', 'Region')
+    Farm = apps.get_model('farms', 'Farm')
+    country = Region.objects.create(name='Kenya', level=0)
+    country.path = f"/{country.pk}/"
+    country.save(update_fields=['path'])
+    counties = Region.objects.bulk_create(
+        Region(name=name, level=1, parent=country, aliases=aliases) for name, aliases in COUNTIES.items()
+    )
+    for county in counties:
+        county.path = f"{country.path}{county.pk}/"
+    Region.objects.bulk_update(counties, ['path'])
+
+    matcher = RegionMatcher(Region.objects.values_list('id', 'name', 'aliases', 'level'))
+    for location in Farm.objects.order_by().values_list('location', flat=True).distinct():
+        region_id = matcher.match(location)
+        if region_id is not None:
+            Farm.objects.filter(location=location).update(region_id=region_id)
+
+
+def unseed_regions(apps, schema_editor):
+    Region = apps.get_model('farms', 'Region')
+    apps.get_model('farms', 'Farm').objects.update(region=None)
+    for level in (2, 1, 0):
+        Region.objects.filter(level=level).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0006_changed_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=120)),
+                ('level', models.PositiveSmallIntegerField(choices=[(0, 'Country'), (1, 'County'), (2, 'Sub-county')])),
+                ('aliases', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=120), blank=True, default=list, size=None)),
+                ('path', models.CharField(blank=True, db_index=True, editable=False, max_length=255)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='farms.region')),
+            ],
+            options={
+                'ordering': ['level', 'name'],
+                'unique_together': {('parent', 'name')},
+            },
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='farms', to='farms.region'),
+        ),
+        migrations.RunPython(seed_regions, unseed_regions),
+    ]
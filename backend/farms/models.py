@@ -10,6 +10,60 @@ from django.db.models import Sum
 from django.utils import timezone
 
 
+class Region(models.Model):
+	"""Administrative area in the country > county > sub-county hierarchy.
+
+	``path`` lists the ids from the root down to the region (``/1/12/``) so a
+	subtree is one ``path__startswith`` lookup and the ancestors of a region
+	need no queries. ``aliases`` hold other spellings and town names that map
+	free-text farm locations onto the region.
+	"""
+
+	class Level(models.IntegerChoices):
+		COUNTRY = 0, 'Country'
+		COUNTY = 1, 'County'
+		SUB_COUNTY = 2, 'Sub-county'
+
+	name = models.CharField(max_length=120)
+	level = models.PositiveSmallIntegerField(choices=Level.choices)
+	parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.PROTECT, related_name='children')
+	aliases = ArrayField(models.CharField(max_length=120), default=list, blank=True)
+	path = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+
+	class Meta:
+		ordering = ['level', 'name']
+		unique_together = ('parent', 'name')
+
+	def __str__(self) -> str:
+		return self.name
+
+	def save(self, *args, **kwargs):
+		from .regions import invalidate_region_index
+
+		super().save(*args, **kwargs)
+		invalidate_region_index()
+		path = f"{self.parent.path if self.parent else '/'}{self.pk}/"
+		if path != self.path:
+			previous, self.path = self.path, path
+			Region.objects.filter(pk=self.pk).update(path=path)
+			if previous:
+				for child in self.children.all():
+					child.save(update_fields=['path'])
+
+	def delete(self, *args, **kwargs):
+		from .regions import invalidate_region_index
+
+		result = super().delete(*args, **kwargs)
+		invalidate_region_index()
+		return result
+
+	@property
+	def ancestor_ids(self) -> list[int]:
+		"""Ids from the root down to and including this region."""
+
+		return [int(part) for part in self.path.strip('/').split('/') if part]
+
+
 class Farm(models.Model):
 	"""Represents a farm owned by a specific user."""
 
@@ -34,6 +88,8 @@ class Farm(models.Model):
 	irrigation_type = models.CharField(max_length=12, choices=IrrigationType.choices, default=IrrigationType.NONE)
 	latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
 	longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+	geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
+	region = models.ForeignKey(Region, null=True, blank=True, on_delete=models.SET_NULL, related_name='farms')
 	established_date = models.DateField(null=True, blank=True)
 	is_active = models.BooleanField(default=True)
 	created_at = models.DateTimeField(auto_now_add=True)
@@ -42,10 +98,52 @@ class Farm(models.Model):
 	class Meta:
 		ordering = ['-created_at']
 		unique_together = ('owner', 'name')
+		indexes = [
+			models.Index(fields=['updated_at', 'id'], name='farm_changed_idx'),
+		]
 
 	def __str__(self) -> str:
 		return f"{self.name} ({self.owner.email})"
 
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		instance._loaded_region = (instance.__dict__.get('location'), instance.__dict__.get('region_id'))
+		return instance
+
+	def save(self, *args, **kwargs):
+		from .geo import encode_geohash
+
+		previous = self.geohash
+		has_coordinates = self.latitude is not None and self.longitude is not None
+		self.geohash = encode_geohash(self.latitude, self.longitude) if has_coordinates else ''
+		update_fields = kwargs.get('update_fields')
+		if update_fields is not None and self.geohash != previous:
+			kwargs['update_fields'] = {*update_fields, 'geohash'}
+		if self.assign_region() and kwargs.get('update_fields') is not None:
+			kwargs['update_fields'] = {*kwargs['update_fields'], 'region'}
+		super().save(*args, **kwargs)
+		self._loaded_region = (self.location, self.region_id)
+		if self.geohash != previous:
+			self.listings.update(geohash=self.geohash)
+
+	def assign_region(self) -> bool:
+		"""Match ``location`` to a region when it changed, unless the region was also set explicitly.
+
+		Returns whether ``region`` changed.
+		"""
+
+		from .regions import match_region
+
+		loaded_location, loaded_region = getattr(self, '_loaded_region', (None, None))
+		if self.location == loaded_location or self.region_id != loaded_region:
+			return False
+		region_id = match_region(self.location)
+		if region_id == self.region_id:
+			return False
+		self.region_id = region_id
+		return True
+
 	def calculate_total_yield(self) -> Decimal:
 		"""Return cumulative quantity harvested for this farm."""
 
@@ -86,10 +184,29 @@ class Field(models.Model):
 	class Meta:
 		ordering = ['field_name']
 		unique_together = ('farm', 'field_number')
+		indexes = [
+			models.Index(fields=['updated_at', 'id'], name='field_changed_idx'),
+		]
 
 	def __str__(self) -> str:
 		return f"{self.field_name} - {self.farm.name}"
 
+	def save(self, *args, **kwargs):
+		super().save(*args, **kwargs)
+		self.invalidate_performance()
+
+	def delete(self, *args, **kwargs):
+		result = super().delete(*args, **kwargs)
+		self.invalidate_performance()
+		return result
+
+	def invalidate_performance(self) -> None:
+		"""Drop the owner's cached field performance; activity saves reach this through ``apply_field_effects``."""
+
+		from .performance import invalidate_field_performance
+
+		invalidate_field_performance(self.farm.owner_id)
+
 
 class Activity(models.Model):
 	"""Operational activity executed on a field."""
@@ -117,6 +234,9 @@ class Activity(models.Model):
 
 	class Meta:
 		ordering = ['-date', '-created_at']
+		indexes = [
+			models.Index(fields=['updated_at', 'id'], name='activity_changed_idx'),
+		]
 
 	def __str__(self) -> str:
 		return f"{self.get_activity_type_display()} - {self.field.field_name}"
@@ -147,6 +267,16 @@ class Activity(models.Model):
 		self.apply_field_effects()
 		if is_new:
 			self.apply_inventory_effects()
+			if self.activity_type == self.ActivityType.HARVESTING:
+				from .leaderboards import record_harvest
+
+				record_harvest(self)
+
+	def delete(self, *args, **kwargs):
+		field = self.field
+		result = super().delete(*args, **kwargs)
+		field.invalidate_performance()
+		return result
 
 	def apply_inventory_effects(self):
 		"""Sync farm inventory whenever applicable activities are logged."""
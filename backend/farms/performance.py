@@ -0,0 +1,191 @@
+"""Per-field cost and yield analytics grouped by season."""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, Count, DateField, F, Func, Q, Sum, Value, When, Window
+from django.db.models.functions import ExtractMonth, ExtractYear, Lag, NullIf
+from django.db.models.lookups import GreaterThanOrEqual
+
+from marketplace.services import kilograms_case, unit_in_kilograms
+
+from .models import Activity
+
+FIELD_PERFORMANCE_CACHE_TIMEOUT = 60 * 15
+SEASONS = ('year', 'rains')
+
+_VERSION_KEY = 'farms:performance:version:{owner}'
+_HARVEST = Q(activity_type=Activity.ActivityType.HARVESTING)
+_TRENDED = ('yield_per_hectare', 'cost_per_hectare', 'cost_per_kg')
+_FIELD_COLUMNS = {
+    'field': 'field_id',
+    'field_name': 'field__field_name',
+    'farm': 'field__farm_id',
+    'farm_name': 'field__farm__name',
+    'area': 'field__area',
+}
+
+
+class _ShiftMonths(Func):
+    template = '(%(expressions)s - make_interval(months => %(months)d))::date'
+    output_field = DateField()
+
+
+def _season_columns(season: str) -> dict:
+    """``season_year`` and ``season`` expressions for the requested bucketing.
+
+    ``rains`` follows the bimodal East African calendar: the long rains run
+    March to August and the short rains September to February, so January
+    and February count towards the previous year's short rains.
+    """
+
+    if season == 'rains':
+        shifted = _ShiftMonths('date', months=2)
+        return {
+            'season_year': ExtractYear(shifted),
+            'season': Case(
+                When(GreaterThanOrEqual(ExtractMonth(shifted), 7), then=Value('short_rains')),
+                default=Value('long_rains'),
+                output_field=CharField(),
+            ),
+        }
+    return {'season_year': ExtractYear('date'), 'season': Value('year', output_field=CharField())}
+
+
+def _cache_version(owner_id: int) -> int:
+    key = _VERSION_KEY.format(owner=owner_id)
+    version = cache.get(key)
+    if version is None:
+        version = int(time.time())
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def invalidate_field_performance(owner_id: int) -> None:
+    """Retire the owner's cached performance reports once the current transaction commits."""
+
+    def bump():
+        key = _VERSION_KEY.format(owner=owner_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time()), None)
+
+    transaction.on_commit(bump)
+
+
+def _round(value, places: str):
+    return value.quantize(Decimal(places)) if value is not None else None
+
+
+def _performance_rows(activities, season: str) -> list[dict]:
+    """Aggregate activities per field and season in one grouped query.
+
+    Costs are summed per activity type with ``FILTER`` clauses and harvested
+    quantities are converted to kilograms in SQL. The previous season of the
+    same kind comes from ``LAG`` windows over the grouped rows.
+    """
+
+    units = activities.filter(_HARVEST).order_by().values_list('unit', flat=True).distinct()
+    known_units = [unit for unit in units if unit_in_kilograms(unit) is not None]
+    # Ordering by season first makes LAG step back to the same season of an earlier year.
+    window = {'partition_by': [F('field_id')], 'order_by': [F('season').asc(), F('season_year').asc()]}
+
+    rows = (
+        activities.order_by()
+        .annotate(**_season_columns(season))
+        .values(*_FIELD_COLUMNS.values(), 'season_year', 'season')
+        .annotate(
+            activity_count=Count('id'),
+            total_cost=Sum('cost'),
+            **{f"{kind}_cost": Sum('cost', filter=Q(activity_type=kind)) for kind in Activity.ActivityType.values},
+            harvested_kg=Sum(F('quantity') * kilograms_case('unit', known_units), filter=_HARVEST),
+            unconverted_harvests=Count('id', filter=_HARVEST & ~Q(unit__in=known_units) if known_units else _HARVEST),
+        )
+        .annotate(
+            yield_per_hectare=F('harvested_kg') / NullIf(F('field__area'), Value(Decimal('0'))),
+            cost_per_hectare=F('total_cost') / NullIf(F('field__area'), Value(Decimal('0'))),
+            cost_per_kg=F('total_cost') / NullIf(F('harvested_kg'), Value(Decimal('0'))),
+        )
+        .annotate(
+            previous_season=Window(Lag('season'), **window),
+            previous_season_year=Window(Lag('season_year'), **window),
+            **{f"previous_{name}": Window(Lag(name), **window) for name in _TRENDED},
+        )
+        .order_by('field__farm_id', 'field_id', 'season_year', 'season')
+    )
+    return list(rows)
+
+
+def _present(row: dict) -> dict:
+    consecutive = row['previous_season'] == row['season'] and row['previous_season_year'] == row['season_year'] - 1
+    trend = None
+    if consecutive:
+        trend = {}
+        for name in _TRENDED:
+            current, previous = row[name], row[f"previous_{name}"]
+            trend[name] = _round(current - previous, '0.001') if current is not None and previous is not None else None
+        previous_yield = row['previous_yield_per_hectare']
+        trend['yield_change_pct'] = (
+            _round((row['yield_per_hectare'] - previous_yield) / previous_yield * 100, '0.1')
+            if previous_yield and row['yield_per_hectare'] is not None
+            else None
+        )
+    return {
+        **{name: row[column] for name, column in _FIELD_COLUMNS.items()},
+        'season_year': row['season_year'],
+        'season': row['season'],
+        'activity_count': row['activity_count'],
+        'total_cost': row['total_cost'],
+        'costs': {kind: row[f"{kind}_cost"] or Decimal('0') for kind in Activity.ActivityType.values},
+        'harvested_kg': _round(row['harvested_kg'], '0.01'),
+        'unconverted_harvests': row['unconverted_harvests'],
+        'yield_per_hectare': _round(row['yield_per_hectare'], '0.001'),
+        'cost_per_hectare': _round(row['cost_per_hectare'], '0.01'),
+        'cost_per_kg': _round(row['cost_per_kg'], '0.001'),
+        'year_over_year': trend,
+    }
+
+
+def field_performance(
+    user,
+    *,
+    season: str = 'year',
+    farm: int | None = None,
+    start_year: int | None = None,
+    end_year: int | None = None,
+) -> list[dict]:
+    """Cost, yield per hectare and cost per kg for each of ``user``'s fields by season.
+
+    Cached per owner until one of their activities or fields changes.
+    """
+
+    params = f"{season}|{farm}|{start_year}|{end_year}"
+    key = f"farms:performance:{_cache_version(user.pk)}:{user.pk}:{hashlib.md5(params.encode()).hexdigest()}"
+    rows = cache.get(key)
+    if rows is not None:
+        return rows
+
+    activities = Activity.objects.filter(field__farm__owner=user)
+    if farm:
+        activities = activities.filter(field__farm_id=farm)
+    columns = _season_columns(season)
+    if start_year:
+        # One extra season year so the first requested season still has a comparison.
+        activities = activities.alias(bucket_year=columns['season_year']).filter(bucket_year__gte=start_year - 1)
+    if end_year:
+        activities = activities.alias(last_year=columns['season_year']).filter(last_year__lte=end_year)
+
+    rows = [
+        _present(row)
+        for row in _performance_rows(activities, season)
+        if not start_year or row['season_year'] >= start_year
+    ]
+    cache.set(key, rows, FIELD_PERFORMANCE_CACHE_TIMEOUT)
+    return rows
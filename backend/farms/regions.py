@@ -0,0 +1,71 @@
+"""Mapping free-text farm locations onto the normalized region hierarchy."""
+
+from __future__ import annotations
+
+import re
+from typing import Iterable
+
+from django.core.cache import cache
+
+from .models import Region
+
+REGION_INDEX_CACHE_KEY = 'farms:regions:index'
+REGION_INDEX_CACHE_TIMEOUT = 60 * 60
+MAX_NAME_WORDS = 3
+
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+_NOISE_WORDS = {'county', 'sub', 'subcounty', 'district', 'town', 'village', 'ward', 'area', 'near', 'the', 'of'}
+
+
+def normalise_place(text: str) -> str:
+    """Lowercase words only, e.g. ``"Trans-Nzoia County"`` -> ``"trans nzoia"``."""
+
+    words = _NON_WORD_RE.sub(' ', (text or '').lower()).split()
+    return ' '.join(word for word in words if word not in _NOISE_WORDS)
+
+
+class RegionMatcher:
+    """In-memory lookup from normalised names and aliases to region ids.
+
+    The deepest region wins when a location names several (``"Naivasha,
+    Nakuru"`` maps to the sub-county); among equally deep matches the one
+    named first wins.
+    """
+
+    def __init__(self, regions: Iterable[tuple[int, str, list[str], int]]):
+        self.names: dict[str, tuple[int, int]] = {}
+        for region_id, name, aliases, level in regions:
+            for label in (name, *aliases):
+                key = normalise_place(label)
+                if key and (key not in self.names or self.names[key][1] < level):
+                    self.names[key] = (region_id, level)
+
+    def match(self, location: str) -> int | None:
+        words = normalise_place(location).split()
+        best: tuple[int, int] | None = None
+        for start in range(len(words)):
+            for size in range(min(MAX_NAME_WORDS, len(words) - start), 0, -1):
+                hit = self.names.get(' '.join(words[start:start + size]))
+                if hit and (best is None or hit[1] > best[1]):
+                    best = hit
+                if hit:
+                    break
+        return best[0] if best else None
+
+
+def region_matcher() -> RegionMatcher:
+    index = cache.get(REGION_INDEX_CACHE_KEY)
+    if index is None:
+        index = list(Region.objects.values_list('id', 'name', 'aliases', 'level'))
+        cache.set(REGION_INDEX_CACHE_KEY, index, REGION_INDEX_CACHE_TIMEOUT)
+    return RegionMatcher(index)
+
+
+def invalidate_region_index() -> None:
+    cache.delete(REGION_INDEX_CACHE_KEY)
+
+
+def match_region(location: str) -> int | None:
+    """Id of the region named in ``location``, or ``None``."""
+
+    return region_matcher().match(location)
@@ -2,7 +2,9 @@
 
 from rest_framework import serializers
 
-from .models import Activity, Farm, Field
+from .leaderboards import BOARDS, LEADERBOARD_DEFAULT_LIMIT, LEADERBOARD_MAX_LIMIT
+from .models import Activity, Farm, Field, Region
+from .performance import SEASONS
 from .utils import store_activity_images
 
 
@@ -114,6 +116,9 @@ class FarmSerializer(serializers.ModelSerializer):
     active_field_count = serializers.SerializerMethodField()
     total_yield = serializers.SerializerMethodField()
     last_activity_date = serializers.SerializerMethodField()
+    distance_km = serializers.FloatField(read_only=True)
+    region = serializers.PrimaryKeyRelatedField(queryset=Region.objects.all(), required=False, allow_null=True)
+    region_name = serializers.CharField(source='region.name', read_only=True, default=None)
 
     class Meta:
         model = Farm
@@ -128,6 +133,10 @@ class FarmSerializer(serializers.ModelSerializer):
             'irrigation_type',
             'latitude',
             'longitude',
+            'geohash',
+            'region',
+            'region_name',
+            'distance_km',
             'established_date',
             'is_active',
             'active_field_count',
@@ -141,6 +150,8 @@ class FarmSerializer(serializers.ModelSerializer):
             'id',
             'owner',
             'owner_email',
+            'geohash',
+            'region_name',
             'active_field_count',
             'total_yield',
             'last_activity_date',
@@ -157,3 +168,31 @@ class FarmSerializer(serializers.ModelSerializer):
     def get_last_activity_date(self, obj):
         activity = Activity.objects.filter(field__farm=obj).order_by('-date', '-created_at').first()
         return activity.date if activity else None
+
+
+class FieldPerformanceQuerySerializer(serializers.Serializer):
+    season = serializers.ChoiceField(choices=SEASONS, default='year')
+    farm = serializers.IntegerField(required=False, min_value=1)
+    start_year = serializers.IntegerField(required=False, min_value=1900, max_value=2100)
+    end_year = serializers.IntegerField(required=False, min_value=1900, max_value=2100)
+
+    def validate(self, attrs):
+        start, end = attrs.get('start_year'), attrs.get('end_year')
+        if start and end and start > end:
+            raise serializers.ValidationError('start_year must be on or before end_year.')
+        return attrs
+
+
+class RegionSerializer(serializers.ModelSerializer):
+    level_display = serializers.CharField(source='get_level_display', read_only=True)
+
+    class Meta:
+        model = Region
+        fields = ('id', 'name', 'level', 'level_display', 'parent', 'aliases', 'path')
+        read_only_fields = fields
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    board = serializers.ChoiceField(choices=BOARDS, default='yield')
+    year = serializers.IntegerField(required=False, min_value=1900, max_value=2100)
+    limit = serializers.IntegerField(default=LEADERBOARD_DEFAULT_LIMIT, min_value=1, max_value=LEADERBOARD_MAX_LIMIT)
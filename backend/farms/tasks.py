@@ -0,0 +1,14 @@
+"""Celery tasks for farm workflows."""
+
+from __future__ import annotations
+
+from celery import shared_task
+
+
+@shared_task
+def rebuild_region_leaderboards(year: int | None = None) -> int:
+    """Recompute the regional leaderboards from the database to correct incremental drift."""
+
+    from .leaderboards import rebuild_leaderboards
+
+    return rebuild_leaderboards(year)
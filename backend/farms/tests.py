@@ -2,21 +2,29 @@
 
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
-from io import BytesIO
+from io import BytesIO, StringIO
 import shutil
 import tempfile
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from .models import Activity, Farm, Field
+from marketplace.models import Listing
+from marketplace.services import cancel_order, place_order
+
+from . import leaderboards
+from .models import Activity, Farm, Field, Region
 
 
 class FarmAPITestCase(APITestCase):
@@ -140,3 +148,242 @@ class FarmAPITestCase(APITestCase):
 		url = reverse('farm-detail', args=[foreign_farm.id])
 		response = self.client.get(url)
 		self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+	def test_farm_geohash_and_proximity_search(self):
+		self.farm.latitude = Decimal('-1.292100')
+		self.farm.longitude = Decimal('36.821900')
+		self.farm.save()
+		self.assertTrue(self.farm.geohash.startswith('kzf'))
+		Farm.objects.create(
+			owner=self.user,
+			name='Far Farm',
+			location='Mombasa',
+			total_area=Decimal('3.00'),
+			latitude=Decimal('-4.043500'),
+			longitude=Decimal('39.668200'),
+		)
+		response = self.client.get(reverse('farm-list'), {'near': '-1.30,36.80', 'radius': '25'})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		results = response.data['results']
+		self.assertEqual([farm['id'] for farm in results], [self.farm.id])
+		self.assertLess(results[0]['distance_km'], 5)
+		response = self.client.get(reverse('farm-list'), {'near': 'nowhere'})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_map_clusters_aggregate_farms_and_listings(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		self.farm.latitude = Decimal('-1.292100')
+		self.farm.longitude = Decimal('36.821900')
+		self.farm.save()
+		for title, category in (('Maize', Listing.Category.CROPS), ('Hybrid seed', Listing.Category.SEEDS)):
+			Listing.objects.create(
+				farm=self.farm,
+				seller=self.user,
+				category=category,
+				title=title,
+				description=title,
+				quantity=Decimal('5'),
+				price_per_unit=Decimal('10'),
+				location='Valley',
+			)
+		expired = Listing.objects.create(
+			farm=self.farm, seller=self.user, category=Listing.Category.CROPS, title='Old maize', description='Old maize',
+			quantity=Decimal('5'), price_per_unit=Decimal('10'), location='Valley',
+		)
+		Listing.objects.filter(pk=expired.pk).update(expires_at=timezone.now() - timedelta(days=1))
+		response = self.client.get(reverse('map-clusters'), {'bbox': '36.0,-2.0,37.5,-0.5', 'zoom': '8'})
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		clusters = response.data['clusters']
+		self.assertEqual(len(clusters), 1)
+		self.assertEqual(clusters[0]['farms'], 1)
+		self.assertEqual(clusters[0]['listings'], 2)
+		self.assertEqual(clusters[0]['categories'], {'crops': 1, 'seeds': 1})
+		self.assertAlmostEqual(clusters[0]['latitude'], -1.2921, places=4)
+		response = self.client.get(reverse('map-clusters'), {'bbox': '37.5,-2.0,36.0,-0.5'})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_map_clusters_payload_stays_small(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		# A viewport of exactly 8x8 precision-4 cells with a farm and a listing in each.
+		height, width = 180 / 2 ** 10, 360 / 2 ** 10
+		for row in range(8):
+			for column in range(8):
+				farm = Farm.objects.create(
+					owner=self.user, name=f'Grid {row}-{column}', location='Grid', total_area=Decimal('1.00'),
+					latitude=Decimal(f'{-1.40625 + (row + 0.5) * height:.6f}'),
+					longitude=Decimal(f'{36.5625 + (column + 0.5) * width:.6f}'),
+				)
+				Listing.objects.create(
+					farm=farm, seller=self.user, category=Listing.Category.CROPS, title='Maize', description='Maize',
+					quantity=Decimal('5'), price_per_unit=Decimal('10'), location='Grid',
+				)
+		response = self.client.get(reverse('map-clusters'), {'bbox': '36.5625,-1.40625,39.375,0.0', 'zoom': '14'})
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(response.data['precision'], 4)
+		self.assertEqual(len(response.data['clusters']), 64)
+		self.assertLess(len(response.content), 8 * 1024)
+
+		response = self.client.get(reverse('map-clusters'), {'bbox': '36.5,-1.5,39.5,0.1', 'zoom': '14'})
+		self.assertEqual(response.data['precision'], 3)
+		self.assertLessEqual(len(response.data['clusters']), 64)
+
+	def _log(self, activity_type, day, quantity='0', unit='kg', cost='0'):
+		return Activity.objects.create(
+			field=self.field, activity_type=activity_type, date=day,
+			quantity=Decimal(quantity), unit=unit, cost=Decimal(cost),
+		)
+
+	def test_field_performance_by_year_with_year_over_year_deltas(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		self._log(Activity.ActivityType.FERTILIZING, date(2024, 4, 2), cost='100')
+		self._log(Activity.ActivityType.HARVESTING, date(2024, 8, 20), quantity='1000', cost='50')
+		self._log(Activity.ActivityType.FERTILIZING, date(2025, 4, 1), cost='200')
+		self._log(Activity.ActivityType.HARVESTING, date(2025, 8, 18), quantity='2', unit='tonnes', cost='50')
+
+		url = reverse('field-performance')
+		response = self.client.get(url)
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		first, second = response.data
+		self.assertEqual((first['field'], first['season_year'], first['season']), (self.field.id, 2024, 'year'))
+		self.assertEqual(first['costs']['fertilizing'], Decimal('100.00'))
+		self.assertEqual(first['yield_per_hectare'], Decimal('100.000'))
+		self.assertEqual(first['cost_per_hectare'], Decimal('15.00'))
+		self.assertIsNone(first['year_over_year'])
+		self.assertEqual(second['harvested_kg'], Decimal('2000.00'))
+		self.assertEqual(second['cost_per_kg'], Decimal('0.125'))
+		self.assertEqual(second['year_over_year']['yield_per_hectare'], Decimal('100.000'))
+		self.assertEqual(second['year_over_year']['yield_change_pct'], Decimal('100.0'))
+		self.assertEqual(second['year_over_year']['cost_per_kg'], Decimal('-0.025'))
+
+		with self.captureOnCommitCallbacks(execute=True):
+			self._log(Activity.ActivityType.WEEDING, date(2025, 5, 1), cost='30')
+		self.assertEqual(self.client.get(url).data[1]['total_cost'], Decimal('280.00'))
+		response = self.client.get(url, {'start_year': 2025})
+		self.assertEqual([row['season_year'] for row in response.data], [2025])
+		self.assertIsNotNone(response.data[0]['year_over_year'])
+
+	def test_field_performance_rain_seasons(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		self._log(Activity.ActivityType.HARVESTING, date(2024, 7, 10), quantity='300')
+		self._log(Activity.ActivityType.HARVESTING, date(2025, 1, 15), quantity='200')
+		response = self.client.get(reverse('field-performance'), {'season': 'rains'})
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(
+			[(row['season_year'], row['season'], row['harvested_kg']) for row in response.data],
+			[(2024, 'long_rains', Decimal('300.00')), (2024, 'short_rains', Decimal('200.00'))],
+		)
+		self.assertIsNone(response.data[1]['year_over_year'])
+		response = self.client.get(reverse('field-performance'), {'season': 'monsoon'})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RegionLeaderboardTestCase(APITestCase):
+	"""Region matching, leaderboards and regional aggregates."""
+
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		patcher = mock.patch.object(leaderboards, '_store', leaderboards.LocalLeaderboardStore())
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.farmer = get_user_model().objects.create_user(email='grower@example.com', password='Testpass123!')
+		self.buyer = get_user_model().objects.create_user(email='buyer@example.com', password='Testpass123!')
+		self.client.force_authenticate(self.farmer)
+		self.kenya = Region.objects.get(level=Region.Level.COUNTRY)
+		self.trans_nzoia = Region.objects.get(name='Trans-Nzoia')
+		self.year = timezone.localdate().year
+
+	def _farm(self, name, location, area):
+		farm = Farm.objects.create(owner=self.farmer, name=name, location=location, total_area=Decimal(area))
+		field = Field.objects.create(farm=farm, field_name='Main', field_number=1, area=Decimal(area))
+		return farm, field
+
+	def test_farm_locations_match_regions(self):
+		farm, _field = self._farm('Kitale Farm', 'Near Kitale town', '10')
+		self.assertEqual(farm.region, self.trans_nzoia)
+		self.assertEqual(self.trans_nzoia.ancestor_ids, [self.kenya.id, self.trans_nzoia.id])
+		farm.location = 'Eldoret'
+		farm.save()
+		self.assertEqual(farm.region.name, 'Uasin Gishu')
+		farm.location = 'Somewhere else'
+		farm.region = self.trans_nzoia
+		farm.save()
+		farm.refresh_from_db()
+		self.assertEqual(farm.region, self.trans_nzoia)
+
+		Farm.objects.filter(pk=farm.pk).update(region=None, location='Naivasha')
+		call_command('backfill_farm_regions', stdout=StringIO())
+		self.assertEqual(Farm.objects.get(pk=farm.pk).region.name, 'Nakuru')
+
+	def test_leaderboards_and_stats(self):
+		small, small_field = self._farm('Small Farm', 'Kitale', '2')
+		large, large_field = self._farm('Large Farm', 'Eldoret', '10')
+		with self.captureOnCommitCallbacks(execute=True):
+			for field, quantity in ((small_field, '1000'), (large_field, '3000')):
+				Activity.objects.create(
+					field=field, activity_type=Activity.ActivityType.HARVESTING,
+					date=timezone.localdate(), quantity=Decimal(quantity), unit='kg',
+				)
+		url = reverse('region-leaderboard', args=[self.kenya.id])
+		response = self.client.get(url)
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual([entry['farm'] for entry in response.data['results']], [small.id, large.id])
+		self.assertEqual(response.data['results'][0]['score'], 500.0)
+		county = self.client.get(reverse('region-leaderboard', args=[self.trans_nzoia.id])).data
+		self.assertEqual([entry['name'] for entry in county['results']], ['Small Farm'])
+
+		listing = Listing.objects.create(
+			farm=large, seller=self.farmer, category=Listing.Category.CROPS, title='Maize',
+			description='Dry maize', quantity=Decimal('10'), unit='kg', price_per_unit=Decimal('40'), location='Eldoret',
+		)
+		with self.captureOnCommitCallbacks(execute=True):
+			order = place_order(listing_id=listing.id, buyer=self.buyer, quantity=Decimal('5'))
+		response = self.client.get(url, {'board': 'sellers'})
+		self.assertEqual(response.data['results'][0]['seller'], self.farmer.id)
+		self.assertEqual(response.data['results'][0]['score'], 200.0)
+		with self.captureOnCommitCallbacks(execute=True):
+			cancel_order(order)
+		self.assertEqual(self.client.get(url, {'board': 'sellers'}).data['results'][0]['score'], 0.0)
+
+		leaderboards.leaderboard_store().flush()
+		self.assertEqual(self.client.get(url).data['results'], [])
+		leaderboards.rebuild_leaderboards(self.year)
+		self.assertEqual([entry['farm'] for entry in self.client.get(url).data['results']], [small.id, large.id])
+		self.assertEqual(self.client.get(url, {'board': 'sellers'}).data['results'], [])
+		self.assertEqual(self.client.get(url, {'board': 'acres'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+		stats = self.client.get(reverse('region-stats', args=[self.kenya.id])).data
+		self.assertEqual(stats['farm_count'], 2)
+		self.assertEqual(stats['total_area'], Decimal('12.00'))
+		self.assertEqual(stats['active_listing_count'], 1)
+		self.assertEqual(self.client.get(reverse('region-stats', args=[self.trans_nzoia.id])).data['farm_count'], 1)
+
+	def test_rebuild_keeps_increments_made_after_it_read_the_database(self):
+		farm, field = self._farm('Kitale Farm', 'Kitale', '2')
+		key = leaderboards.leaderboard_key('yield', self.year, self.trans_nzoia.id)
+		store = leaderboards.leaderboard_store()
+		snapshot = leaderboards._subtree_scores
+		late = [50.0]
+
+		def late_harvest(rows):
+			# Committed after the rebuild's query, applied before its boards are swapped in.
+			while late:
+				store.incr(key, str(farm.pk), late.pop())
+			return snapshot(rows)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Activity.objects.create(
+				field=field, activity_type=Activity.ActivityType.HARVESTING,
+				date=timezone.localdate(), quantity=Decimal('200'), unit='kg',
+			)
+		with mock.patch.object(leaderboards, '_subtree_scores', side_effect=late_harvest):
+			leaderboards.rebuild_leaderboards(self.year)
+		self.assertEqual(store.top(key, 1), [(str(farm.pk), 150.0)])
+
+		with store.rebuilding():
+			with self.assertRaises(RuntimeError):
+				leaderboards.rebuild_leaderboards(self.year)
@@ -3,13 +3,15 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import ActivityViewSet, FarmViewSet, FieldViewSet
+from .views import ActivityViewSet, FarmViewSet, FieldViewSet, MapClusterView, RegionViewSet
 
 router = DefaultRouter()
 router.register('farms', FarmViewSet, basename='farm')
 router.register('fields', FieldViewSet, basename='field')
 router.register('activities', ActivityViewSet, basename='activity')
+router.register('regions', RegionViewSet, basename='region')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('map/clusters/', MapClusterView.as_view(), name='map-clusters'),
 ]
@@ -3,16 +3,30 @@
 import csv
 from decimal import Decimal
 
-from django.db.models import Sum
+from django.db.models import Count, Q, Sum
 from django.http import HttpResponse
 from django.utils import timezone
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .models import Activity, Farm, Field
-from .serializers import ActivitySerializer, FarmSerializer, FieldSerializer
+from marketplace.models import Listing
+
+from .geo import parse_near, within_radius
+from .leaderboards import leaderboard
+from .maps import map_clusters, parse_bbox
+from .models import Activity, Farm, Field, Region
+from .performance import field_performance
+from .serializers import (
+	ActivitySerializer,
+	FarmSerializer,
+	FieldPerformanceQuerySerializer,
+	FieldSerializer,
+	LeaderboardQuerySerializer,
+	RegionSerializer,
+)
 
 
 class FarmViewSet(viewsets.ModelViewSet):
@@ -23,9 +37,23 @@ class FarmViewSet(viewsets.ModelViewSet):
 
 	def get_queryset(self):
 		qs = Farm.objects.select_related('owner').prefetch_related('fields__activities')
-		if self.request.user.is_staff:
-			return qs
-		return qs.filter(owner=self.request.user)
+		if not self.request.user.is_staff:
+			qs = qs.filter(owner=self.request.user)
+		near = self.request.query_params.get('near')
+		if near and self.action == 'list':
+			qs = self._filter_near(qs, near)
+		return qs
+
+	def _filter_near(self, qs, near):
+		"""Limit to farms within ``radius`` km (default 50) of ``near=lat,lng``, closest first."""
+
+		try:
+			latitude, longitude = parse_near(near)
+			radius = float(self.request.query_params.get('radius', 50))
+		except ValueError as exc:
+			raise ValidationError({'near': str(exc)})
+		qs = within_radius(qs, latitude=latitude, longitude=longitude, radius_km=radius)
+		return qs.order_by('distance_km')
 
 	def perform_create(self, serializer):
 		serializer.save(owner=self.request.user)
@@ -141,6 +169,14 @@ class FieldViewSet(viewsets.ModelViewSet):
 		self._assert_owner(instance.farm)
 		instance.delete()
 
+	@action(detail=False, methods=['get'], url_path='performance')
+	def performance(self, request):
+		"""Cost per field, yield per hectare and cost per kg by season, with year-over-year deltas."""
+
+		params = FieldPerformanceQuerySerializer(data=request.query_params)
+		params.is_valid(raise_exception=True)
+		return Response(field_performance(request.user, **params.validated_data))
+
 	@action(detail=True, methods=['get', 'post'], url_path='activities')
 	def activities(self, request, pk=None):
 		field = self.get_object()
@@ -185,3 +221,80 @@ class ActivityViewSet(viewsets.ModelViewSet):
 	def perform_destroy(self, instance):
 		self._assert_field_owner(instance.field)
 		instance.delete()
+
+
+class RegionViewSet(viewsets.ReadOnlyModelViewSet):
+	"""Region hierarchy with per-region leaderboards and subtree aggregates."""
+
+	serializer_class = RegionSerializer
+	permission_classes = [permissions.IsAuthenticated]
+	pagination_class = None
+
+	def get_queryset(self):
+		qs = Region.objects.all()
+		params = self.request.query_params
+		if params.get('parent'):
+			qs = qs.filter(parent_id=params['parent'])
+		if params.get('level'):
+			qs = qs.filter(level=params['level'])
+		return qs
+
+	@action(detail=True, methods=['get'], url_path='leaderboard')
+	def leaderboard(self, request, pk=None):
+		"""Top farms by yield per hectare (``board=yield``) or sellers by revenue (``board=sellers``)."""
+
+		region = self.get_object()
+		params = LeaderboardQuerySerializer(data=request.query_params)
+		params.is_valid(raise_exception=True)
+		board = params.validated_data['board']
+		year = params.validated_data.get('year') or timezone.localdate().year
+		entries = leaderboard(board, region, year=year, limit=params.validated_data['limit'])
+		return Response({'region': region.pk, 'board': board, 'year': year, 'results': entries})
+
+	@action(detail=True, methods=['get'], url_path='stats')
+	def stats(self, request, pk=None):
+		"""Farm, field and harvest totals for the region and every region below it."""
+
+		region = self.get_object()
+		farms = Farm.objects.filter(region__path__startswith=region.path, is_active=True)
+		totals = farms.aggregate(farm_count=Count('id'), total_area=Sum('total_area'))
+		fields = Field.objects.filter(farm__in=farms).aggregate(
+			field_count=Count('id'), active_field_count=Count('id', filter=Q(is_active=True))
+		)
+		crops = (
+			Field.objects.filter(farm__in=farms, is_active=True)
+			.exclude(current_crop='')
+			.values('current_crop')
+			.annotate(field_count=Count('id'), area=Sum('area'))
+			.order_by('-area')[:10]
+		)
+		listings = Listing.objects.filter(farm__in=farms, status=Listing.Status.ACTIVE).aggregate(
+			active_listing_count=Count('id')
+		)
+		return Response(
+			{
+				'region': region.pk,
+				'farm_count': totals['farm_count'],
+				'total_area': totals['total_area'] or Decimal('0'),
+				**fields,
+				**listings,
+				'top_crops': list(crops),
+			}
+		)
+
+
+class MapClusterView(APIView):
+	"""Grid clusters of farms and active listings for a map viewport."""
+
+	permission_classes = [permissions.IsAuthenticated]
+
+	def get(self, request):
+		try:
+			bbox = parse_bbox(request.query_params.get('bbox'))
+		except ValueError as exc:
+			raise ValidationError({'bbox': str(exc)})
+		try:
+			zoom = int(request.query_params.get('zoom', 6))
+		except ValueError:
+			raise ValidationError({'zoom': 'zoom must be an integer.'})
+		return Response(map_clusters(request.user, bbox, zoom))
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_inventoryitem_description_inventoryitem_expiry_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['updated_at', 'id'], name='inventory_tx_changed_idx'),
+        ),
+    ]
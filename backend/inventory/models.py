@@ -83,9 +83,13 @@ class InventoryTransaction(models.Model):
 	performed_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='inventory_transactions')
 	transaction_date = models.DateTimeField(default=timezone.now)
 	notes = models.CharField(max_length=255, blank=True)
+	updated_at = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		ordering = ['-transaction_date', '-id']
+		indexes = [
+			models.Index(fields=['updated_at', 'id'], name='inventory_tx_changed_idx'),
+		]
 
 	def __str__(self) -> str:
 		return f"{self.get_transaction_type_display()} {self.quantity_change} {self.item.unit} for {self.item.name}"
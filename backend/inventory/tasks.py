@@ -3,13 +3,13 @@
 from __future__ import annotations
 
 from celery import shared_task
-from django.conf import settings
-from django.core.mail import send_mail
 
 
 @shared_task
 def send_low_stock_notification(alert_id: int) -> None:
-    """Send a low stock notification email for the provided alert id."""
+    """Queue a low stock notification email for the provided alert id."""
+
+    from notifications.outbox import queue_email
 
     from .models import LowStockAlert  # Local import to avoid circulars
 
@@ -24,16 +24,10 @@ def send_low_stock_notification(alert_id: int) -> None:
 
     subject = f"Low stock alert: {alert.item.name}"
     body = (
-        f"Hello {alert.item.owner.get_full_name() or alert.item.owner.email},\n\n"
+        f"Hello {alert.item.owner.full_name or alert.item.owner.email},\n\n"
         f"Inventory item '{alert.item.name}' from {alert.item.farm.name} is below the configured minimum.\n"
         f"Current quantity: {alert.current_quantity} {alert.item.unit}."
         "\nPlease restock or acknowledge this alert in AgriConnect."
     )
 
-    send_mail(
-        subject,
-        body,
-        getattr(settings, 'DEFAULT_FROM_EMAIL', 'alerts@agriconnect.local'),
-        [recipient],
-        fail_silently=True,
-    )
+    queue_email(recipient, subject, body, tag='low_stock')
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Listing, PriceUpdate
+from .models import Listing, Order, PriceAlert, PriceUpdate, SavedSearch
 
 
 @admin.register(Listing)
@@ -23,3 +23,27 @@ class PriceUpdateAdmin(admin.ModelAdmin):
 	list_filter = ('market', 'is_current')
 	search_fields = ('commodity', 'grade')
 	ordering = ('-effective_date',)
+
+
+@admin.register(PriceAlert)
+class PriceAlertAdmin(admin.ModelAdmin):
+	list_display = ('user', 'commodity', 'grade', 'market', 'direction', 'threshold', 'is_active', 'last_triggered_at')
+	list_filter = ('market', 'direction', 'is_active')
+	search_fields = ('commodity', 'grade', 'user__email')
+	readonly_fields = ('last_triggered_at', 'created_at')
+
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+	list_display = ('name', 'user', 'category', 'quality_grade', 'price_min', 'price_max', 'is_active', 'last_matched_at')
+	list_filter = ('category', 'quality_grade', 'is_active')
+	search_fields = ('name', 'query', 'location', 'user__email')
+	readonly_fields = ('last_matched_at', 'created_at', 'updated_at')
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+	list_display = ('id', 'listing', 'buyer', 'quantity', 'total_price', 'status', 'created_at')
+	list_filter = ('status',)
+	search_fields = ('listing__title', 'buyer__email', 'listing__seller__email')
+	readonly_fields = ('listing', 'buyer', 'quantity', 'unit_price', 'total_price', 'cancelled_at', 'created_at', 'updated_at')
@@ -0,0 +1,102 @@
+"""Hammer one listing with parallel orders and verify nothing is oversold."""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from farms.models import Farm
+from inventory.models import InventoryItem, InventoryTransaction
+from marketplace.models import Listing, Order
+from marketplace.services import place_order
+
+
+class Command(BaseCommand):
+    help = 'Place many concurrent orders against one listing and check stock never goes negative.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=400)
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--stock', type=int, default=250)
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark fixtures instead of deleting them.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        tag = uuid4().hex[:8]
+        seller = User.objects.create_user(email=f"bench-seller-{tag}@example.com", password=uuid4().hex)
+        buyers = [
+            User.objects.create_user(email=f"bench-buyer-{tag}-{index}@example.com", password=uuid4().hex)
+            for index in range(options['workers'])
+        ]
+        farm = Farm.objects.create(owner=seller, name=f"Bench farm {tag}", location='Bench', total_area=Decimal('1'))
+        item = InventoryItem.objects.create(
+            farm=farm,
+            owner=seller,
+            category=InventoryItem.Category.HARVEST,
+            name=f"Bench maize {tag}",
+            quantity=Decimal(options['stock']),
+        )
+        listing = Listing.objects.create(
+            farm=farm,
+            seller=seller,
+            title=f"Bench maize {tag}",
+            description='Concurrency benchmark',
+            quantity=Decimal(options['stock']),
+            price_per_unit=Decimal('10.00'),
+            location='Bench',
+            inventory_item=item,
+        )
+
+        def _order(index: int) -> bool:
+            try:
+                place_order(listing_id=listing.pk, buyer=buyers[index % len(buyers)], quantity=Decimal('1'))
+                return True
+            except ValueError:
+                return False
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            outcomes = list(pool.map(_order, range(options['orders'])))
+        elapsed = time.perf_counter() - started
+
+        listing.refresh_from_db()
+        item.refresh_from_db()
+        accepted = sum(outcomes)
+        sold = Order.objects.filter(listing=listing).count()
+        sales = InventoryTransaction.objects.filter(
+            related_listing=listing, transaction_type=InventoryTransaction.TransactionType.SALE
+        ).count()
+        self.stdout.write(
+            f"{options['orders']} orders, {options['workers']} workers in {elapsed:.2f}s "
+            f"({options['orders'] / elapsed:,.0f} orders/s): accepted={accepted} rejected={len(outcomes) - accepted}"
+        )
+        self.stdout.write(
+            f"listing quantity={listing.quantity} status={listing.status} inventory={item.quantity} "
+            f"orders={sold} sale transactions={sales}"
+        )
+
+        expected = min(options['orders'], options['stock'])
+        failed = (
+            accepted != expected
+            or sold != expected
+            or sales != expected
+            or listing.quantity != Decimal(options['stock'] - expected)
+            or item.quantity < 0
+        )
+
+        if not options['keep']:
+            Order.objects.filter(listing=listing).delete()
+            seller.delete()
+            User.objects.filter(pk__in=[buyer.pk for buyer in buyers]).delete()
+
+        if failed:
+            raise CommandError('Oversell or lost order detected.')
+        self.stdout.write(self.style.SUCCESS('No oversell detected.'))
@@ -0,0 +1,67 @@
+"""Benchmark the bulk price board upsert against a synthetic board."""
+
+from __future__ import annotations
+
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from marketplace.models import PriceUpdate
+from marketplace.services import rebuild_price_caches, upsert_price_board
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Time a bulk price board upsert (insert pass then update pass) and roll it back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rows = self._synthetic_board(options['rows'], random.Random(options['seed']))
+        try:
+            with transaction.atomic():
+                insert_seconds = self._timed(rows)
+                for row in rows:
+                    row['price_per_unit'] += Decimal('1.00')
+                update_seconds = self._timed(rows)
+                raise _Rollback
+        except _Rollback:
+            rebuild_price_caches()
+
+        for label, seconds in (('insert', insert_seconds), ('update', update_seconds)):
+            self.stdout.write(
+                f"{label}: {len(rows)} rows in {seconds * 1000:.1f} ms ({len(rows) / seconds:,.0f} rows/s)"
+            )
+
+    @staticmethod
+    def _timed(rows: list[dict]) -> float:
+        started = time.perf_counter()
+        upsert_price_board([dict(row) for row in rows])
+        return time.perf_counter() - started
+
+    @staticmethod
+    def _synthetic_board(count: int, rng: random.Random) -> list[dict]:
+        today = timezone.now().date()
+        grades = ('premium', 'grade_a', 'grade_b', 'grade_c')
+        markets = PriceUpdate.MarketType.values
+        rows = []
+        for index in range(count):
+            rows.append({
+                'commodity': f"bench-commodity-{index // (len(grades) * len(markets))}",
+                'grade': grades[index % len(grades)],
+                'market': markets[(index // len(grades)) % len(markets)],
+                'price_per_unit': Decimal(rng.randint(1000, 90000)) / 100,
+                'unit': 'kg',
+                'effective_date': today - timedelta(days=1),
+            })
+        return rows
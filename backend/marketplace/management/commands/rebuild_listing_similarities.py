@@ -0,0 +1,31 @@
+"""Recompute the similar-listings table outside of the nightly schedule."""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.recommendations import SimilarityConfig, rebuild_listing_similarities
+
+
+class Command(BaseCommand):
+    help = 'Rebuild TF-IDF based similar-listing recommendations for all active listings.'
+
+    def add_arguments(self, parser):
+        defaults = SimilarityConfig()
+        parser.add_argument('--top-k', type=int, default=defaults.top_k)
+        parser.add_argument('--max-pairs', type=int, default=defaults.max_pairs_per_block,
+                            help='Upper bound of candidate pairs materialized per sparse product block.')
+        parser.add_argument('--max-partition-size', type=int, default=defaults.max_partition_size,
+                            help='Largest number of listings compared together; bigger categories are split.')
+
+    def handle(self, *args, **options):
+        config = SimilarityConfig(
+            top_k=options['top_k'],
+            max_pairs_per_block=options['max_pairs'],
+            max_partition_size=options['max_partition_size'],
+        )
+        started = time.perf_counter()
+        written = rebuild_listing_similarities(config)
+        self.stdout.write(f"Stored {written} neighbour rows in {time.perf_counter() - started:.1f}s")
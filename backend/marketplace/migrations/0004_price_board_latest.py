@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+def derive_current_flags(apps, schema_editor):
+    PriceUpdate = apps.get_model('marketplace', 'PriceUpdate')
+    latest_ids = list(
+        PriceUpdate.objects.order_by('commodity', 'grade', 'market', '-effective_date')
+        .distinct('commodity', 'grade', 'market')
+        .values_list('id', flat=True)
+    )
+    PriceUpdate.objects.exclude(id__in=latest_ids).update(is_current=False)
+    PriceUpdate.objects.filter(id__in=latest_ids).update(is_current=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0003_marketplace_overhaul'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='priceupdate',
+            name='is_current',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='priceupdate',
+            index=models.Index(fields=['commodity', 'grade', 'market', '-effective_date'], name='price_board_latest_idx'),
+        ),
+        migrations.RunPython(derive_current_flags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:14
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('marketplace', '0004_price_board_latest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commodity', models.CharField(max_length=255)),
+                ('grade', models.CharField(max_length=50)),
+                ('market', models.CharField(choices=[('wholesale', 'Wholesale'), ('retail', 'Retail')], default='wholesale', max_length=20)),
+                ('direction', models.CharField(choices=[('above', 'Rises to or above'), ('below', 'Falls to or below')], max_length=10)),
+                ('threshold', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(0)])),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_triggered_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_alerts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('is_active', True)), fields=['commodity', 'grade', 'market', 'direction', 'threshold'], name='price_alert_match_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:17
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_farm_geohash(apps, schema_editor):
+    Farm = apps.get_model('farms', 'Farm')
+    Listing = apps.get_model('marketplace', 'Listing')
+    Listing.objects.update(geohash=Subquery(Farm.objects.filter(pk=OuterRef('farm_id')).values('geohash')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0005_geohash'),
+        ('marketplace', '0007_orders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(copy_farm_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0008_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='marketplace.listing')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='marketplace.listing')),
+            ],
+            options={
+                'ordering': ['listing', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='listingsimilarity',
+            constraint=models.UniqueConstraint(fields=('listing', 'rank'), name='listing_similarity_rank_unique'),
+        ),
+    ]
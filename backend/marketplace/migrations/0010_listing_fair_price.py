@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0009_listing_similarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='fair_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='fair_price_commodity',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='fair_price_percentile',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='fair_price_ratio',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='fair_price_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0010_listing_fair_price'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['updated_at', 'id'], name='listing_changed_idx'),
+        ),
+    ]
@@ -7,7 +7,7 @@ from datetime import timedelta
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 
@@ -45,24 +45,34 @@ class Listing(models.Model):
 	price_per_unit = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
 	quality_grade = models.CharField(max_length=20, choices=QualityGrade.choices, default=QualityGrade.A)
 	location = models.CharField(max_length=255, blank=True, default='')
+	geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
 	images = ArrayField(models.URLField(), default=list, blank=True)
 	is_negotiable = models.BooleanField(default=False)
 	status = models.CharField(max_length=20, choices=Status.choices, default=Status.ACTIVE)
 	expires_at = models.DateTimeField(default=_default_expiry)
 	views_count = models.PositiveIntegerField(default=0)
+	fair_price_commodity = models.CharField(max_length=255, blank=True, default='', editable=False)
+	fair_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False)
+	fair_price_ratio = models.FloatField(null=True, blank=True, editable=False)
+	fair_price_percentile = models.FloatField(null=True, blank=True, editable=False)
+	fair_price_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
 	inventory_item = models.ForeignKey('inventory.InventoryItem', null=True, blank=True, on_delete=models.SET_NULL, related_name='marketplace_listings')
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['updated_at', 'id'], name='listing_changed_idx'),
+		]
 
 	def __str__(self) -> str:
 		return self.title
 
 	@classmethod
 	def expire_outdated(cls) -> None:
-		cls.objects.filter(status=cls.Status.ACTIVE, expires_at__lt=timezone.now()).update(status=cls.Status.EXPIRED)
+		now = timezone.now()
+		cls.objects.filter(status=cls.Status.ACTIVE, expires_at__lt=now).update(status=cls.Status.EXPIRED, updated_at=now)
 
 	def mark_viewed(self) -> None:
 		self.views_count = models.F('views_count') + 1
@@ -79,7 +89,39 @@ class Listing(models.Model):
 		if self.status == self.Status.ACTIVE and self.expires_at < timezone.now():
 			self.status = self.Status.EXPIRED
 		self.clean_inventory_link()
+		if self.farm_id and (self.pk is None or kwargs.get('update_fields') is None):
+			self.geohash = self.farm.geohash
+		is_new = self.pk is None
 		super().save(*args, **kwargs)
+		if is_new and self.status == self.Status.ACTIVE:
+			self.queue_saved_search_matching()
+
+	def queue_saved_search_matching(self) -> None:
+		"""Match the new listing against saved searches once it is committed."""
+
+		from .tasks import notify_saved_search_matches
+
+		listing_id = self.pk
+		transaction.on_commit(lambda: notify_saved_search_matches.delay(listing_id))
+
+
+class ListingSimilarity(models.Model):
+	"""Precomputed nearest neighbours of a listing, refreshed by the nightly similarity job."""
+
+	listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='similarities')
+	similar = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='+')
+	rank = models.PositiveSmallIntegerField()
+	score = models.FloatField()
+	computed_at = models.DateTimeField()
+
+	class Meta:
+		ordering = ['listing', 'rank']
+		constraints = [
+			models.UniqueConstraint(fields=['listing', 'rank'], name='listing_similarity_rank_unique'),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.listing_id} ~ {self.similar_id} ({self.score:.2f})"
 
 
 class PriceUpdate(models.Model):
@@ -95,13 +137,134 @@ class PriceUpdate(models.Model):
 	price_per_unit = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
 	unit = models.CharField(max_length=32, default='kg')
 	effective_date = models.DateField(default=timezone.now)
-	is_current = models.BooleanField(default=True)
+	is_current = models.BooleanField(default=True, editable=False)
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		ordering = ['-effective_date', '-created_at']
 		unique_together = ('commodity', 'grade', 'market', 'effective_date')
+		indexes = [
+			models.Index(fields=['commodity', 'grade', 'market', '-effective_date'], name='price_board_latest_idx'),
+		]
 
 	def __str__(self) -> str:
 		return f"{self.commodity} {self.grade} {self.market}"
+
+	@property
+	def series_key(self) -> tuple[str, str, str]:
+		return (self.commodity, self.grade, self.market)
+
+	def save(self, *args, **kwargs):
+		from .services import latest_series_prices
+
+		previous = latest_series_prices([self.series_key])
+		super().save(*args, **kwargs)
+		self.refresh_price_caches(previous)
+
+	def delete(self, *args, **kwargs):
+		result = super().delete(*args, **kwargs)
+		self.refresh_price_caches()
+		return result
+
+	def refresh_price_caches(self, previous_prices: dict | None = None) -> None:
+		"""Drop cached price aggregates and rebuild the current board after a write."""
+
+		from .services import rebuild_price_caches
+
+		rebuild_price_caches(previous_prices)
+
+
+class PriceAlert(models.Model):
+	"""User subscription notified when a price board series crosses a threshold."""
+
+	class Direction(models.TextChoices):
+		ABOVE = 'above', 'Rises to or above'
+		BELOW = 'below', 'Falls to or below'
+
+	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='price_alerts')
+	commodity = models.CharField(max_length=255)
+	grade = models.CharField(max_length=50)
+	market = models.CharField(max_length=20, choices=PriceUpdate.MarketType.choices, default=PriceUpdate.MarketType.WHOLESALE)
+	direction = models.CharField(max_length=10, choices=Direction.choices)
+	threshold = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
+	is_active = models.BooleanField(default=True)
+	last_triggered_at = models.DateTimeField(null=True, blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ['-created_at']
+		indexes = [
+			models.Index(
+				fields=['commodity', 'grade', 'market', 'direction', 'threshold'],
+				name='price_alert_match_idx',
+				condition=models.Q(is_active=True),
+			),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.commodity} {self.grade} {self.market} {self.direction} {self.threshold}"
+
+
+class SavedSearch(models.Model):
+	"""Stored listing filter that is matched against new listings as they are posted.
+
+	Blank ``category`` and ``quality_grade`` act as wildcards so both the exact
+	value and the blank value can be looked up on ``saved_search_match_idx``.
+	"""
+
+	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='saved_searches')
+	name = models.CharField(max_length=255)
+	category = models.CharField(max_length=20, choices=Listing.Category.choices, blank=True)
+	quality_grade = models.CharField(max_length=20, choices=Listing.QualityGrade.choices, blank=True)
+	price_min = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)], null=True, blank=True)
+	price_max = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)], null=True, blank=True)
+	location = models.CharField(max_length=255, blank=True)
+	query = models.CharField(max_length=255, blank=True)
+	is_active = models.BooleanField(default=True)
+	last_matched_at = models.DateTimeField(null=True, blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['category', 'quality_grade'], name='saved_search_match_idx', condition=models.Q(is_active=True)),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.name} ({self.user.email})"
+
+	def matches_text(self, listing: Listing) -> bool:
+		"""Apply the location and free-text terms the index cannot answer."""
+
+		if self.location and self.location.lower() not in listing.location.lower():
+			return False
+		haystack = ' '.join((listing.title, listing.description, listing.location)).lower()
+		return all(term in haystack for term in self.query.lower().split())
+
+
+class Order(models.Model):
+	"""Purchase placed against a listing; the ordered quantity is reserved on placement."""
+
+	class Status(models.TextChoices):
+		PLACED = 'placed', 'Placed'
+		COMPLETED = 'completed', 'Completed'
+		CANCELLED = 'cancelled', 'Cancelled'
+
+	listing = models.ForeignKey(Listing, on_delete=models.PROTECT, related_name='orders')
+	buyer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
+	quantity = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
+	unit_price = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
+	total_price = models.DecimalField(max_digits=14, decimal_places=2, validators=[MinValueValidator(0)])
+	status = models.CharField(max_length=20, choices=Status.choices, default=Status.PLACED)
+	notes = models.CharField(max_length=255, blank=True)
+	cancelled_at = models.DateTimeField(null=True, blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		ordering = ['-created_at']
+
+	def __str__(self) -> str:
+		return f"Order #{self.pk} for {self.quantity} {self.listing.unit} of {self.listing.title}"
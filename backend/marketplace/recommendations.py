@@ -0,0 +1,254 @@
+"""Batch "similar listings" recommendations using sparse TF-IDF vectors."""
+
+from __future__ import annotations
+
+import logging
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, IntegerField
+from django.db.models.functions import Mod
+from django.utils import timezone
+from scipy import sparse
+
+from .models import Listing, ListingSimilarity
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]{2,}')
+
+
+@dataclass(frozen=True)
+class SimilarityConfig:
+    """Tuning knobs for the nightly similarity job.
+
+    ``n_features`` fixes the hashed vocabulary size and ``max_pairs_per_block``
+    caps the candidate pairs materialized by one sparse product. Listings are
+    compared in partitions of at most ``max_partition_size`` rows, each held
+    as a sparse term matrix of at most ``max_terms_per_listing`` entries per
+    listing, so peak memory is fixed by these knobs, not by the catalogue or
+    its largest category.
+    """
+
+    top_k: int = 10
+    n_features: int = 2 ** 20
+    max_terms_per_listing: int = 96
+    max_document_frequency: float = 0.4
+    min_score: float = 0.05
+    max_pairs_per_block: int = 20_000_000
+    max_partition_size: int = 100_000
+    fetch_chunk_size: int = 5000
+
+
+def _hash_tokens(text: str, config: SimilarityConfig) -> tuple[np.ndarray, np.ndarray]:
+    """Hash tokens into feature ids and return unique ids with their term counts."""
+
+    tokens = _TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+    ids = np.fromiter(
+        (zlib.crc32(token.encode('utf-8')) % config.n_features for token in tokens),
+        dtype=np.int32,
+        count=len(tokens),
+    )
+    features, counts = np.unique(ids, return_counts=True)
+    if len(features) > config.max_terms_per_listing:
+        keep = np.argsort(-counts, kind='stable')[: config.max_terms_per_listing]
+        features, counts = features[keep], counts[keep]
+    return features, counts.astype(np.float32)
+
+
+class _PartitionBuilder:
+    """Term counts of one category, compacted into one array per fetched chunk."""
+
+    def __init__(self):
+        self.ids: list[np.ndarray] = []
+        self.indices: list[np.ndarray] = []
+        self.data: list[np.ndarray] = []
+        self.lengths: list[np.ndarray] = []
+        self._pending: tuple[list, list, list, list] = ([], [], [], [])
+
+    def add(self, listing_id: int, features: np.ndarray, counts: np.ndarray) -> None:
+        ids, indices, data, lengths = self._pending
+        ids.append(listing_id)
+        indices.append(features)
+        data.append(counts)
+        lengths.append(len(features))
+
+    def compact(self) -> None:
+        ids, indices, data, lengths = self._pending
+        if not ids:
+            return
+        self.ids.append(np.asarray(ids, dtype=np.int64))
+        self.indices.append(np.concatenate(indices).astype(np.int32, copy=False))
+        self.data.append(np.concatenate(data).astype(np.float32, copy=False))
+        self.lengths.append(np.asarray(lengths, dtype=np.int64))
+        self._pending = ([], [], [], [])
+
+    def matrix(self, config: SimilarityConfig) -> tuple[np.ndarray, sparse.csr_matrix]:
+        self.compact()
+        ids = np.concatenate(self.ids)
+        indptr = np.concatenate(([0], np.cumsum(np.concatenate(self.lengths))))
+        matrix = sparse.csr_matrix(
+            (np.concatenate(self.data), np.concatenate(self.indices), indptr),
+            shape=(len(ids), config.n_features),
+            dtype=np.float32,
+        )
+        return ids, matrix
+
+
+def _partitions(config: SimilarityConfig) -> Iterator[tuple[str, int, int]]:
+    """Yield ``(category, bucket, buckets)`` for every partition of active listings.
+
+    A category larger than ``max_partition_size`` is split into ``buckets``
+    slices by listing id modulo, so its listings are only compared within
+    their slice. The split is deterministic, keeping neighbours stable from
+    one run to the next while the category size does not cross a boundary.
+    """
+
+    sizes = (
+        Listing.objects.filter(status=Listing.Status.ACTIVE)
+        .values_list('category')
+        .annotate(total=Count('id'))
+        .order_by('category')
+    )
+    for category, total in sizes:
+        buckets = -(-total // config.max_partition_size)
+        for bucket in range(buckets):
+            yield category, bucket, buckets
+
+
+def _iter_partitions(config: SimilarityConfig) -> Iterator[tuple[str, np.ndarray, sparse.csr_matrix]]:
+    """Stream active listings partition by partition and yield one term-count matrix per partition.
+
+    Only the partition being read is held in memory.
+    """
+
+    for category, bucket, buckets in _partitions(config):
+        rows = Listing.objects.filter(status=Listing.Status.ACTIVE, category=category)
+        if buckets > 1:
+            rows = rows.alias(bucket=Mod('id', buckets, output_field=IntegerField())).filter(bucket=bucket)
+        builder, read = _PartitionBuilder(), 0
+        rows = rows.order_by('id').values_list('id', 'quality_grade', 'title', 'description')
+        for listing_id, grade, title, description in rows.iterator(chunk_size=config.fetch_chunk_size):
+            builder.add(listing_id, *_hash_tokens(f"{title} {title} {description} grade{grade}", config))
+            read += 1
+            if read % config.fetch_chunk_size == 0:
+                builder.compact()
+        if read:
+            label = category if buckets == 1 else f"{category} [{bucket + 1}/{buckets}]"
+            yield (label, *builder.matrix(config))
+
+
+def tfidf(counts: sparse.csr_matrix, config: SimilarityConfig) -> tuple[sparse.csr_matrix, np.ndarray]:
+    """Apply sublinear TF, smoothed IDF and L2 row normalization in place.
+
+    Terms present in more than ``max_document_frequency`` of the documents are
+    dropped: they add little signal and dominate the cost of the pairwise
+    product. Returns the weighted matrix and the per-feature document counts.
+    """
+
+    n_docs = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=config.n_features)
+    idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+    if n_docs >= 20:
+        idf[df > config.max_document_frequency * n_docs] = 0
+    weighted = counts.copy()
+    weighted.data = (1 + np.log(weighted.data)) * idf[weighted.indices]
+    weighted.eliminate_zeros()
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    weighted = sparse.diags(1 / norms).dot(weighted).tocsr()
+    return weighted.astype(np.float32), np.bincount(weighted.indices, minlength=config.n_features)
+
+
+def _row_blocks(vectors: sparse.csr_matrix, df: np.ndarray, max_pairs: int):
+    """Yield row ranges whose estimated candidate pairs stay under ``max_pairs``."""
+
+    cumulative = np.concatenate(([0], np.cumsum(df[vectors.indices], dtype=np.int64)))
+    pair_cost = cumulative[vectors.indptr[1:]] - cumulative[vectors.indptr[:-1]]
+    start = 0
+    running = 0
+    for row, cost in enumerate(pair_cost):
+        if row > start and running + cost > max_pairs:
+            yield start, row
+            start, running = row, 0
+        running += cost
+    if start < vectors.shape[0]:
+        yield start, vectors.shape[0]
+
+
+def top_k_neighbours(vectors: sparse.csr_matrix, df: np.ndarray, config: SimilarityConfig):
+    """Yield ``(rows, neighbours, ranks, scores)`` arrays of each row's top-k neighbours, block by block.
+
+    Each block holds whole rows ordered by row and descending score.
+    """
+
+    transposed = vectors.T.tocsr()
+    for start, stop in _row_blocks(vectors, df, config.max_pairs_per_block):
+        scores = (vectors[start:stop] @ transposed).tocsr()
+        rows = np.repeat(np.arange(start, stop), np.diff(scores.indptr))
+        keep = (scores.indices != rows) & (scores.data >= config.min_score)
+        rows, neighbours, values = rows[keep], scores.indices[keep], scores.data[keep]
+        order = np.lexsort((neighbours, -values, rows))
+        rows, neighbours, values = rows[order], neighbours[order], values[order]
+        ranks = np.arange(len(rows)) - np.searchsorted(rows, rows, side='left') + 1
+        top = ranks <= config.top_k
+        if top.any():
+            yield rows[top], neighbours[top], ranks[top], values[top]
+
+
+def rebuild_listing_similarities(config: SimilarityConfig | None = None) -> int:
+    """Recompute top-k similar listings for every active listing.
+
+    Listings are compared within their category, or within their slice of a
+    category too large for one partition. Results replace the stored
+    neighbours block by block, so no single transaction spans the whole run,
+    and rows left over from listings that are no longer active are removed
+    at the end.
+    """
+
+    config = config or SimilarityConfig()
+    run_started = timezone.now()
+    written = 0
+    for category, ids, counts in _iter_partitions(config):
+        vectors, df = tfidf(counts, config)
+        del counts
+        pending: list[ListingSimilarity] = []
+        pending_ids: list[int] = []
+        for rows, neighbours, ranks, scores in top_k_neighbours(vectors, df, config):
+            listing_ids = ids[rows]
+            pending_ids.extend(np.unique(listing_ids).tolist())
+            pending.extend(
+                ListingSimilarity(
+                    listing_id=listing_id,
+                    similar_id=similar_id,
+                    rank=rank,
+                    score=round(score, 4),
+                    computed_at=run_started,
+                )
+                for listing_id, similar_id, rank, score in zip(
+                    listing_ids.tolist(), ids[neighbours].tolist(), ranks.tolist(), scores.tolist()
+                )
+            )
+            # Blocks end on row boundaries, so a listing's neighbours are never split across writes.
+            if len(pending) >= config.fetch_chunk_size:
+                written += _replace_similarities(pending_ids, pending)
+                pending, pending_ids = [], []
+        if pending:
+            written += _replace_similarities(pending_ids, pending)
+        logger.info('Similar listings for %s: %s listings processed', category, len(ids))
+
+    ListingSimilarity.objects.filter(computed_at__lt=run_started).delete()
+    return written
+
+
+def _replace_similarities(listing_ids: list[int], rows: list[ListingSimilarity]) -> int:
+    with transaction.atomic():
+        ListingSimilarity.objects.filter(listing_id__in=listing_ids).delete()
+        ListingSimilarity.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
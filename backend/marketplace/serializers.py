@@ -3,13 +3,15 @@
 from __future__ import annotations
 
 import os
+from decimal import Decimal
 from typing import Iterable
 from uuid import uuid4
 
 from django.core.files.storage import default_storage
 from rest_framework import serializers
 
-from .models import Listing, PriceUpdate
+from .models import Listing, Order, PriceAlert, PriceUpdate, SavedSearch
+from .services import HISTORY_INTERVALS
 
 
 class ListingSerializer(serializers.ModelSerializer):
@@ -18,6 +20,7 @@ class ListingSerializer(serializers.ModelSerializer):
         child=serializers.ImageField(), write_only=True, required=False, allow_empty=True
     )
     clear_images = serializers.BooleanField(write_only=True, required=False, default=False)
+    distance_km = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Listing
@@ -32,8 +35,14 @@ class ListingSerializer(serializers.ModelSerializer):
             'quantity',
             'unit',
             'price_per_unit',
+            'fair_price_commodity',
+            'fair_price',
+            'fair_price_ratio',
+            'fair_price_percentile',
             'quality_grade',
             'location',
+            'geohash',
+            'distance_km',
             'images',
             'image_uploads',
             'clear_images',
@@ -49,6 +58,7 @@ class ListingSerializer(serializers.ModelSerializer):
             'id',
             'seller',
             'seller_email',
+            'geohash',
             'views_count',
             'created_at',
             'updated_at',
@@ -131,4 +141,116 @@ class PriceUpdateSerializer(serializers.ModelSerializer):
             'created_at',
             'updated_at',
         )
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'is_current', 'created_at', 'updated_at')
+
+
+class PriceHistoryQuerySerializer(serializers.Serializer):
+    commodity = serializers.CharField(max_length=255)
+    grade = serializers.CharField(max_length=50, required=False)
+    market = serializers.ChoiceField(choices=PriceUpdate.MarketType.choices, required=False)
+    interval = serializers.ChoiceField(choices=HISTORY_INTERVALS, default='week')
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        start, end = attrs.get('start'), attrs.get('end')
+        if start and end and start > end:
+            raise serializers.ValidationError('start must be on or before end.')
+        return attrs
+
+
+class PriceBoardRowSerializer(serializers.Serializer):
+    """Validates one row of a bulk price board upload.
+
+    Uniqueness is resolved by the upsert, so no per-row database validators run.
+    """
+
+    commodity = serializers.CharField(max_length=255)
+    grade = serializers.CharField(max_length=50)
+    market = serializers.ChoiceField(choices=PriceUpdate.MarketType.choices, default=PriceUpdate.MarketType.WHOLESALE)
+    price_per_unit = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    unit = serializers.CharField(max_length=32, default='kg')
+    effective_date = serializers.DateField()
+
+
+class PriceAlertSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceAlert
+        fields = (
+            'id',
+            'user',
+            'commodity',
+            'grade',
+            'market',
+            'direction',
+            'threshold',
+            'is_active',
+            'last_triggered_at',
+            'created_at',
+        )
+        read_only_fields = ('id', 'user', 'last_triggered_at', 'created_at')
+
+
+class SavedSearchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SavedSearch
+        fields = (
+            'id',
+            'user',
+            'name',
+            'category',
+            'quality_grade',
+            'price_min',
+            'price_max',
+            'location',
+            'query',
+            'is_active',
+            'last_matched_at',
+            'created_at',
+            'updated_at',
+        )
+        read_only_fields = ('id', 'user', 'last_matched_at', 'created_at', 'updated_at')
+
+    def validate(self, attrs):
+        price_min = attrs.get('price_min', getattr(self.instance, 'price_min', None))
+        price_max = attrs.get('price_max', getattr(self.instance, 'price_max', None))
+        if price_min is not None and price_max is not None and price_min > price_max:
+            raise serializers.ValidationError('price_min cannot exceed price_max.')
+        return attrs
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    listing_title = serializers.CharField(source='listing.title', read_only=True)
+    seller = serializers.PrimaryKeyRelatedField(source='listing.seller', read_only=True)
+    buyer_email = serializers.EmailField(source='buyer.email', read_only=True)
+    quantity = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+
+    class Meta:
+        model = Order
+        fields = (
+            'id',
+            'listing',
+            'listing_title',
+            'seller',
+            'buyer',
+            'buyer_email',
+            'quantity',
+            'unit_price',
+            'total_price',
+            'status',
+            'notes',
+            'cancelled_at',
+            'created_at',
+            'updated_at',
+        )
+        read_only_fields = (
+            'id',
+            'buyer',
+            'buyer_email',
+            'unit_price',
+            'total_price',
+            'status',
+            'cancelled_at',
+            'created_at',
+            'updated_at',
+        )
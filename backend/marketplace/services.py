@@ -0,0 +1,612 @@
+"""Marketplace domain services for price board reporting."""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import time
+from datetime import date
+from decimal import Decimal
+from functools import partial
+from typing import Iterable
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import (
+    Avg,
+    Case,
+    CharField,
+    Count,
+    DateField,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Func,
+    Max,
+    Min,
+    Q,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.expressions import RowRange
+from django.db.models.functions import Cast, Concat, FirstValue, LastValue, Lower, PercentRank, Trunc
+from django.utils import timezone
+
+from farms.leaderboards import record_sale
+from inventory.models import InventoryItem, InventoryTransaction
+from inventory.services import apply_inventory_transaction
+
+from .models import Listing, Order, PriceAlert, PriceUpdate, SavedSearch
+
+PRICE_CACHE_TIMEOUT = 60 * 15
+HISTORY_INTERVALS = ('day', 'week', 'month')
+PRICE_BOARD_KEY_FIELDS = ('commodity', 'grade', 'market', 'effective_date')
+PRICE_UPLOAD_BATCH_SIZE = 1000
+FAIR_PRICE_MARKET = PriceUpdate.MarketType.WHOLESALE
+FAIR_PRICE_CATEGORIES = (Listing.Category.CROPS,)
+FAIR_PRICE_BATCH_SIZE = 2000
+FAIR_PRICE_DEBOUNCE_SECONDS = 30
+
+_PRICE_VERSION_KEY = 'marketplace:prices:version'
+_CURRENT_BOARD_KEY = 'marketplace:prices:current-board'
+_FAIR_PRICE_PENDING_KEY = 'marketplace:prices:fair-price-pending'
+
+_UNIT_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)?\s*([a-z]+)\b')
+_KILOGRAMS_PER_UNIT = {
+    'g': Decimal('0.001'),
+    'gram': Decimal('0.001'),
+    'grams': Decimal('0.001'),
+    'kg': Decimal('1'),
+    'kgs': Decimal('1'),
+    'kilo': Decimal('1'),
+    'kilos': Decimal('1'),
+    'kilogram': Decimal('1'),
+    'kilograms': Decimal('1'),
+    'lb': Decimal('0.45359237'),
+    'lbs': Decimal('0.45359237'),
+    'quintal': Decimal('100'),
+    'quintals': Decimal('100'),
+    't': Decimal('1000'),
+    'ton': Decimal('1000'),
+    'tons': Decimal('1000'),
+    'tonne': Decimal('1000'),
+    'tonnes': Decimal('1000'),
+}
+
+
+def _price_cache_version() -> int:
+    """Return the current price cache generation, seeding it on first use."""
+
+    version = cache.get(_PRICE_VERSION_KEY)
+    if version is None:
+        version = int(time.time())
+        cache.add(_PRICE_VERSION_KEY, version, None)
+        version = cache.get(_PRICE_VERSION_KEY, version)
+    return version
+
+
+def invalidate_price_caches() -> None:
+    """Retire every cached price aggregate by bumping the cache generation."""
+
+    try:
+        cache.incr(_PRICE_VERSION_KEY)
+    except ValueError:
+        cache.set(_PRICE_VERSION_KEY, int(time.time()), None)
+
+
+def rebuild_price_caches(previous_prices: dict | None = None) -> None:
+    """Sync the current board after a price board write and refresh caches once it commits.
+
+    ``is_current`` is updated inside the caller's transaction and price alerts
+    are dispatched on commit. Cached aggregates, the materialized board and
+    listing fair-price indicators are only rebuilt after the commit, so a
+    rolled-back write never leaves a board in the cache that was not stored.
+
+    ``previous_prices`` maps the series touched by the write to their current
+    price before it, as returned by :func:`latest_series_prices`.
+    """
+
+    latest = sync_current_price_flags()
+    if previous_prices:
+        dispatch_price_alerts(previous_prices, latest)
+    transaction.on_commit(_publish_price_caches)
+
+
+def _publish_price_caches() -> None:
+    invalidate_price_caches()
+    refresh_current_price_board()
+    schedule_listing_fair_prices()
+
+
+def _price_cache_key(name: str, *parts) -> str:
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f"marketplace:prices:{_price_cache_version()}:{name}:{digest}"
+
+
+def price_history(
+    *,
+    commodity: str,
+    grade: str | None = None,
+    market: str | None = None,
+    interval: str = 'week',
+    start: date | None = None,
+    end: date | None = None,
+) -> list[dict]:
+    """Bucket price board entries by period and return OHLC-style aggregates.
+
+    Grouping happens in PostgreSQL via ``date_trunc`` so only one row per
+    commodity/grade/market/bucket leaves the database. The filter columns match
+    the leading columns of the ``unique_together`` index, which serves the scan.
+    """
+
+    if interval not in HISTORY_INTERVALS:
+        raise ValueError(f"Unsupported interval: {interval}")
+
+    key = _price_cache_key('history', commodity, grade, market, interval, start, end)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    qs = PriceUpdate.objects.filter(commodity=commodity)
+    if grade:
+        qs = qs.filter(grade=grade)
+    if market:
+        qs = qs.filter(market=market)
+    if start:
+        qs = qs.filter(effective_date__gte=start)
+    if end:
+        qs = qs.filter(effective_date__lte=end)
+
+    partition = [F('commodity'), F('grade'), F('market'), F('period')]
+    chronological = [F('effective_date').asc(), F('created_at').asc()]
+    rows = (
+        qs.annotate(period=Trunc('effective_date', interval, output_field=DateField()))
+        .annotate(
+            open=Window(FirstValue('price_per_unit'), partition_by=partition, order_by=chronological),
+            close=Window(
+                LastValue('price_per_unit'),
+                partition_by=partition,
+                order_by=chronological,
+                frame=RowRange(start=None, end=None),
+            ),
+            low=Window(Min('price_per_unit'), partition_by=partition),
+            high=Window(Max('price_per_unit'), partition_by=partition),
+            average=Window(Avg('price_per_unit'), partition_by=partition),
+            samples=Window(Count('id'), partition_by=partition),
+            period_unit=Window(LastValue('unit'), partition_by=partition, order_by=chronological, frame=RowRange(start=None, end=None)),
+        )
+        .values('commodity', 'grade', 'market', 'period_unit', 'period', 'open', 'close', 'low', 'high', 'average', 'samples')
+        .order_by('commodity', 'grade', 'market', 'period')
+        .distinct()
+    )
+
+    buckets = [
+        {
+            'commodity': row['commodity'],
+            'grade': row['grade'],
+            'market': row['market'],
+            'unit': row['period_unit'],
+            'period': row['period'],
+            'open': row['open'],
+            'close': row['close'],
+            'min': row['low'],
+            'max': row['high'],
+            'avg': Decimal(row['average']).quantize(Decimal('0.01')),
+            'samples': row['samples'],
+        }
+        for row in rows
+    ]
+    cache.set(key, buckets, PRICE_CACHE_TIMEOUT)
+    return buckets
+
+
+def latest_price_updates():
+    """Latest entry per commodity/grade/market via ``DISTINCT ON``.
+
+    The ordering matches ``price_board_latest_idx`` so PostgreSQL can walk the
+    index and stop at the first row of every series.
+    """
+
+    return PriceUpdate.objects.order_by('commodity', 'grade', 'market', '-effective_date').distinct(
+        'commodity', 'grade', 'market'
+    )
+
+
+def sync_current_price_flags() -> list[PriceUpdate]:
+    """Point ``is_current`` at the latest entry of every series and return those entries."""
+
+    latest = list(latest_price_updates())
+    current_ids = [entry.pk for entry in latest]
+    PriceUpdate.objects.filter(is_current=True).exclude(pk__in=current_ids).update(is_current=False)
+    PriceUpdate.objects.filter(pk__in=current_ids, is_current=False).update(is_current=True)
+    for entry in latest:
+        entry.is_current = True
+    return latest
+
+
+def refresh_current_price_board() -> list[dict]:
+    """Recompute the current board, sync ``is_current`` and store it in the cache."""
+
+    from .serializers import PriceUpdateSerializer  # Local import to avoid circulars
+
+    board = [dict(row) for row in PriceUpdateSerializer(sync_current_price_flags(), many=True).data]
+    cache.set(_CURRENT_BOARD_KEY, board, None)
+    return board
+
+
+def current_price_board() -> list[dict]:
+    """Return the materialized price board, rebuilding it if the cache was evicted."""
+
+    board = cache.get(_CURRENT_BOARD_KEY)
+    if board is None:
+        board = refresh_current_price_board()
+    return board
+
+
+def upsert_price_board(rows: list[dict]) -> int:
+    """Insert or update a validated price board in bulk.
+
+    Rows are keyed on the ``unique_together`` columns; duplicates inside the
+    upload collapse to the last occurrence because PostgreSQL refuses to update
+    the same row twice in one ``ON CONFLICT`` statement. Caches are rebuilt once
+    after the whole board is written.
+    """
+
+    entries: dict[tuple, PriceUpdate] = {}
+    for row in rows:
+        entry = PriceUpdate(**row)
+        entries[tuple(getattr(entry, field) for field in PRICE_BOARD_KEY_FIELDS)] = entry
+
+    previous = latest_series_prices({entry.series_key for entry in entries.values()})
+    with transaction.atomic():
+        PriceUpdate.objects.bulk_create(
+            list(entries.values()),
+            batch_size=PRICE_UPLOAD_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=PRICE_BOARD_KEY_FIELDS,
+            update_fields=('price_per_unit', 'unit', 'updated_at'),
+        )
+    rebuild_price_caches(previous)
+    return len(entries)
+
+
+def latest_series_prices(keys: Iterable[tuple[str, str, str]]) -> dict[tuple, Decimal | None]:
+    """Map each commodity/grade/market key to its current price, ``None`` if unpriced."""
+
+    keys = set(keys)
+    prices: dict[tuple, Decimal | None] = dict.fromkeys(keys)
+    if not keys:
+        return prices
+    latest = latest_price_updates().filter(commodity__in={key[0] for key in keys})
+    for commodity, grade, market, price in latest.values_list('commodity', 'grade', 'market', 'price_per_unit'):
+        if (commodity, grade, market) in prices:
+            prices[(commodity, grade, market)] = price
+    return prices
+
+
+def dispatch_price_alerts(previous_prices: dict[tuple, Decimal | None], latest: Iterable[PriceUpdate]) -> None:
+    """Queue alert evaluation for every written series whose current price moved."""
+
+    from .tasks import evaluate_price_alerts  # Local import to avoid circulars
+
+    current = {entry.series_key: (entry.pk, entry.price_per_unit) for entry in latest}
+    for key, previous in previous_prices.items():
+        if key not in current:
+            continue
+        price_update_id, price = current[key]
+        if price == previous:
+            continue
+        transaction.on_commit(
+            partial(evaluate_price_alerts.delay, price_update_id, str(previous) if previous is not None else None)
+        )
+
+
+def crossed_price_alerts(price_update: PriceUpdate, previous_price: Decimal | None):
+    """Active alerts whose threshold lies between the previous and the new price.
+
+    Only alerts crossed by this move match, so a price that stays above a
+    threshold does not notify again. Each branch is a range scan on
+    ``price_alert_match_idx``.
+    """
+
+    price = price_update.price_per_unit
+    alerts = PriceAlert.objects.filter(
+        is_active=True,
+        commodity=price_update.commodity,
+        grade=price_update.grade,
+        market=price_update.market,
+    )
+    if previous_price is None:
+        crossing = Q(direction=PriceAlert.Direction.ABOVE, threshold__lte=price) | Q(
+            direction=PriceAlert.Direction.BELOW, threshold__gte=price
+        )
+    elif price > previous_price:
+        crossing = Q(direction=PriceAlert.Direction.ABOVE, threshold__gt=previous_price, threshold__lte=price)
+    elif price < previous_price:
+        crossing = Q(direction=PriceAlert.Direction.BELOW, threshold__lt=previous_price, threshold__gte=price)
+    else:
+        return alerts.none()
+    return alerts.filter(crossing).order_by()
+
+
+class _RegexpReplace(Func):
+    function = 'REGEXP_REPLACE'
+    output_field = CharField()
+
+
+def _word_prefixed(expression):
+    """Lowercase text with punctuation collapsed to single spaces and a leading space.
+
+    Matching ``' ' + commodity`` against it anchors commodities on a word start,
+    so "rice" does not match "price" while "tomato" still matches "tomatoes".
+    """
+
+    return Concat(Value(' '), _RegexpReplace(Lower(expression), Value('[^a-z0-9]+'), Value(' '), Value('g')))
+
+
+def unit_in_kilograms(unit: str) -> Decimal | None:
+    """Kilograms in one ``unit`` such as ``kg``, ``tonne`` or ``90kg bag``; ``None`` if unknown."""
+
+    match = _UNIT_RE.match(unit.lower())
+    if not match or match.group(2) not in _KILOGRAMS_PER_UNIT:
+        return None
+    return _KILOGRAMS_PER_UNIT[match.group(2)] * Decimal(match.group(1) or 1)
+
+
+def kilograms_case(field: str, units: Iterable[str]):
+    """SQL ``CASE`` mapping the stored unit strings to kilograms (``NULL`` when unknown)."""
+
+    whens = []
+    for unit in units:
+        factor = unit_in_kilograms(unit)
+        if factor is not None:
+            whens.append(When(**{field: unit}, then=Value(factor)))
+    return Case(*whens, default=None, output_field=DecimalField(max_digits=20, decimal_places=6))
+
+
+def _fair_price_board():
+    return PriceUpdate.objects.filter(is_current=True, market=FAIR_PRICE_MARKET).order_by()
+
+
+def _fair_price_match_sql(listings, listing_units: list[str], board_units: list[str]) -> tuple[str, list]:
+    """SQL selecting ``(id, commodity, fair_price)`` for ``listings`` against the current board.
+
+    Titles and commodities are normalized once each, then joined on grade
+    where the commodity starts a word of the title. The longest commodity
+    wins, and the board price is converted to the listing unit through
+    kilograms. Unmatched listings come back with ``NULL`` columns.
+    """
+
+    board = (
+        _fair_price_board()
+        .annotate(
+            commodity_text=_word_prefixed(F('commodity')),
+            price_per_kg=ExpressionWrapper(
+                F('price_per_unit') / kilograms_case('unit', board_units),
+                output_field=DecimalField(max_digits=20, decimal_places=6),
+            ),
+        )
+        .filter(price_per_kg__gt=0)
+        .values('grade', 'commodity', 'commodity_text', 'price_per_kg')
+    )
+    titles = listings.annotate(
+        listing_text=_word_prefixed(F('title')),
+        kilograms=kilograms_case('unit', listing_units),
+    ).values('id', 'quality_grade', 'listing_text', 'kilograms')
+    board_sql, board_params = board.query.sql_with_params()
+    titles_sql, titles_params = titles.query.sql_with_params()
+    return (
+        f"WITH board AS ({board_sql}), titles AS ({titles_sql}) "
+        'SELECT DISTINCT ON (titles.id) titles.id, board.commodity, board.price_per_kg * titles.kilograms AS fair_price '
+        'FROM titles LEFT JOIN board ON board.grade = titles.quality_grade '
+        'AND strpos(titles.listing_text, board.commodity_text) > 0 '
+        'ORDER BY titles.id, length(board.commodity) DESC NULLS LAST, board.commodity',
+        [*board_params, *titles_params],
+    )
+
+
+def schedule_listing_fair_prices() -> None:
+    """Queue one fair-price refresh for a burst of board writes.
+
+    The first write in ``FAIR_PRICE_DEBOUNCE_SECONDS`` queues a delayed run;
+    later writes find the pending marker and rely on that run, which clears
+    the marker before reading the board.
+    """
+
+    from .tasks import refresh_listing_fair_prices as refresh_fair_prices  # Local import to avoid circulars
+
+    if cache.add(_FAIR_PRICE_PENDING_KEY, 1, FAIR_PRICE_DEBOUNCE_SECONDS + 60):
+        refresh_fair_prices.apply_async(countdown=FAIR_PRICE_DEBOUNCE_SECONDS)
+
+
+def refresh_scheduled_listing_fair_prices() -> int:
+    # Board writes committed from here on queue another run.
+    cache.delete(_FAIR_PRICE_PENDING_KEY)
+    return refresh_listing_fair_prices()
+
+
+def refresh_listing_fair_prices() -> int:
+    """Store the fair-price indicator on every comparable active listing.
+
+    A first pass matches listings to the current board in primary-key batches
+    of ``FAIR_PRICE_BATCH_SIZE``. Each batch is one ``UPDATE ... FROM`` over a
+    join of the batch with the board, storing the matched commodity and the
+    board price converted to the listing unit. ``updated_at`` moves only when
+    either changes, so incremental readers see real changes. A second pass
+    ranks the stored price ratios per commodity and grade with a window
+    function and writes them back with ``bulk_update``. Indicators of listings
+    that are no longer active are cleared.
+    """
+
+    started = timezone.now()
+    listings = Listing.objects.filter(status=Listing.Status.ACTIVE, category__in=FAIR_PRICE_CATEGORIES).order_by()
+    listing_units = list(listings.values_list('unit', flat=True).distinct())
+    board_units = list(_fair_price_board().values_list('unit', flat=True).distinct())
+    table = connection.ops.quote_name(Listing._meta.db_table)
+    bounds = listings.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is not None:
+        for low in range(bounds['low'], bounds['high'] + 1, FAIR_PRICE_BATCH_SIZE):
+            batch = listings.filter(pk__gte=low, pk__lt=low + FAIR_PRICE_BATCH_SIZE)
+            matched_sql, params = _fair_price_match_sql(batch, listing_units, board_units)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    WITH matched AS ({matched_sql})
+                    UPDATE {table} AS listing SET
+                        updated_at = CASE
+                            WHEN listing.fair_price_commodity IS DISTINCT FROM COALESCE(matched.commodity, '')
+                                OR listing.fair_price IS DISTINCT FROM ROUND(matched.fair_price, 2)
+                            THEN %s ELSE listing.updated_at END,
+                        fair_price_commodity = COALESCE(matched.commodity, ''),
+                        fair_price = ROUND(matched.fair_price, 2),
+                        fair_price_ratio = NULL,
+                        fair_price_percentile = NULL,
+                        fair_price_updated_at = %s
+                    FROM matched WHERE listing.id = matched.id
+                    """,
+                    [*params, started, started],
+                )
+
+    ranked = (
+        Listing.objects.filter(fair_price_updated_at=started, fair_price__gt=0)
+        .annotate(ratio=Cast('price_per_unit', FloatField()) / Cast('fair_price', FloatField()))
+        .annotate(
+            percentile=Window(
+                PercentRank(),
+                partition_by=[F('fair_price_commodity'), F('quality_grade')],
+                order_by=F('ratio').asc(),
+            )
+        )
+        .order_by()
+        .values_list('pk', 'ratio', 'percentile')
+    )
+    fields = ['fair_price_ratio', 'fair_price_percentile']
+    updated = 0
+    batch: list[Listing] = []
+    for pk, ratio, percentile in ranked.iterator(chunk_size=FAIR_PRICE_BATCH_SIZE):
+        batch.append(Listing(pk=pk, fair_price_ratio=round(ratio, 4), fair_price_percentile=round(percentile * 100, 1)))
+        if len(batch) >= FAIR_PRICE_BATCH_SIZE:
+            Listing.objects.bulk_update(batch, fields)
+            updated += len(batch)
+            batch = []
+    if batch:
+        Listing.objects.bulk_update(batch, fields)
+        updated += len(batch)
+
+    Listing.objects.filter(fair_price_updated_at__lt=started).update(
+        updated_at=Case(When(~Q(fair_price_commodity='') | Q(fair_price__isnull=False), then=Value(started)), default=F('updated_at')),
+        fair_price_commodity='',
+        fair_price=None,
+        fair_price_ratio=None,
+        fair_price_percentile=None,
+        fair_price_updated_at=None,
+    )
+    return updated
+
+
+def matching_saved_searches(listing: Listing) -> list[SavedSearch]:
+    """Saved searches a newly posted listing satisfies.
+
+    Category and grade prune candidates through ``saved_search_match_idx``
+    (exact value or blank wildcard) and the price range is checked in the same
+    query; only the survivors get the location and text checks in Python.
+    """
+
+    price = listing.price_per_unit
+    candidates = (
+        SavedSearch.objects.filter(
+            is_active=True,
+            category__in=(listing.category, ''),
+            quality_grade__in=(listing.quality_grade, ''),
+        )
+        .filter(Q(price_min__isnull=True) | Q(price_min__lte=price))
+        .filter(Q(price_max__isnull=True) | Q(price_max__gte=price))
+        .exclude(user_id=listing.seller_id)
+        .only('id', 'user_id', 'name', 'location', 'query')
+        .order_by()
+    )
+    return [search for search in candidates.iterator(chunk_size=2000) if search.matches_text(listing)]
+
+
+def place_order(*, listing_id: int, buyer, quantity: Decimal, notes: str = '') -> Order:
+    """Reserve ``quantity`` from a listing and record the sale.
+
+    The reservation is one conditional ``UPDATE ... WHERE quantity >= n`` that
+    also flips the listing to SOLD when it empties, so concurrent buyers can
+    never oversell: the row lock serializes them and losers match zero rows.
+    Raises ``ValueError`` when the listing cannot cover the order.
+    """
+
+    if quantity <= 0:
+        raise ValueError('Order quantity must be positive.')
+
+    with transaction.atomic():
+        reserved = (
+            Listing.objects.filter(
+                pk=listing_id,
+                status=Listing.Status.ACTIVE,
+                expires_at__gt=timezone.now(),
+                quantity__gte=quantity,
+            )
+            .exclude(seller=buyer)
+            .update(
+                quantity=F('quantity') - quantity,
+                status=Case(When(quantity=quantity, then=Value(Listing.Status.SOLD)), default=F('status')),
+                updated_at=timezone.now(),
+            )
+        )
+        if not reserved:
+            raise ValueError('Listing is unavailable or has insufficient quantity for this order.')
+
+        listing = Listing.objects.select_related('seller').get(pk=listing_id)
+        order = Order.objects.create(
+            listing=listing,
+            buyer=buyer,
+            quantity=quantity,
+            unit_price=listing.price_per_unit,
+            total_price=(listing.price_per_unit * quantity).quantize(Decimal('0.01')),
+            notes=notes,
+        )
+        if listing.inventory_item_id:
+            item = InventoryItem.objects.select_for_update().get(pk=listing.inventory_item_id)
+            apply_inventory_transaction(
+                item=item,
+                quantity_change=-quantity,
+                transaction_type=InventoryTransaction.TransactionType.SALE,
+                performed_by=listing.seller,
+                related_listing=listing,
+                notes=f"Marketplace order #{order.pk}",
+            )
+        record_sale(order)
+    return order
+
+
+def cancel_order(order: Order, *, performed_by=None) -> Order:
+    """Release a placed order's reservation back to the listing and its inventory."""
+
+    with transaction.atomic():
+        order = Order.objects.select_for_update().select_related('listing', 'listing__seller').get(pk=order.pk)
+        if order.status != Order.Status.PLACED:
+            raise ValueError('Only placed orders can be cancelled.')
+        Listing.objects.filter(pk=order.listing_id).update(
+            quantity=F('quantity') + order.quantity,
+            status=Case(When(status=Listing.Status.SOLD, then=Value(Listing.Status.ACTIVE)), default=F('status')),
+            updated_at=timezone.now(),
+        )
+        order.status = Order.Status.CANCELLED
+        order.cancelled_at = timezone.now()
+        order.save(update_fields=['status', 'cancelled_at', 'updated_at'])
+        if order.listing.inventory_item_id:
+            item = InventoryItem.objects.select_for_update().get(pk=order.listing.inventory_item_id)
+            apply_inventory_transaction(
+                item=item,
+                quantity_change=order.quantity,
+                transaction_type=InventoryTransaction.TransactionType.ADJUSTMENT,
+                performed_by=performed_by,
+                related_listing=order.listing,
+                notes=f"Marketplace order #{order.pk} cancelled",
+            )
+        record_sale(order, sign=-1)
+    return order
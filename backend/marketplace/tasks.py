@@ -0,0 +1,126 @@
+"""Celery tasks for marketplace workflows."""
+
+from __future__ import annotations
+
+from decimal import Decimal
+
+from celery import shared_task
+from django.utils import timezone
+
+ALERT_FANOUT_BATCH_SIZE = 2000
+
+
+def _notify_crossed_alerts(update, rows: list[tuple]) -> None:
+    """Write one notification per crossed alert and stamp the alerts as triggered."""
+
+    from notifications.models import Notification
+
+    from .models import PriceAlert
+
+    Notification.objects.bulk_create(
+        [
+            Notification(
+                recipient_id=user_id,
+                title=f"{update.commodity} ({update.grade}) is now {update.price_per_unit}/{update.unit}",
+                message=(
+                    f"The {update.get_market_display().lower()} price of {update.commodity} ({update.grade}) "
+                    f"{'rose to' if direction == PriceAlert.Direction.ABOVE else 'fell to'} "
+                    f"{update.price_per_unit} per {update.unit}, crossing your alert at {threshold}."
+                ),
+                category='marketplace',
+                metadata={
+                    'price_alert': alert_id,
+                    'price_update': update.pk,
+                    'threshold': str(threshold),
+                    'price': str(update.price_per_unit),
+                },
+            )
+            for alert_id, user_id, direction, threshold in rows
+        ]
+    )
+    PriceAlert.objects.filter(pk__in=[row[0] for row in rows]).update(last_triggered_at=timezone.now())
+
+
+@shared_task
+def evaluate_price_alerts(price_update_id: int, previous_price: str | None = None) -> int:
+    """Notify subscribers whose price alert threshold was crossed by a board update."""
+
+    from .models import PriceUpdate
+    from .services import crossed_price_alerts
+
+    try:
+        update = PriceUpdate.objects.get(pk=price_update_id)
+    except PriceUpdate.DoesNotExist:
+        return 0
+
+    previous = Decimal(previous_price) if previous_price is not None else None
+    matches = crossed_price_alerts(update, previous).values_list('id', 'user_id', 'direction', 'threshold')
+
+    notified = 0
+    batch: list[tuple] = []
+    for row in matches.iterator(chunk_size=ALERT_FANOUT_BATCH_SIZE):
+        batch.append(row)
+        if len(batch) >= ALERT_FANOUT_BATCH_SIZE:
+            _notify_crossed_alerts(update, batch)
+            notified += len(batch)
+            batch = []
+    if batch:
+        _notify_crossed_alerts(update, batch)
+        notified += len(batch)
+    return notified
+
+
+@shared_task
+def notify_saved_search_matches(listing_id: int) -> int:
+    """Notify owners of saved searches that a new listing matches."""
+
+    from notifications.models import Notification
+
+    from .models import Listing, SavedSearch
+    from .services import matching_saved_searches
+
+    try:
+        listing = Listing.objects.get(pk=listing_id, status=Listing.Status.ACTIVE)
+    except Listing.DoesNotExist:
+        return 0
+
+    searches = matching_saved_searches(listing)
+    if not searches:
+        return 0
+
+    Notification.objects.bulk_create(
+        [
+            Notification(
+                recipient_id=search.user_id,
+                title=f"New listing for \"{search.name}\": {listing.title}",
+                message=(
+                    f"{listing.title} is available at {listing.price_per_unit} per {listing.unit}"
+                    f"{f' in {listing.location}' if listing.location else ''}."
+                ),
+                category='marketplace',
+                metadata={'saved_search': search.pk, 'listing': listing.pk},
+            )
+            for search in searches
+        ],
+        batch_size=ALERT_FANOUT_BATCH_SIZE,
+    )
+    SavedSearch.objects.filter(pk__in=[search.pk for search in searches]).update(last_matched_at=timezone.now())
+    return len(searches)
+
+
+@shared_task
+def rebuild_listing_similarities() -> int:
+    """Nightly refresh of the precomputed similar-listing table."""
+
+    from .recommendations import rebuild_listing_similarities as rebuild
+
+    return rebuild()
+
+
+@shared_task
+def refresh_listing_fair_prices() -> int:
+    """Recompute listing fair-price indicators against the current price board."""
+
+    from .services import refresh_scheduled_listing_fair_prices
+
+    return refresh_scheduled_listing_fair_prices()
@@ -1,3 +1,593 @@
-from django.test import TestCase
+"""Marketplace tests."""
 
-# Create your tests here.
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from farms.models import Farm
+from inventory.models import InventoryItem, InventoryTransaction
+from notifications.models import Notification
+
+from .models import Listing, ListingSimilarity, Order, PriceAlert, PriceUpdate, SavedSearch
+from .recommendations import SimilarityConfig, rebuild_listing_similarities
+from .services import FAIR_PRICE_DEBOUNCE_SECONDS
+from .tasks import evaluate_price_alerts, notify_saved_search_matches, refresh_listing_fair_prices
+
+
+class PriceHistoryAPITestCase(APITestCase):
+	"""Bucketed price history served from the price board."""
+
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		self.user = get_user_model().objects.create_user(email='buyer@example.com', password='Testpass123!')
+		self.client.force_authenticate(self.user)
+		for day, price in ((1, '30.00'), (9, '34.00'), (20, '28.00')):
+			PriceUpdate.objects.create(
+				commodity='Maize',
+				grade='grade_a',
+				price_per_unit=Decimal(price),
+				effective_date=date(2025, 3, day),
+			)
+		PriceUpdate.objects.create(
+			commodity='Maize',
+			grade='grade_a',
+			price_per_unit=Decimal('40.00'),
+			effective_date=date(2025, 4, 2),
+		)
+
+	def test_monthly_buckets_return_ohlc(self):
+		response = self.client.get(reverse('price-history'), {'commodity': 'Maize', 'interval': 'month'})
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(len(response.data), 2)
+		march = response.data[0]
+		self.assertEqual(march['period'], date(2025, 3, 1))
+		self.assertEqual(march['open'], Decimal('30.00'))
+		self.assertEqual(march['close'], Decimal('28.00'))
+		self.assertEqual(march['min'], Decimal('28.00'))
+		self.assertEqual(march['max'], Decimal('34.00'))
+		self.assertEqual(march['avg'], Decimal('30.67'))
+		self.assertEqual(march['samples'], 3)
+
+	def test_history_cache_is_invalidated_by_new_prices(self):
+		url = reverse('price-history')
+		params = {'commodity': 'Maize', 'interval': 'month', 'start': '2025-04-01'}
+		self.assertEqual(self.client.get(url, params).data[0]['samples'], 1)
+		with mock.patch.object(refresh_listing_fair_prices, 'apply_async'), self.captureOnCommitCallbacks(execute=True):
+			PriceUpdate.objects.create(
+				commodity='Maize',
+				grade='grade_a',
+				price_per_unit=Decimal('42.00'),
+				effective_date=date(2025, 4, 15),
+			)
+		refreshed = self.client.get(url, params).data[0]
+		self.assertEqual(refreshed['samples'], 2)
+		self.assertEqual(refreshed['close'], Decimal('42.00'))
+
+	def test_history_requires_commodity(self):
+		response = self.client.get(reverse('price-history'), {'interval': 'month'})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CurrentPriceBoardTestCase(APITestCase):
+	"""Current board derived from the latest effective date per series."""
+
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		fair_prices = mock.patch.object(refresh_listing_fair_prices, 'apply_async')
+		fair_prices.start()
+		self.addCleanup(fair_prices.stop)
+		self.user = get_user_model().objects.create_user(email='board@example.com', password='Testpass123!')
+		self.client.force_authenticate(self.user)
+
+	def _post(self, price: str, effective: date) -> PriceUpdate:
+		with self.captureOnCommitCallbacks(execute=True):
+			return PriceUpdate.objects.create(
+				commodity='Beans',
+				grade='premium',
+				price_per_unit=Decimal(price),
+				effective_date=effective,
+			)
+
+	def test_latest_effective_date_wins_regardless_of_write_order(self):
+		newer = self._post('55.00', date(2025, 5, 10))
+		older = self._post('50.00', date(2025, 5, 1))
+		response = self.client.get(reverse('price-current'))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(len(response.data), 1)
+		self.assertEqual(response.data[0]['id'], newer.id)
+		older.refresh_from_db()
+		newer.refresh_from_db()
+		self.assertFalse(older.is_current)
+		self.assertTrue(newer.is_current)
+
+	def test_board_is_refreshed_on_write(self):
+		self._post('50.00', date(2025, 5, 1))
+		self.client.get(reverse('price-current'))
+		latest = self._post('58.00', date(2025, 5, 20))
+		response = self.client.get(reverse('price-current'))
+		self.assertEqual(response.data[0]['id'], latest.id)
+		self.assertEqual(response.data[0]['price_per_unit'], '58.00')
+
+	def test_rolled_back_write_leaves_cached_board_alone(self):
+		self._post('50.00', date(2025, 5, 1))
+		self.client.get(reverse('price-current'))
+		with self.captureOnCommitCallbacks(execute=True) as callbacks:
+			with self.assertRaises(RuntimeError), transaction.atomic():
+				PriceUpdate.objects.create(
+					commodity='Beans', grade='premium', price_per_unit=Decimal('58.00'), effective_date=date(2025, 5, 20)
+				)
+				raise RuntimeError('rolled back')
+		self.assertEqual(callbacks, [])
+		response = self.client.get(reverse('price-current'))
+		self.assertEqual(response.data[0]['price_per_unit'], '50.00')
+
+	def test_is_current_is_not_client_writable(self):
+		self.user.is_staff = True
+		self.user.save(update_fields=['is_staff'])
+		self._post('60.00', date(2025, 6, 1))
+		payload = {
+			'commodity': 'Beans',
+			'grade': 'premium',
+			'price_per_unit': '52.00',
+			'effective_date': '2025-05-01',
+			'is_current': True,
+		}
+		response = self.client.post(reverse('price-list'), payload, format='json')
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+		self.assertFalse(PriceUpdate.objects.get(pk=response.data['id']).is_current)
+
+
+class PriceBoardBulkUploadTestCase(APITestCase):
+	"""Bulk upsert of daily price boards."""
+
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		self.admin = get_user_model().objects.create_user(
+			email='admin@example.com', password='Testpass123!', is_staff=True
+		)
+		self.client.force_authenticate(self.admin)
+
+	def test_json_upload_inserts_then_updates_on_key(self):
+		rows = [
+			{'commodity': 'Maize', 'grade': 'grade_a', 'price_per_unit': '31.00', 'effective_date': '2025-07-01'},
+			{'commodity': 'Rice', 'grade': 'premium', 'market': 'retail', 'price_per_unit': '90.00', 'effective_date': '2025-07-01'},
+		]
+		response = self.client.post(reverse('price-bulk-upload'), rows, format='json')
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(response.data['upserted'], 2)
+
+		rows[0]['price_per_unit'] = '33.50'
+		self.client.post(reverse('price-bulk-upload'), rows, format='json')
+		self.assertEqual(PriceUpdate.objects.count(), 2)
+		self.assertEqual(PriceUpdate.objects.get(commodity='Maize').price_per_unit, Decimal('33.50'))
+		board = self.client.get(reverse('price-current')).data
+		self.assertEqual({entry['price_per_unit'] for entry in board}, {'33.50', '90.00'})
+
+	def test_csv_upload(self):
+		content = (
+			'commodity,grade,market,price_per_unit,unit,effective_date\n'
+			'Sorghum,grade_b,wholesale,22.00,kg,2025-07-02\n'
+			'Sorghum,grade_b,wholesale,23.00,kg,2025-07-02\n'
+		)
+		upload = SimpleUploadedFile('board.csv', content.encode('utf-8'), content_type='text/csv')
+		response = self.client.post(reverse('price-bulk-upload'), {'file': upload}, format='multipart')
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(response.data['upserted'], 1)
+		self.assertEqual(PriceUpdate.objects.get(commodity='Sorghum').price_per_unit, Decimal('23.00'))
+
+	def test_non_utf8_csv_is_rejected(self):
+		content = 'commodity,grade,price_per_unit,effective_date\nMa\xefs,grade_a,22.00,2025-07-02\n'
+		upload = SimpleUploadedFile('board.csv', content.encode('latin-1'), content_type='text/csv')
+		response = self.client.post(reverse('price-bulk-upload'), {'file': upload}, format='multipart')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertIn('file', response.data)
+		self.assertFalse(PriceUpdate.objects.exists())
+
+	def test_invalid_rows_reject_the_upload(self):
+		rows = [{'commodity': 'Maize', 'grade': 'grade_a', 'price_per_unit': '-1', 'effective_date': '2025-07-01'}]
+		response = self.client.post(reverse('price-bulk-upload'), rows, format='json')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertFalse(PriceUpdate.objects.exists())
+
+	def test_non_staff_cannot_upload(self):
+		buyer = get_user_model().objects.create_user(email='buyer2@example.com', password='Testpass123!')
+		self.client.force_authenticate(buyer)
+		response = self.client.post(reverse('price-bulk-upload'), [], format='json')
+		self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@mock.patch.object(evaluate_price_alerts, 'delay', side_effect=evaluate_price_alerts)
+class PriceAlertTestCase(APITestCase):
+	"""Threshold alerts evaluated when the price board moves."""
+
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		fair_prices = mock.patch.object(refresh_listing_fair_prices, 'apply_async')
+		fair_prices.start()
+		self.addCleanup(fair_prices.stop)
+		self.buyer = get_user_model().objects.create_user(email='alerts@example.com', password='Testpass123!')
+		self.client.force_authenticate(self.buyer)
+		with self.captureOnCommitCallbacks(execute=True):
+			PriceUpdate.objects.create(
+				commodity='Maize', grade='grade_a', price_per_unit=Decimal('30.00'), effective_date=date(2025, 8, 1)
+			)
+		self.above = PriceAlert.objects.create(
+			user=self.buyer, commodity='Maize', grade='grade_a', direction=PriceAlert.Direction.ABOVE, threshold=Decimal('35.00')
+		)
+		self.below = PriceAlert.objects.create(
+			user=self.buyer, commodity='Maize', grade='grade_a', direction=PriceAlert.Direction.BELOW, threshold=Decimal('25.00')
+		)
+
+	def _post_price(self, price: str, day: int) -> None:
+		with self.captureOnCommitCallbacks(execute=True):
+			PriceUpdate.objects.create(
+				commodity='Maize', grade='grade_a', price_per_unit=Decimal(price), effective_date=date(2025, 8, day)
+			)
+
+	def test_crossing_above_notifies_once(self, _delay):
+		self._post_price('36.00', 2)
+		self._post_price('37.00', 3)
+		notifications = Notification.objects.filter(recipient=self.buyer, category='marketplace')
+		self.assertEqual(notifications.count(), 1)
+		self.assertEqual(notifications.get().metadata['price_alert'], self.above.id)
+		self.above.refresh_from_db()
+		self.assertIsNotNone(self.above.last_triggered_at)
+
+	def test_move_without_crossing_is_silent(self, _delay):
+		self._post_price('33.00', 2)
+		self.assertFalse(Notification.objects.exists())
+
+	def test_crossing_below_and_inactive_alerts(self, _delay):
+		PriceAlert.objects.create(
+			user=self.buyer, commodity='Maize', grade='grade_a', direction=PriceAlert.Direction.BELOW,
+			threshold=Decimal('28.00'), is_active=False,
+		)
+		self._post_price('24.00', 2)
+		self.assertEqual(Notification.objects.get().metadata['price_alert'], self.below.id)
+
+	def test_alerts_api_is_scoped_to_user(self, _delay):
+		other = get_user_model().objects.create_user(email='other-alerts@example.com', password='Testpass123!')
+		PriceAlert.objects.create(
+			user=other, commodity='Rice', grade='premium', direction=PriceAlert.Direction.ABOVE, threshold=Decimal('1.00')
+		)
+		payload = {'commodity': 'Rice', 'grade': 'premium', 'direction': 'below', 'threshold': '80.00'}
+		response = self.client.post(reverse('price-alert-list'), payload, format='json')
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+		response = self.client.get(reverse('price-alert-list'))
+		self.assertEqual(response.data['count'], 3)
+		self.assertTrue(all(alert['user'] == self.buyer.id for alert in response.data['results']))
+
+
+@mock.patch.object(notify_saved_search_matches, 'delay', side_effect=notify_saved_search_matches)
+class SavedSearchMatchingTestCase(APITestCase):
+	"""New listings are matched incrementally against saved searches."""
+
+	def setUp(self):
+		User = get_user_model()
+		self.seller = User.objects.create_user(email='seller@example.com', password='Testpass123!')
+		self.buyer = User.objects.create_user(email='saver@example.com', password='Testpass123!', role='buyer')
+		self.client.force_authenticate(self.buyer)
+		self.farm = Farm.objects.create(owner=self.seller, name='Sunrise', location='Nakuru', total_area=Decimal('12.00'))
+
+	def _list(self, **overrides) -> Listing:
+		data = {
+			'farm': self.farm,
+			'seller': self.seller,
+			'category': Listing.Category.CROPS,
+			'title': 'White maize',
+			'description': 'Dry, sorted, 90kg bags',
+			'quantity': Decimal('500'),
+			'price_per_unit': Decimal('32.00'),
+			'quality_grade': Listing.QualityGrade.A,
+			'location': 'Nakuru',
+		}
+		data.update(overrides)
+		with self.captureOnCommitCallbacks(execute=True):
+			return Listing.objects.create(**data)
+
+	def _save_search(self, **fields) -> SavedSearch:
+		return SavedSearch.objects.create(user=self.buyer, name=fields.pop('name', 'Maize'), **fields)
+
+	def test_matching_listing_notifies_saver(self, _delay):
+		search = self._save_search(category='crops', price_max=Decimal('35.00'), location='nakuru', query='maize')
+		listing = self._list()
+		notification = Notification.objects.get(recipient=self.buyer)
+		self.assertEqual(notification.metadata, {'saved_search': search.id, 'listing': listing.id})
+		search.refresh_from_db()
+		self.assertIsNotNone(search.last_matched_at)
+
+	def test_wildcards_and_ranges(self, _delay):
+		self._save_search(name='Any grade', quality_grade='')
+		self._save_search(name='Premium only', quality_grade='premium')
+		self._save_search(name='Too cheap', price_max=Decimal('20.00'))
+		self._save_search(name='Wrong text', query='sorghum')
+		self._save_search(name='Paused', is_active=False)
+		self._list()
+		titles = list(Notification.objects.values_list('title', flat=True))
+		self.assertEqual(len(titles), 1)
+		self.assertIn('Any grade', titles[0])
+
+	def test_saved_search_api(self, _delay):
+		payload = {'name': 'Cheap seeds', 'category': 'seeds', 'price_min': '10.00', 'price_max': '5.00'}
+		response = self.client.post(reverse('saved-search-list'), payload, format='json')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		payload['price_max'] = '50.00'
+		response = self.client.post(reverse('saved-search-list'), payload, format='json')
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+		self.assertEqual(SavedSearch.objects.get().user, self.buyer)
+
+
+class OrderPlacementTestCase(APITestCase):
+	"""Orders reserve listing quantity atomically and post inventory sales."""
+
+	def setUp(self):
+		User = get_user_model()
+		self.seller = User.objects.create_user(email='order-seller@example.com', password='Testpass123!')
+		self.buyer = User.objects.create_user(email='order-buyer@example.com', password='Testpass123!', role='buyer')
+		self.client.force_authenticate(self.buyer)
+		farm = Farm.objects.create(owner=self.seller, name='Hillside', location='Eldoret', total_area=Decimal('8.00'))
+		self.item = InventoryItem.objects.create(
+			farm=farm,
+			owner=self.seller,
+			category=InventoryItem.Category.HARVEST,
+			name='Maize harvest',
+			quantity=Decimal('100.00'),
+		)
+		self.listing = Listing.objects.create(
+			farm=farm,
+			seller=self.seller,
+			title='Maize',
+			description='Bagged maize',
+			quantity=Decimal('10.00'),
+			price_per_unit=Decimal('40.00'),
+			location='Eldoret',
+			inventory_item=self.item,
+		)
+
+	def _order(self, quantity: str):
+		return self.client.post(reverse('order-list'), {'listing': self.listing.id, 'quantity': quantity}, format='json')
+
+	def test_order_decrements_listing_and_posts_sale(self):
+		response = self._order('4.00')
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+		self.assertEqual(response.data['total_price'], '160.00')
+		self.listing.refresh_from_db()
+		self.item.refresh_from_db()
+		self.assertEqual(self.listing.quantity, Decimal('6.00'))
+		self.assertEqual(self.item.quantity, Decimal('96.00'))
+		sale = InventoryTransaction.objects.get(related_listing=self.listing)
+		self.assertEqual(sale.transaction_type, InventoryTransaction.TransactionType.SALE)
+		self.assertEqual(sale.quantity_change, Decimal('-4.00'))
+
+	def test_exhausting_listing_marks_it_sold_and_rejects_oversell(self):
+		self.assertEqual(self._order('10.00').status_code, status.HTTP_201_CREATED)
+		self.listing.refresh_from_db()
+		self.assertEqual(self.listing.status, Listing.Status.SOLD)
+		self.assertEqual(self._order('1.00').status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertEqual(Order.objects.count(), 1)
+
+	def test_cannot_order_more_than_available_or_own_listing(self):
+		self.assertEqual(self._order('11.00').status_code, status.HTTP_400_BAD_REQUEST)
+		self.client.force_authenticate(self.seller)
+		self.assertEqual(self._order('1.00').status_code, status.HTTP_400_BAD_REQUEST)
+		self.listing.refresh_from_db()
+		self.assertEqual(self.listing.quantity, Decimal('10.00'))
+
+	def test_cancel_restores_reservation(self):
+		order_id = self._order('10.00').data['id']
+		response = self.client.post(reverse('order-cancel', args=[order_id]))
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(response.data['status'], Order.Status.CANCELLED)
+		self.listing.refresh_from_db()
+		self.item.refresh_from_db()
+		self.assertEqual(self.listing.quantity, Decimal('10.00'))
+		self.assertEqual(self.listing.status, Listing.Status.ACTIVE)
+		self.assertEqual(self.item.quantity, Decimal('100.00'))
+		self.assertEqual(self.client.post(reverse('order-cancel', args=[order_id])).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ListingProximityTestCase(APITestCase):
+	"""Geohash-pruned radius search over listings."""
+
+	def setUp(self):
+		User = get_user_model()
+		self.seller = User.objects.create_user(email='geo-seller@example.com', password='Testpass123!')
+		self.client.force_authenticate(User.objects.create_user(email='geo-buyer@example.com', password='Testpass123!'))
+		self.near_farm = Farm.objects.create(
+			owner=self.seller, name='Kiambu', location='Kiambu', total_area=Decimal('4.00'),
+			latitude=Decimal('-1.171400'), longitude=Decimal('36.835600'),
+		)
+		self.close_farm = Farm.objects.create(
+			owner=self.seller, name='Westlands', location='Nairobi', total_area=Decimal('2.00'),
+			latitude=Decimal('-1.268000'), longitude=Decimal('36.811000'),
+		)
+		self.far_farm = Farm.objects.create(
+			owner=self.seller, name='Kisumu', location='Kisumu', total_area=Decimal('6.00'),
+			latitude=Decimal('-0.091700'), longitude=Decimal('34.768000'),
+		)
+		self.listings = {
+			farm.name: Listing.objects.create(
+				farm=farm, seller=self.seller, title=f"Beans from {farm.name}", description='Dry beans',
+				quantity=Decimal('50'), price_per_unit=Decimal('90.00'), location=farm.location,
+			)
+			for farm in (self.near_farm, self.close_farm, self.far_farm)
+		}
+
+	def test_listings_inherit_farm_geohash(self):
+		self.assertEqual(self.listings['Kisumu'].geohash, self.far_farm.geohash)
+		self.far_farm.latitude = Decimal('-0.100000')
+		self.far_farm.save()
+		self.listings['Kisumu'].refresh_from_db()
+		self.assertEqual(self.listings['Kisumu'].geohash, self.far_farm.geohash)
+
+	def test_near_filter_sorted_by_distance(self):
+		response = self.client.get(
+			reverse('listing-list'), {'near': '-1.2864,36.8172', 'radius': '30', 'ordering': 'distance_km'}
+		)
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		ids = [listing['id'] for listing in response.data['results']]
+		self.assertEqual(ids, [self.listings['Westlands'].id, self.listings['Kiambu'].id])
+		self.assertLess(response.data['results'][0]['distance_km'], response.data['results'][1]['distance_km'])
+
+	def test_distance_ordering_without_near_is_ignored(self):
+		response = self.client.get(reverse('listing-list'), {'ordering': 'distance_km'})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(len(response.data['results']), 3)
+
+
+class SimilarListingsTestCase(APITestCase):
+	"""Nightly TF-IDF neighbours embedded in the listing detail response."""
+
+	def setUp(self):
+		User = get_user_model()
+		self.seller = User.objects.create_user(email='similar-seller@example.com', password='Testpass123!')
+		self.client.force_authenticate(self.seller)
+		self.farm = Farm.objects.create(owner=self.seller, name='Similar', location='Nakuru', total_area=Decimal('3.00'))
+
+	def _listing(self, title, description, category=Listing.Category.CROPS):
+		return Listing.objects.create(
+			farm=self.farm, seller=self.seller, title=title, description=description, category=category,
+			quantity=Decimal('10'), price_per_unit=Decimal('50.00'), location='Nakuru',
+		)
+
+	def test_similar_listings_are_ranked_within_category(self):
+		maize = self._listing('White maize', 'Dry white maize grain, sun dried')
+		yellow = self._listing('Yellow maize', 'Dry yellow maize grain')
+		self._listing('Red beans', 'Rosecoco beans harvested in June')
+		seed = self._listing('Maize seed', 'Hybrid white maize seed', category=Listing.Category.SEEDS)
+
+		rebuild_listing_similarities()
+
+		neighbours = list(ListingSimilarity.objects.filter(listing=maize).values_list('similar_id', flat=True))
+		self.assertEqual(neighbours[0], yellow.id)
+		self.assertNotIn(maize.id, neighbours)
+		self.assertNotIn(seed.id, neighbours)
+		self.assertFalse(ListingSimilarity.objects.filter(listing=seed).exists())
+
+		response = self.client.get(reverse('listing-detail', args=[maize.id]))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data['similar_listings'][0]['id'], yellow.id)
+		self.assertEqual(set(response.data['similar_listings'][0]), {'id', 'title', 'category', 'price_per_unit', 'unit', 'location', 'score'})
+
+	def test_oversized_category_is_compared_in_id_slices(self):
+		listings = [self._listing(f'Maize lot {n}', 'Dry white maize grain') for n in range(6)]
+
+		rebuild_listing_similarities(SimilarityConfig(max_partition_size=2))
+
+		pairs = list(ListingSimilarity.objects.values_list('listing_id', 'similar_id'))
+		self.assertTrue(pairs)
+		for listing_id, similar_id in pairs:
+			self.assertEqual(listing_id % 3, similar_id % 3)
+		self.assertEqual({listing_id for listing_id, _ in pairs}, {listing.id for listing in listings})
+
+	def test_inactive_neighbours_are_hidden_and_pruned(self):
+		maize = self._listing('White maize', 'Dry white maize grain')
+		yellow = self._listing('Yellow maize', 'Dry yellow maize grain')
+		rebuild_listing_similarities()
+
+		Listing.objects.filter(pk=yellow.pk).update(status=Listing.Status.SOLD)
+		response = self.client.get(reverse('listing-detail', args=[maize.id]))
+		self.assertEqual(response.data['similar_listings'], [])
+
+		rebuild_listing_similarities()
+		self.assertFalse(ListingSimilarity.objects.exists())
+
+
+@mock.patch.object(refresh_listing_fair_prices, 'apply_async', side_effect=lambda *args, **kwargs: refresh_listing_fair_prices())
+class FairPriceIndicatorTestCase(APITestCase):
+	"""Listing prices compared with the current wholesale board after board writes."""
+
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		User = get_user_model()
+		self.seller = User.objects.create_user(email='fair-seller@example.com', password='Testpass123!')
+		self.client.force_authenticate(User.objects.create_user(email='fair-buyer@example.com', password='Testpass123!'))
+		self.farm = Farm.objects.create(owner=self.seller, name='Fair', location='Eldoret', total_area=Decimal('5.00'))
+
+	def _listing(self, title, price, unit='kg', category=Listing.Category.CROPS):
+		return Listing.objects.create(
+			farm=self.farm, seller=self.seller, title=title, description='Fresh harvest', category=category,
+			quantity=Decimal('10'), unit=unit, price_per_unit=Decimal(price), quality_grade=Listing.QualityGrade.A,
+		)
+
+	def _post_board(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			PriceUpdate.objects.create(commodity='Maize', grade='grade_a', price_per_unit=Decimal('30.00'))
+			PriceUpdate.objects.create(commodity='Beans', grade='grade_a', unit='90kg bag', price_per_unit=Decimal('9000.00'))
+			PriceUpdate.objects.create(
+				commodity='Rice', grade='grade_a', market=PriceUpdate.MarketType.RETAIL, price_per_unit=Decimal('150.00')
+			)
+
+	def test_ratio_and_percentile_with_unit_conversion(self, _delay):
+		white = self._listing('White maize', '33.00')
+		dried = self._listing('Dry maize, sun dried', '27000.00', unit='tonne')
+		beans = self._listing('Rosecoco beans', '110.00')
+		price_tag = self._listing('Best price in town', '10.00')
+		seed = self._listing('Hybrid maize seed', '300.00', category=Listing.Category.SEEDS)
+
+		self._post_board()
+
+		white.refresh_from_db()
+		dried.refresh_from_db()
+		beans.refresh_from_db()
+		self.assertEqual(white.fair_price_commodity, 'Maize')
+		self.assertEqual(white.fair_price, Decimal('30.00'))
+		self.assertAlmostEqual(white.fair_price_ratio, 1.1)
+		self.assertEqual(white.fair_price_percentile, 100.0)
+		self.assertEqual(dried.fair_price, Decimal('30000.00'))
+		self.assertAlmostEqual(dried.fair_price_ratio, 0.9)
+		self.assertEqual(dried.fair_price_percentile, 0.0)
+		self.assertEqual(beans.fair_price, Decimal('100.00'))
+		self.assertAlmostEqual(beans.fair_price_ratio, 1.1)
+		for listing in (price_tag, seed):
+			listing.refresh_from_db()
+			self.assertIsNone(listing.fair_price_ratio)
+
+		response = self.client.get(reverse('listing-list'), {'ordering': 'fair_price_ratio', 'category': 'crops'})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data['results'][0]['id'], dried.id)
+		self.assertEqual(response.data['results'][0]['fair_price_ratio'], 0.9)
+
+	def test_indicator_cleared_when_listing_leaves_market(self, _delay):
+		listing = self._listing('Yellow maize', '30.00')
+		self._post_board()
+		Listing.objects.filter(pk=listing.pk).update(status=Listing.Status.SOLD)
+		refresh_listing_fair_prices()
+		listing.refresh_from_db()
+		self.assertIsNone(listing.fair_price)
+		self.assertEqual(listing.fair_price_commodity, '')
+
+	def test_board_writes_queue_one_refresh_and_touch_changed_listings(self, _delay):
+		listing = self._listing('White maize', '33.00')
+		with mock.patch.object(refresh_listing_fair_prices, 'apply_async') as queued:
+			self._post_board()
+		queued.assert_called_once_with(countdown=FAIR_PRICE_DEBOUNCE_SECONDS)
+		refresh_listing_fair_prices()
+		listing.refresh_from_db()
+		self.assertEqual(listing.fair_price_commodity, 'Maize')
+		stamped = listing.updated_at
+
+		refresh_listing_fair_prices()
+		listing.refresh_from_db()
+		self.assertEqual(listing.updated_at, stamped)
+
+		Listing.objects.filter(pk=listing.pk).update(title='White sorghum')
+		refresh_listing_fair_prices()
+		listing.refresh_from_db()
+		self.assertEqual(listing.fair_price_commodity, '')
+		self.assertGreater(listing.updated_at, stamped)
@@ -3,11 +3,14 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import ListingViewSet, PriceUpdateViewSet
+from .views import ListingViewSet, OrderViewSet, PriceAlertViewSet, PriceUpdateViewSet, SavedSearchViewSet
 
 router = DefaultRouter()
 router.register('listings', ListingViewSet, basename='listing')
 router.register('prices', PriceUpdateViewSet, basename='price')
+router.register('price-alerts', PriceAlertViewSet, basename='price-alert')
+router.register('saved-searches', SavedSearchViewSet, basename='saved-search')
+router.register('orders', OrderViewSet, basename='order')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -2,13 +2,37 @@
 
 from __future__ import annotations
 
-from django.db.models import Q
+import csv
+import io
+
+from django.db.models import F, Q
 from django_filters import rest_framework as df_filters
-from rest_framework import filters, mixins, parsers, permissions, viewsets
+from rest_framework import filters, mixins, parsers, permissions, serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 
-from .models import Listing, PriceUpdate
-from .serializers import ListingSerializer, PriceUpdateSerializer
+from farms.geo import parse_near, within_radius
+
+from .models import Listing, ListingSimilarity, Order, PriceAlert, PriceUpdate, SavedSearch
+from .serializers import (
+	ListingSerializer,
+	OrderSerializer,
+	PriceAlertSerializer,
+	PriceBoardRowSerializer,
+	PriceHistoryQuerySerializer,
+	PriceUpdateSerializer,
+	SavedSearchSerializer,
+)
+from .services import (
+	cancel_order,
+	current_price_board,
+	place_order,
+	price_history,
+	upsert_price_board,
+)
+
+DEFAULT_NEAR_RADIUS_KM = 50
 
 
 
@@ -18,6 +42,8 @@ class ListingFilterSet(df_filters.FilterSet):
 	price_max = df_filters.NumberFilter(field_name='price_per_unit', lookup_expr='lte')
 	expires_before = df_filters.DateTimeFilter(field_name='expires_at', lookup_expr='lte')
 	expires_after = df_filters.DateTimeFilter(field_name='expires_at', lookup_expr='gte')
+	near = df_filters.CharFilter(method='filter_near')
+	radius = df_filters.NumberFilter(method='filter_radius')
 
 	class Meta:
 		model = Listing
@@ -30,6 +56,36 @@ class ListingFilterSet(df_filters.FilterSet):
 			'farm': ['exact'],
 		}
 
+	def filter_near(self, queryset, name, value):
+		"""Restrict to listings whose farm lies within ``radius`` km (default 50) of ``lat,lng``."""
+
+		try:
+			latitude, longitude = parse_near(value)
+		except ValueError as exc:
+			raise ValidationError({'near': str(exc)})
+		radius = self.form.cleaned_data.get('radius') or DEFAULT_NEAR_RADIUS_KM
+		return within_radius(
+			queryset,
+			latitude=latitude,
+			longitude=longitude,
+			radius_km=float(radius),
+			lat_field='farm__latitude',
+			lng_field='farm__longitude',
+		)
+
+	def filter_radius(self, queryset, name, value):
+		return queryset
+
+
+class ListingOrderingFilter(filters.OrderingFilter):
+	"""Ordering that accepts ``distance_km`` only when a ``near`` filter annotated it."""
+
+	def get_ordering(self, request, queryset, view):
+		ordering = super().get_ordering(request, queryset, view)
+		if ordering and 'distance_km' not in queryset.query.annotations:
+			ordering = [term for term in ordering if term.lstrip('-') != 'distance_km'] or self.get_default_ordering(view)
+		return ordering
+
 
 class IsSellerOrReadOnly(permissions.BasePermission):
 	def has_permission(self, request, view):
@@ -55,10 +111,10 @@ class ListingViewSet(viewsets.ModelViewSet):
 	queryset = Listing.objects.select_related('seller', 'farm', 'inventory_item')
 	permission_classes = [IsSellerOrReadOnly]
 	parser_classes = [parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser]
-	filter_backends = [df_filters.DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+	filter_backends = [df_filters.DjangoFilterBackend, filters.SearchFilter, ListingOrderingFilter]
 	filterset_class = ListingFilterSet
 	search_fields = ['title', 'description', 'location']
-	ordering_fields = ['price_per_unit', 'created_at', 'expires_at', 'views_count']
+	ordering_fields = ['price_per_unit', 'created_at', 'expires_at', 'views_count', 'distance_km', 'fair_price_ratio']
 	ordering = ['-created_at']
 
 	def get_queryset(self):
@@ -91,12 +147,138 @@ class ListingViewSet(viewsets.ModelViewSet):
 		if request.method == 'GET':
 			instance.mark_viewed()
 		serializer = self.get_serializer(instance)
-		return Response(serializer.data)
+		data = serializer.data
+		data['similar_listings'] = self._similar_listings(instance)
+		return Response(data)
+
+	@staticmethod
+	def _similar_listings(instance) -> list[dict]:
+		"""Precomputed neighbours that are still active, read with one indexed query."""
+
+		return list(
+			ListingSimilarity.objects.filter(listing=instance, similar__status=Listing.Status.ACTIVE)
+			.order_by('rank')
+			.values(
+				'score',
+				id=F('similar_id'),
+				title=F('similar__title'),
+				category=F('similar__category'),
+				price_per_unit=F('similar__price_per_unit'),
+				unit=F('similar__unit'),
+				location=F('similar__location'),
+			)
+		)
 
 
 class PriceUpdateViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, mixins.UpdateModelMixin, viewsets.GenericViewSet):
 	serializer_class = PriceUpdateSerializer
 	queryset = PriceUpdate.objects.all()
 	permission_classes = [AdminOrReadOnly]
+	parser_classes = [parsers.JSONParser, parsers.MultiPartParser, parsers.FormParser]
 	filter_backends = [df_filters.DjangoFilterBackend]
 	filterset_fields = ('commodity', 'grade', 'market', 'is_current')
+
+	@action(detail=False, methods=['get'], url_path='history')
+	def history(self, request):
+		"""Return bucketed open/close/min/max/avg prices for charting."""
+
+		params = PriceHistoryQuerySerializer(data=request.query_params)
+		params.is_valid(raise_exception=True)
+		return Response(price_history(**params.validated_data))
+
+	@action(detail=False, methods=['get'], url_path='current')
+	def current(self, request):
+		"""Return the latest price per commodity/grade/market from the materialized board."""
+
+		return Response(current_price_board())
+
+	@action(detail=False, methods=['post'], url_path='bulk')
+	def bulk_upload(self, request):
+		"""Upsert a full price board from a JSON list or a CSV file under "file"."""
+
+		upload = request.FILES.get('file')
+		if upload:
+			try:
+				rows = list(csv.DictReader(io.StringIO(upload.read().decode('utf-8-sig'))))
+			except (UnicodeDecodeError, csv.Error) as exc:
+				raise ValidationError({'file': f"Upload a UTF-8 encoded CSV file ({exc})."})
+		elif isinstance(request.data, list):
+			rows = request.data
+		else:
+			rows = request.data.get('rows')
+		if not rows:
+			return Response(
+				{'detail': 'Provide a JSON list of rows, a "rows" list, or a CSV file under the "file" key.'},
+				status=status.HTTP_400_BAD_REQUEST,
+			)
+
+		serializer = PriceBoardRowSerializer(data=rows, many=True)
+		serializer.is_valid(raise_exception=True)
+		upserted = upsert_price_board(serializer.validated_data)
+		return Response({'received': len(rows), 'upserted': upserted})
+
+
+class PriceAlertViewSet(viewsets.ModelViewSet):
+	"""Price threshold subscriptions owned by the requesting user."""
+
+	serializer_class = PriceAlertSerializer
+	permission_classes = [permissions.IsAuthenticated]
+	filter_backends = [df_filters.DjangoFilterBackend]
+	filterset_fields = ('commodity', 'grade', 'market', 'direction', 'is_active')
+
+	def get_queryset(self):
+		return PriceAlert.objects.filter(user=self.request.user)
+
+	def perform_create(self, serializer):
+		serializer.save(user=self.request.user)
+
+
+class SavedSearchViewSet(viewsets.ModelViewSet):
+	"""Saved listing filters that notify their owner about new matching listings."""
+
+	serializer_class = SavedSearchSerializer
+	permission_classes = [permissions.IsAuthenticated]
+
+	def get_queryset(self):
+		return SavedSearch.objects.filter(user=self.request.user)
+
+	def perform_create(self, serializer):
+		serializer.save(user=self.request.user)
+
+
+class OrderViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
+	"""Orders visible to their buyer and to the seller of the listing."""
+
+	serializer_class = OrderSerializer
+	permission_classes = [permissions.IsAuthenticated]
+	filter_backends = [df_filters.DjangoFilterBackend]
+	filterset_fields = ('listing', 'status')
+
+	def get_queryset(self):
+		qs = Order.objects.select_related('listing', 'listing__seller', 'buyer')
+		if self.request.user.is_staff:
+			return qs
+		return qs.filter(Q(buyer=self.request.user) | Q(listing__seller=self.request.user))
+
+	def perform_create(self, serializer):
+		validated = serializer.validated_data
+		try:
+			serializer.instance = place_order(
+				listing_id=validated['listing'].pk,
+				buyer=self.request.user,
+				quantity=validated['quantity'],
+				notes=validated.get('notes', ''),
+			)
+		except ValueError as exc:
+			raise serializers.ValidationError(str(exc))
+
+	@action(detail=True, methods=['post'])
+	def cancel(self, request, pk=None):
+		order = self.get_object()
+		if not request.user.is_staff and request.user.id not in (order.buyer_id, order.listing.seller_id):
+			raise PermissionDenied('You cannot cancel this order.')
+		try:
+			order = cancel_order(order, performed_by=request.user)
+		except ValueError as exc:
+			raise serializers.ValidationError(str(exc))
+		return Response(self.get_serializer(order).data)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Notification
+from .models import Broadcast, Notification, OutboundEmail
 
 
 @admin.register(Notification)
@@ -8,3 +8,22 @@ class NotificationAdmin(admin.ModelAdmin):
 	list_display = ('title', 'recipient', 'category', 'is_read', 'created_at')
 	list_filter = ('category', 'is_read')
 	search_fields = ('title', 'recipient__email')
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+	list_display = ('title', 'category', 'status', 'total_recipients', 'delivered_count', 'created_by', 'created_at')
+	list_filter = ('status', 'category')
+	search_fields = ('title',)
+	readonly_fields = (
+		'status', 'total_recipients', 'delivered_count', 'chunk_count', 'completed_chunks', 'error',
+		'started_at', 'finished_at',
+	)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+	list_display = ('subject', 'tag', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+	list_filter = ('status', 'tag')
+	search_fields = ('subject', 'to')
+	readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
@@ -0,0 +1,163 @@
+"""Broadcast notifications to every user matching an audience.
+
+Planning splits the audience into contiguous user id ranges of
+``BROADCAST_CHUNK_SIZE`` recipients with one window query. Each range is a
+``BroadcastChunk`` delivered by its own Celery task, which re-resolves the
+audience inside the range and writes the notifications with ``bulk_create``
+in a short transaction that also marks the chunk done. Chunks therefore run
+in parallel across workers, a retried chunk never notifies anyone twice,
+and no transaction spans more than one chunk.
+"""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, QuerySet
+from django.utils import timezone
+
+from farms.models import Farm, Region
+
+from .models import Broadcast, BroadcastChunk, Notification
+
+BROADCAST_CHUNK_SIZE = 5000
+BROADCAST_INSERT_BATCH_SIZE = 1000
+# Chunks take seconds each, so a broadcast still running after this has a
+# chunk whose task died with its worker or was never received.
+BROADCAST_STALE_AFTER = timedelta(hours=1)
+
+
+def broadcast_audience(audience: dict) -> QuerySet:
+    """Active users matching ``audience``: any of ``roles`` and owning a farm within ``region``.
+
+    Raises ``ValueError`` for an unknown region.
+    """
+
+    users = get_user_model().objects.filter(is_active=True)
+    if audience.get('roles'):
+        users = users.filter(role__in=audience['roles'])
+    if audience.get('region'):
+        path = Region.objects.filter(pk=audience['region']).values_list('path', flat=True).first()
+        if path is None:
+            raise ValueError('Unknown region.')
+        users = users.filter(Exists(Farm.objects.filter(owner=OuterRef('pk'), region__path__startswith=path)))
+    return users
+
+
+def create_broadcast(user, *, title: str, message: str, category: str = 'system', metadata=None, audience=None) -> Broadcast:
+    """Record a broadcast and plan its delivery once the transaction commits."""
+
+    from .tasks import plan_broadcast_delivery
+
+    audience = audience or {}
+    broadcast_audience(audience)
+    broadcast = Broadcast.objects.create(
+        created_by=user,
+        title=title,
+        message=message,
+        category=category,
+        metadata=metadata or {},
+        audience=audience,
+    )
+    transaction.on_commit(partial(plan_broadcast_delivery.delay, broadcast.pk))
+    return broadcast
+
+
+def _chunk_ranges(users: QuerySet, chunk_size: int) -> list[tuple[int, int, int]]:
+    """``(first id, last id, recipients)`` of consecutive runs of ``chunk_size`` users, in one query."""
+
+    inner, params = users.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT MIN(id), MAX(id), COUNT(*) FROM ('
+            f'SELECT id, (ROW_NUMBER() OVER (ORDER BY id) - 1) / %s AS chunk FROM ({inner}) AS audience'
+            ') AS numbered GROUP BY chunk ORDER BY chunk',
+            [chunk_size, *params],
+        )
+        return cursor.fetchall()
+
+
+def plan_broadcast(broadcast_id: int, *, chunk_size: int | None = None) -> int:
+    """Split a pending broadcast into chunks and queue one delivery task per chunk; returns the chunk count."""
+
+    from .tasks import deliver_broadcast_chunk
+
+    with transaction.atomic():
+        claimed = Broadcast.objects.filter(pk=broadcast_id, status=Broadcast.Status.PENDING).update(
+            status=Broadcast.Status.RUNNING, started_at=timezone.now()
+        )
+        if not claimed:
+            return 0
+        broadcast = Broadcast.objects.get(pk=broadcast_id)
+        ranges = _chunk_ranges(broadcast_audience(broadcast.audience), chunk_size or BROADCAST_CHUNK_SIZE)
+        chunks = BroadcastChunk.objects.bulk_create(
+            BroadcastChunk(broadcast=broadcast, first_user_id=first, last_user_id=last) for first, last, _count in ranges
+        )
+        broadcast.total_recipients = sum(count for _first, _last, count in ranges)
+        broadcast.chunk_count = len(chunks)
+        update_fields = ['total_recipients', 'chunk_count']
+        if not chunks:
+            broadcast.status = Broadcast.Status.COMPLETED
+            broadcast.finished_at = timezone.now()
+            update_fields += ['status', 'finished_at']
+        broadcast.save(update_fields=update_fields)
+        for chunk in chunks:
+            transaction.on_commit(partial(deliver_broadcast_chunk.delay, chunk.pk))
+    return len(chunks)
+
+
+def deliver_chunk(chunk_id: int) -> int:
+    """Write the notifications of one chunk unless already delivered; returns notifications written."""
+
+    with transaction.atomic():
+        chunk = BroadcastChunk.objects.select_for_update().select_related('broadcast').filter(pk=chunk_id).first()
+        if chunk is None or chunk.finished_at is not None:
+            return 0
+        broadcast = chunk.broadcast
+        recipients = (
+            broadcast_audience(broadcast.audience)
+            .filter(pk__gte=chunk.first_user_id, pk__lte=chunk.last_user_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        metadata = {**broadcast.metadata, 'broadcast': broadcast.pk}
+        notifications = Notification.objects.bulk_create(
+            [
+                Notification(
+                    recipient_id=recipient_id,
+                    title=broadcast.title,
+                    message=broadcast.message,
+                    category=broadcast.category,
+                    metadata=metadata,
+                )
+                for recipient_id in recipients
+            ],
+            batch_size=BROADCAST_INSERT_BATCH_SIZE,
+        )
+        chunk.delivered = len(notifications)
+        chunk.finished_at = timezone.now()
+        chunk.save(update_fields=['delivered', 'finished_at'])
+        Broadcast.objects.filter(pk=broadcast.pk).update(
+            delivered_count=F('delivered_count') + chunk.delivered, completed_chunks=F('completed_chunks') + 1
+        )
+        Broadcast.objects.filter(
+            pk=broadcast.pk, status=Broadcast.Status.RUNNING, completed_chunks=F('chunk_count')
+        ).update(status=Broadcast.Status.COMPLETED, finished_at=timezone.now())
+    return chunk.delivered
+
+
+def fail_broadcast(chunk_id: int, error: str) -> None:
+    Broadcast.objects.filter(chunks__pk=chunk_id, status=Broadcast.Status.RUNNING).update(
+        status=Broadcast.Status.FAILED, error=error[:2000], finished_at=timezone.now()
+    )
+
+
+def fail_stale_broadcasts() -> int:
+    """Mark broadcasts running for longer than ``BROADCAST_STALE_AFTER`` failed; returns how many."""
+
+    return Broadcast.objects.filter(
+        status=Broadcast.Status.RUNNING, started_at__lt=timezone.now() - BROADCAST_STALE_AFTER
+    ).update(status=Broadcast.Status.FAILED, error='Some chunks were never delivered.', finished_at=timezone.now())
@@ -0,0 +1,179 @@
+"""Fan-out of new notifications to connected clients.
+
+Every process serving the event stream keeps one subscription per connected
+user: an ``asyncio.Queue`` fed by the broker. ``LocalBroker`` only reaches
+subscribers in the publishing process (tests, single-process development);
+``PostgresBroker`` publishes with ``pg_notify`` and runs one ``LISTEN``
+connection per serving process, so notifications created by Celery workers
+or other web processes reach every stream. Select it with
+``NOTIFICATION_BROKER``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'notifications'
+SUBSCRIBER_QUEUE_SIZE = 100
+# PostgreSQL rejects NOTIFY payloads from 8000 bytes.
+MAX_NOTIFY_PAYLOAD = 7900
+_PUBLISH_BATCH_SIZE = 500
+
+
+def notification_payload(notification) -> dict:
+    return {
+        'id': notification.pk,
+        'title': notification.title,
+        'message': notification.message,
+        'category': notification.category,
+        'metadata': notification.metadata,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at,
+    }
+
+
+class LocalBroker:
+    """In-process pub/sub from synchronous publishers to asyncio subscribers."""
+
+    def __init__(self):
+        self._subscribers: dict[int, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscriber_count(self, user_id: int | None = None) -> int:
+        with self._lock:
+            if user_id is not None:
+                return len(self._subscribers.get(user_id, ()))
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[asyncio.Queue]:
+        subscription = (asyncio.get_running_loop(), asyncio.Queue(SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        try:
+            yield subscription[1]
+        finally:
+            with self._lock:
+                queues = self._subscribers.get(user_id)
+                if queues is not None:
+                    queues.discard(subscription)
+                    if not queues:
+                        del self._subscribers[user_id]
+
+    def dispatch(self, user_id: int, payload: dict) -> None:
+        """Hand ``payload`` to the user's subscriber queues; safe to call from any thread."""
+
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscriptions:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, payload)
+            except RuntimeError:
+                # The subscriber's loop closed; its context manager cleans up.
+                pass
+
+    def publish(self, messages: Iterable[tuple[int, dict]]) -> None:
+        for user_id, payload in messages:
+            self.dispatch(user_id, payload)
+
+
+def _offer(queue: asyncio.Queue, payload: dict) -> None:
+    # A client this far behind resyncs from the list endpoint; never block the loop on it.
+    try:
+        queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        logger.warning('Dropping notification %s for a slow stream subscriber', payload.get('id'))
+
+
+class PostgresBroker(LocalBroker):
+    """``pg_notify`` publisher with one shared ``LISTEN`` connection per process."""
+
+    RECONNECT_DELAY = 2
+
+    def __init__(self):
+        super().__init__()
+        self._listener: asyncio.Task | None = None
+
+    def publish(self, messages: Iterable[tuple[int, dict]]) -> None:
+        payloads = [_encode(user_id, payload) for user_id, payload in messages]
+        with connection.cursor() as cursor:
+            for start in range(0, len(payloads), _PUBLISH_BATCH_SIZE):
+                cursor.execute(
+                    'SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload',
+                    [NOTIFY_CHANNEL, payloads[start:start + _PUBLISH_BATCH_SIZE]],
+                )
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[asyncio.Queue]:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        async with super().subscribe(user_id) as queue:
+            yield queue
+
+    async def _listen(self) -> None:
+        import psycopg
+
+        db = settings.DATABASES['default']
+        params = {
+            'dbname': db['NAME'],
+            'user': db.get('USER') or None,
+            'password': db.get('PASSWORD') or None,
+            'host': db.get('HOST') or None,
+            'port': db.get('PORT') or None,
+        }
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(autocommit=True, **params) as conn:
+                    await conn.execute(f'LISTEN {NOTIFY_CHANNEL}')
+                    async for notify in conn.notifies():
+                        message = json.loads(notify.payload)
+                        self.dispatch(message.pop('recipient'), message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Notification listener failed; reconnecting')
+                await asyncio.sleep(self.RECONNECT_DELAY)
+
+
+def _encode(user_id: int, payload: dict) -> str:
+    encoded = json.dumps({'recipient': user_id, **payload}, cls=DjangoJSONEncoder)
+    if len(encoded.encode()) > MAX_NOTIFY_PAYLOAD:
+        # Clients fetch the full notification from the detail endpoint.
+        slim = {key: payload[key] for key in ('id', 'title', 'category', 'is_read', 'created_at') if key in payload}
+        encoded = json.dumps({'recipient': user_id, **slim, 'title': slim.get('title', '')[:200], 'truncated': True}, cls=DjangoJSONEncoder)
+    return encoded
+
+
+BROKERS = {'local': LocalBroker, 'postgres': PostgresBroker}
+_brokers: dict[str, LocalBroker] = {}
+_brokers_lock = threading.Lock()
+
+
+def notification_broker() -> LocalBroker:
+    name = getattr(settings, 'NOTIFICATION_BROKER', 'postgres')
+    with _brokers_lock:
+        if name not in _brokers:
+            _brokers[name] = BROKERS[name]()
+        return _brokers[name]
+
+
+def publish_notifications(notifications: Iterable) -> None:
+    """Push notifications to their recipients' streams after the transaction commits."""
+
+    from django.db import transaction
+
+    messages = [(notification.recipient_id, notification_payload(notification)) for notification in notifications]
+    if messages:
+        transaction.on_commit(lambda: notification_broker().publish(messages))
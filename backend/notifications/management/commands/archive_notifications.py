@@ -0,0 +1,57 @@
+"""Archive read notifications past retention and report storage before and after."""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from notifications.models import Notification, NotificationArchive
+from notifications.retention import NOTIFICATION_ARCHIVE_BATCH_SIZE, archive_notifications, expire_archive, storage_report
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+class Command(BaseCommand):
+    help = 'Move read notifications past their retention into the archive table and show table/index sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--report-only', action='store_true', help='Only print the storage report.')
+        parser.add_argument('--batch-size', type=int, default=NOTIFICATION_ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches.')
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument('--vacuum', action='store_true', help='VACUUM ANALYZE both tables afterwards.')
+
+    def report(self, heading: str) -> None:
+        self.stdout.write(heading)
+        for table in storage_report():
+            self.stdout.write(
+                f"  {table['table']}: ~{table['rows']} rows, table {_megabytes(table['table_bytes'])}, "
+                f"indexes {_megabytes(table['index_bytes'])}, total {_megabytes(table['total_bytes'])}"
+            )
+            for name, size in table['indexes'].items():
+                self.stdout.write(f"    {name}: {_megabytes(size)}")
+
+    def handle(self, *args, **options):
+        self.report('Before:' if not options['report_only'] else 'Storage:')
+        if options['report_only']:
+            return
+
+        started = time.perf_counter()
+        moved = archive_notifications(
+            batch_size=options['batch_size'], pause=options['pause'], max_batches=options['max_batches']
+        )
+        expired = expire_archive()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            'Archived ' + ', '.join(f"{category}: {count}" for category, count in moved.items())
+            + f"; expired {expired} archived rows in {elapsed:.1f}s"
+        )
+        if options['vacuum']:
+            with connection.cursor() as cursor:
+                for model in (Notification, NotificationArchive):
+                    cursor.execute(f"VACUUM (ANALYZE) {connection.ops.quote_name(model._meta.db_table)}")
+        self.report('After:')
@@ -1,9 +1,23 @@
 """Notification models."""
 
+from collections import Counter
+
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 
 
+class NotificationQuerySet(models.QuerySet):
+	def bulk_create(self, objs, *args, **kwargs):
+		from .broker import publish_notifications
+		from .services import adjust_unread_counts
+
+		objs = super().bulk_create(objs, *args, **kwargs)
+		adjust_unread_counts(Counter(obj.recipient_id for obj in objs if not obj.is_read))
+		publish_notifications(obj for obj in objs if obj.pk is not None)
+		return objs
+
+
 class Notification(models.Model):
 	CATEGORY_CHOICES = (
 		('system', 'System'),
@@ -20,10 +34,167 @@ class Notification(models.Model):
 	is_read = models.BooleanField(default=False)
 	created_at = models.DateTimeField(auto_now_add=True)
 
+	objects = NotificationQuerySet.as_manager()
+
 	class Meta:
 		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['recipient', '-created_at'], name='notification_inbox_idx'),
+			# Serves the unread badge count without touching read notifications.
+			models.Index(fields=['recipient'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+			# Finds read notifications past retention for archival.
+			models.Index(fields=['category', 'created_at'], condition=models.Q(is_read=True), name='notification_archivable_idx'),
+		]
 
 	def __str__(self) -> str:
 		return f"Notification to {self.recipient.email}: {self.title}"
 
-# Create your models here.
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		instance._loaded_is_read = instance.__dict__.get('is_read')
+		return instance
+
+	def save(self, *args, **kwargs):
+		from .broker import publish_notifications
+		from .services import adjust_unread_counts
+
+		is_new = self.pk is None
+		was_unread = not is_new and getattr(self, '_loaded_is_read', None) is False
+		super().save(*args, **kwargs)
+		self._loaded_is_read = self.is_read
+		if was_unread != (not self.is_read):
+			adjust_unread_counts({self.recipient_id: -1 if was_unread else 1})
+		if is_new:
+			publish_notifications([self])
+
+	def delete(self, *args, **kwargs):
+		from .services import adjust_unread_counts
+
+		recipient_id, unread = self.recipient_id, not self.is_read
+		result = super().delete(*args, **kwargs)
+		if unread:
+			adjust_unread_counts({recipient_id: -1})
+		return result
+
+
+class NotificationArchive(models.Model):
+	"""Read notification moved out of the live table after its category's retention period.
+
+	Keeps the original id; the read flag is implied.
+	"""
+
+	id = models.BigIntegerField(primary_key=True)
+	recipient = models.ForeignKey(
+		settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_notifications'
+	)
+	title = models.CharField(max_length=255)
+	message = models.TextField()
+	category = models.CharField(max_length=32, choices=Notification.CATEGORY_CHOICES)
+	metadata = models.JSONField(default=dict, blank=True)
+	created_at = models.DateTimeField()
+	archived_at = models.DateTimeField()
+
+	class Meta:
+		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['recipient', '-created_at'], name='notification_archive_inbox_idx'),
+			models.Index(fields=['archived_at'], name='notification_archive_age_idx'),
+		]
+
+	def __str__(self) -> str:
+		return f"Archived notification {self.pk}: {self.title}"
+
+
+class Broadcast(models.Model):
+	"""One notification sent to every user matching an audience, written in chunks by Celery."""
+
+	class Status(models.TextChoices):
+		PENDING = 'pending', 'Pending'
+		RUNNING = 'running', 'Running'
+		COMPLETED = 'completed', 'Completed'
+		FAILED = 'failed', 'Failed'
+
+	created_by = models.ForeignKey(
+		settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL, related_name='broadcasts'
+	)
+	title = models.CharField(max_length=255)
+	message = models.TextField()
+	category = models.CharField(max_length=32, choices=Notification.CATEGORY_CHOICES, default='system')
+	metadata = models.JSONField(default=dict, blank=True)
+	audience = models.JSONField(default=dict, blank=True)
+	status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+	total_recipients = models.PositiveIntegerField(default=0)
+	delivered_count = models.PositiveIntegerField(default=0)
+	chunk_count = models.PositiveIntegerField(default=0)
+	completed_chunks = models.PositiveIntegerField(default=0)
+	error = models.TextField(blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		ordering = ['-created_at']
+
+	def __str__(self) -> str:
+		return f"Broadcast {self.pk}: {self.title}"
+
+	@property
+	def progress(self) -> float:
+		if self.status == self.Status.COMPLETED:
+			return 1.0
+		return round(self.completed_chunks / self.chunk_count, 4) if self.chunk_count else 0.0
+
+
+class BroadcastChunk(models.Model):
+	"""A recipient id range of a broadcast, delivered by one task in one short transaction."""
+
+	broadcast = models.ForeignKey(Broadcast, on_delete=models.CASCADE, related_name='chunks')
+	first_user_id = models.BigIntegerField()
+	last_user_id = models.BigIntegerField()
+	delivered = models.PositiveIntegerField(default=0)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		ordering = ['broadcast', 'first_user_id']
+		constraints = [
+			models.UniqueConstraint(fields=['broadcast', 'first_user_id'], name='broadcast_chunk_unique'),
+		]
+
+
+class OutboundEmail(models.Model):
+	"""Queued email delivered in batches over one SMTP connection per batch by the outbox worker."""
+
+	class Status(models.TextChoices):
+		PENDING = 'pending', 'Pending'
+		SENDING = 'sending', 'Sending'
+		SENT = 'sent', 'Sent'
+		FAILED = 'failed', 'Failed'
+
+	to = ArrayField(models.EmailField())
+	from_email = models.CharField(max_length=255)
+	subject = models.CharField(max_length=255)
+	body = models.TextField()
+	html_body = models.TextField(blank=True)
+	tag = models.CharField(max_length=64, blank=True, help_text='Groups messages for metrics, e.g. "low_stock".')
+	status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+	attempts = models.PositiveSmallIntegerField(default=0)
+	last_error = models.TextField(blank=True)
+	# Earliest next delivery attempt; while sending, when a crashed worker's claim lapses.
+	next_attempt_at = models.DateTimeField()
+	created_at = models.DateTimeField(auto_now_add=True)
+	sent_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		ordering = ['-created_at']
+		indexes = [
+			models.Index(
+				fields=['next_attempt_at'],
+				condition=models.Q(status__in=['pending', 'sending']),
+				name='outbound_email_due_idx',
+			),
+			models.Index(fields=['status', 'sent_at'], name='outbound_email_status_idx'),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.subject} -> {', '.join(self.to)}"
@@ -0,0 +1,305 @@
+"""Outbound email queue and its batched delivery worker.
+
+Code that sends mail calls ``queue_email``, which stores an ``OutboundEmail``
+row and nudges the worker once the transaction commits. ``deliver_outbox``
+claims due messages in batches with ``SKIP LOCKED`` and sends each batch
+over one open backend connection (a single SMTP session), paced to
+``EMAIL_RATE_LIMIT_PER_MINUTE``. Failures are retried with exponential
+backoff until ``EMAIL_MAX_ATTEMPTS``. A lock in the (shared) cache keeps one
+worker delivering at a time, so the rate limit holds across all workers; the
+worker renews it before every message, and each message is marked sent as
+soon as the server accepts it.
+"""
+
+from __future__ import annotations
+
+import logging
+import secrets
+import smtplib
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from typing import Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_RUN_SECONDS = 50
+OUTBOX_CLAIM_TIMEOUT = timedelta(minutes=10)
+OUTBOX_RETRY_BASE = timedelta(minutes=1)
+_WORKER_LOCK_KEY = 'notifications:outbox:worker'
+_KICK_KEY = 'notifications:outbox:kick'
+_KICK_INTERVAL = 5
+
+
+def queue_email(
+    to: str | Sequence[str],
+    subject: str,
+    body: str,
+    *,
+    from_email: str | None = None,
+    html_body: str = '',
+    tag: str = '',
+) -> OutboundEmail:
+    """Store an email for the delivery worker and wake it after the transaction commits."""
+
+    email = OutboundEmail.objects.create(
+        to=[to] if isinstance(to, str) else list(to),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        subject=subject[:255],
+        body=body,
+        html_body=html_body,
+        tag=tag,
+        next_attempt_at=timezone.now(),
+    )
+    transaction.on_commit(_kick_worker)
+    return email
+
+
+def _kick_worker() -> None:
+    from .tasks import deliver_outbound_email
+
+    # Bursts of queued mail wake the worker once; the batch picks them all up.
+    if cache.add(_KICK_KEY, 1, _KICK_INTERVAL):
+        deliver_outbound_email.delay()
+
+
+@dataclass
+class DeliveryStats:
+    batches: int = 0
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    connections: int = 0
+    seconds: float = 0.0
+    errors: dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class _RateLimiter:
+    def __init__(self, per_minute: int | None):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_slot = time.monotonic()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_slot > now:
+            time.sleep(self.next_slot - now)
+        self.next_slot = max(now, self.next_slot) + self.interval
+
+
+def _claim(batch_size: int) -> list[OutboundEmail]:
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[OutboundEmail.Status.PENDING, OutboundEmail.Status.SENDING], next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        for email in batch:
+            email.status = OutboundEmail.Status.SENDING
+            email.attempts += 1
+            # A worker that dies mid-batch leaves rows that become due again after this.
+            email.next_attempt_at = now + OUTBOX_CLAIM_TIMEOUT
+        OutboundEmail.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at'])
+    return batch
+
+
+def _message(email: OutboundEmail, connection) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(email.subject, email.body, email.from_email, email.to, connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _record_failure(email: OutboundEmail, exc: Exception, stats: DeliveryStats, max_attempts: int) -> None:
+    name = type(exc).__name__
+    stats.errors[name] = stats.errors.get(name, 0) + 1
+    email.last_error = f"{name}: {exc}"[:2000]
+    # Refused recipients will be refused again; other errors are worth retrying.
+    permanent = isinstance(exc, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused))
+    if permanent or email.attempts >= max_attempts:
+        email.status = OutboundEmail.Status.FAILED
+        stats.failed += 1
+    else:
+        email.status = OutboundEmail.Status.PENDING
+        email.next_attempt_at = timezone.now() + OUTBOX_RETRY_BASE * 2 ** (email.attempts - 1)
+        stats.retried += 1
+
+
+def _send_one(connection, email: OutboundEmail, stats: DeliveryStats) -> None:
+    try:
+        connection.send_messages([_message(email, connection)])
+    except smtplib.SMTPServerDisconnected:
+        # The server dropped the session (idle timeout, per-session limits): reconnect once.
+        connection.close()
+        connection.open()
+        stats.connections += 1
+        connection.send_messages([_message(email, connection)])
+
+
+class _WorkerLock:
+    """The cache lock that keeps one delivery worker running, renewed while it works.
+
+    ``timeout`` must outlast the longest single message: a reconnect and a
+    resend, each bounded by ``EMAIL_TIMEOUT``, plus one rate-limit interval.
+    """
+
+    def __init__(self, timeout: int):
+        self.timeout = timeout
+        self.token = secrets.token_hex(8)
+
+    def acquire(self) -> bool:
+        return cache.add(_WORKER_LOCK_KEY, self.token, self.timeout)
+
+    def renew(self) -> bool:
+        """Extend the lock; ``False`` if it expired and may now belong to another worker."""
+
+        if cache.get(_WORKER_LOCK_KEY) != self.token:
+            return False
+        cache.touch(_WORKER_LOCK_KEY, self.timeout)
+        return True
+
+    def release(self) -> None:
+        if cache.get(_WORKER_LOCK_KEY) == self.token:
+            cache.delete(_WORKER_LOCK_KEY)
+
+
+def _lock_timeout(max_seconds: float, limiter: _RateLimiter) -> int:
+    per_message = 2 * (getattr(settings, 'EMAIL_TIMEOUT', None) or 60) + limiter.interval
+    return int(max(max_seconds, per_message)) + 60
+
+
+def _release(emails: list[OutboundEmail]) -> None:
+    """Hand claimed but unattempted messages back to the queue without spending an attempt."""
+
+    for email in emails:
+        email.status = OutboundEmail.Status.PENDING
+        email.attempts -= 1
+        email.next_attempt_at = timezone.now()
+    OutboundEmail.objects.bulk_update(emails, ['status', 'attempts', 'next_attempt_at'])
+
+
+def _send_batch(
+    batch: list[OutboundEmail], stats: DeliveryStats, limiter: _RateLimiter, max_attempts: int, lock: _WorkerLock
+) -> bool:
+    """Send ``batch`` over one connection and record each message's outcome.
+
+    Each message is marked sent right after the server accepts it, so a worker
+    dying mid-batch never sends it again. Returns ``False`` when the worker
+    lock was lost; the messages not yet attempted are then handed back.
+    """
+
+    connection = get_connection(fail_silently=False)
+    unsent: list[OutboundEmail] = []
+    pending = list(batch)
+    try:
+        connection.open()
+        stats.connections += 1
+        while pending:
+            email = pending[0]
+            limiter.wait()
+            if not lock.renew():
+                _release(pending)
+                return False
+            try:
+                _send_one(connection, email, stats)
+            except smtplib.SMTPServerDisconnected:
+                raise
+            except (smtplib.SMTPException, ValueError) as exc:
+                # Refused or malformed: only this message is affected.
+                _record_failure(email, exc, stats, max_attempts)
+                unsent.append(email)
+            else:
+                OutboundEmail.objects.filter(pk=email.pk).update(
+                    status=OutboundEmail.Status.SENT, sent_at=timezone.now(), last_error=''
+                )
+                stats.sent += 1
+            pending.pop(0)
+    except Exception as exc:
+        # Connection-level failure: everything not yet sent waits for a retry.
+        for email in pending:
+            _record_failure(email, exc, stats, max_attempts)
+        unsent.extend(pending)
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            logger.warning('Closing the mail connection failed', exc_info=True)
+        if unsent:
+            OutboundEmail.objects.bulk_update(unsent, ['status', 'next_attempt_at', 'last_error'])
+    return True
+
+
+def deliver_outbox(
+    *,
+    batch_size: int = OUTBOX_BATCH_SIZE,
+    max_seconds: float = OUTBOX_RUN_SECONDS,
+    rate_per_minute: int | None = None,
+) -> dict:
+    """Send due outbox messages batch by batch until none are due or ``max_seconds`` pass.
+
+    Returns delivery statistics; returns immediately with zero batches when
+    another worker holds the delivery lock.
+    """
+
+    stats = DeliveryStats()
+    limiter = _RateLimiter(rate_per_minute or getattr(settings, 'EMAIL_RATE_LIMIT_PER_MINUTE', None))
+    lock = _WorkerLock(_lock_timeout(max_seconds, limiter))
+    if not lock.acquire():
+        return stats.as_dict()
+    started = time.monotonic()
+    max_attempts = getattr(settings, 'EMAIL_MAX_ATTEMPTS', 5)
+    try:
+        while time.monotonic() - started < max_seconds:
+            batch = _claim(batch_size)
+            if not batch:
+                break
+            stats.batches += 1
+            if not _send_batch(batch, stats, limiter, max_attempts, lock):
+                logger.warning('Outbox worker lock expired; stopping this run')
+                break
+    finally:
+        lock.release()
+    stats.seconds = round(time.monotonic() - started, 3)
+    if stats.batches:
+        logger.info('Outbox delivery: %s', stats.as_dict())
+    return stats.as_dict()
+
+
+def outbox_metrics() -> dict:
+    """Queue depth, oldest due message age and per-tag delivery counts over the last 24 hours."""
+
+    now = timezone.now()
+    since = now - timedelta(hours=24)
+    queued = OutboundEmail.objects.filter(
+        status__in=[OutboundEmail.Status.PENDING, OutboundEmail.Status.SENDING]
+    ).aggregate(queued=Count('id'), due=Count('id', filter=Q(next_attempt_at__lte=now)), oldest=Min('created_at'))
+    recent = (
+        OutboundEmail.objects.filter(Q(sent_at__gte=since) | Q(status=OutboundEmail.Status.FAILED, created_at__gte=since))
+        .values('tag')
+        .annotate(
+            sent=Count('id', filter=Q(status=OutboundEmail.Status.SENT)),
+            failed=Count('id', filter=Q(status=OutboundEmail.Status.FAILED)),
+        )
+        .order_by('tag')
+    )
+    return {
+        'queued': queued['queued'],
+        'due': queued['due'],
+        'oldest_queued_seconds': round((now - queued['oldest']).total_seconds()) if queued['oldest'] else 0,
+        'last_24h': {row['tag'] or 'untagged': {'sent': row['sent'], 'failed': row['failed']} for row in recent},
+    }
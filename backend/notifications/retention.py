@@ -0,0 +1,128 @@
+"""Retention for notifications: archive old read rows, then expire the archive.
+
+Read notifications older than their category's ``NOTIFICATION_RETENTION_DAYS``
+move to ``NotificationArchive`` in batches. Each batch is a single
+``DELETE ... RETURNING`` feeding an ``INSERT`` that commits on its own. It
+locks at most ``NOTIFICATION_ARCHIVE_BATCH_SIZE`` rows and skips rows other
+transactions hold, so archival never stalls inbox traffic. Unread
+notifications are never archived, which keeps the unread counters exact.
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import Notification, NotificationArchive
+
+NOTIFICATION_ARCHIVE_BATCH_SIZE = 1000
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_ARCHIVE_RETENTION_DAYS = 730
+
+
+def retention_days() -> dict[str, int]:
+    configured = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', {})
+    return {category: configured.get(category, DEFAULT_RETENTION_DAYS) for category, _label in Notification.CATEGORY_CHOICES}
+
+
+def _archive_batch(category: str, cutoff, batch_size: int) -> int:
+    live = connection.ops.quote_name(Notification._meta.db_table)
+    archive = connection.ops.quote_name(NotificationArchive._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {live} WHERE id IN (
+                    SELECT id FROM {live}
+                    WHERE is_read AND category = %s AND created_at < %s
+                    ORDER BY created_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, recipient_id, title, message, category, metadata, created_at
+            )
+            INSERT INTO {archive} (id, recipient_id, title, message, category, metadata, created_at, archived_at)
+            SELECT id, recipient_id, title, message, category, metadata, created_at, now() FROM moved
+            """,
+            [category, cutoff, batch_size],
+        )
+        return cursor.rowcount
+
+
+def archive_notifications(
+    *,
+    batch_size: int = NOTIFICATION_ARCHIVE_BATCH_SIZE,
+    pause: float = 0.0,
+    max_batches: int | None = None,
+) -> dict[str, int]:
+    """Move read notifications past retention into the archive; returns rows moved per category.
+
+    ``pause`` seconds between batches lets replicas and autovacuum keep up
+    during a large backlog. ``max_batches`` bounds one run.
+    """
+
+    now = timezone.now()
+    moved: dict[str, int] = {}
+    batches = 0
+    for category, days in retention_days().items():
+        cutoff = now - timedelta(days=days)
+        moved[category] = 0
+        while max_batches is None or batches < max_batches:
+            count = _archive_batch(category, cutoff, batch_size)
+            batches += 1
+            moved[category] += count
+            if count < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    return moved
+
+
+def expire_archive(*, batch_size: int = NOTIFICATION_ARCHIVE_BATCH_SIZE * 5) -> int:
+    """Delete archived notifications older than ``NOTIFICATION_ARCHIVE_RETENTION_DAYS``, in batches."""
+
+    days = getattr(settings, 'NOTIFICATION_ARCHIVE_RETENTION_DAYS', DEFAULT_ARCHIVE_RETENTION_DAYS)
+    expired = NotificationArchive.objects.filter(archived_at__lt=timezone.now() - timedelta(days=days))
+    deleted = 0
+    while True:
+        ids = list(expired.order_by('archived_at').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += NotificationArchive.objects.filter(pk__in=ids).delete()[0]
+
+
+def storage_report() -> list[dict]:
+    """Rows, table, index and total on-disk bytes of the live and archive tables, plus each index."""
+
+    rows = []
+    with connection.cursor() as cursor:
+        for model in (Notification, NotificationArchive):
+            table = model._meta.db_table
+            cursor.execute(
+                """
+                SELECT c.reltuples::bigint, pg_table_size(c.oid), pg_indexes_size(c.oid), pg_total_relation_size(c.oid)
+                FROM pg_class c WHERE c.oid = %s::regclass
+                """,
+                [table],
+            )
+            estimated_rows, table_bytes, index_bytes, total_bytes = cursor.fetchone()
+            cursor.execute(
+                """
+                SELECT indexrelname, pg_relation_size(indexrelid)
+                FROM pg_stat_user_indexes WHERE relid = %s::regclass ORDER BY indexrelname
+                """,
+                [table],
+            )
+            rows.append({
+                'table': table,
+                'rows': max(estimated_rows, 0),
+                'table_bytes': table_bytes,
+                'index_bytes': index_bytes,
+                'total_bytes': total_bytes,
+                'indexes': dict(cursor.fetchall()),
+            })
+    return rows
@@ -1,8 +1,11 @@
 """Notification serializers."""
 
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
-from .models import Notification
+from farms.models import Region
+
+from .models import Broadcast, Notification, NotificationArchive
 
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -22,3 +25,83 @@ class NotificationSerializer(serializers.ModelSerializer):
             'created_at',
         )
         read_only_fields = ('id', 'recipient', 'recipient_email', 'created_at')
+
+
+class NotificationArchiveSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NotificationArchive
+        fields = ('id', 'title', 'message', 'category', 'metadata', 'created_at', 'archived_at')
+        read_only_fields = fields
+
+
+class NotificationBulkSerializer(serializers.Serializer):
+    """Selects the current user's notifications by ids, category and/or creation cut-off."""
+
+    MAX_IDS = 1000
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, allow_empty=False, max_length=MAX_IDS
+    )
+    category = serializers.ChoiceField(choices=Notification.CATEGORY_CHOICES, required=False)
+    before = serializers.DateTimeField(required=False)
+
+    def __init__(self, *args, require_filter: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.require_filter = require_filter
+
+    def validate(self, attrs):
+        if self.require_filter and not attrs:
+            raise serializers.ValidationError('Provide ids, category or before.')
+        return attrs
+
+
+class BroadcastAudienceSerializer(serializers.Serializer):
+    roles = serializers.ListField(
+        child=serializers.ChoiceField(choices=get_user_model().Roles.choices), required=False, allow_empty=False
+    )
+    region = serializers.PrimaryKeyRelatedField(queryset=Region.objects.all(), required=False)
+
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        if 'region' in attrs:
+            attrs['region'] = attrs['region'].pk
+        return attrs
+
+
+class BroadcastSerializer(serializers.ModelSerializer):
+    audience = BroadcastAudienceSerializer(required=False)
+    created_by_email = serializers.EmailField(source='created_by.email', read_only=True, default=None)
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Broadcast
+        fields = (
+            'id',
+            'title',
+            'message',
+            'category',
+            'metadata',
+            'audience',
+            'status',
+            'total_recipients',
+            'delivered_count',
+            'chunk_count',
+            'completed_chunks',
+            'progress',
+            'error',
+            'created_by_email',
+            'created_at',
+            'started_at',
+            'finished_at',
+        )
+        read_only_fields = (
+            'status',
+            'total_recipients',
+            'delivered_count',
+            'chunk_count',
+            'completed_chunks',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        )
@@ -0,0 +1,100 @@
+"""Notification services."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Mapping, Sequence
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, transaction
+
+from .models import Notification
+
+# Counters are adjusted in place, so the timeout only bounds drift from a
+# count computed while a concurrent change was committing.
+UNREAD_COUNT_CACHE_TIMEOUT = 60 * 10
+_UNREAD_KEY = 'notifications:unread:{user}'
+
+
+def _unread_key(user_id: int) -> str:
+    return _UNREAD_KEY.format(user=user_id)
+
+
+def unread_count(user_id: int) -> int:
+    """Unread notifications of a user, from the cached counter when present."""
+
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        # ``add`` so a counter adjusted meanwhile is not overwritten with an older count.
+        cache.add(key, count, UNREAD_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def adjust_unread_counts(deltas: Mapping[int, int]) -> None:
+    """Apply per-user unread deltas to cached counters once the transaction commits.
+
+    Users without a cached counter are skipped; their next read counts from
+    the database.
+    """
+
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    def apply():
+        for user_id, delta in deltas.items():
+            key = _unread_key(user_id)
+            try:
+                if cache.incr(key, delta) < 0:
+                    cache.delete(key)
+            except ValueError:
+                pass
+
+    transaction.on_commit(apply)
+
+
+
+def _scoped(user, *, ids: Sequence[int] | None = None, category: str | None = None, before: datetime | None = None):
+    notifications = Notification.objects.filter(recipient=user)
+    if ids is not None:
+        notifications = notifications.filter(pk__in=ids)
+    if category:
+        notifications = notifications.filter(category=category)
+    if before:
+        notifications = notifications.filter(created_at__lt=before)
+    return notifications
+
+
+def mark_notifications_read(user, **filters) -> int:
+    """Mark the user's unread notifications matching ``ids``/``category``/``before`` read in one ``UPDATE``."""
+
+    updated = _scoped(user, **filters).filter(is_read=False).update(is_read=True)
+    adjust_unread_counts({user.pk: -updated})
+    return updated
+
+
+def delete_notifications(user, **filters) -> dict:
+    """Delete the user's notifications matching the filters in one ``DELETE``.
+
+    ``RETURNING`` reports how many of the deleted rows were unread, so the
+    counter is adjusted exactly even when reads race the delete.
+    """
+
+    try:
+        inner, params = _scoped(user, **filters).order_by().values('pk').query.sql_with_params()
+    except EmptyResultSet:
+        # Filters that can match nothing (such as no ids) compile to no SQL at all.
+        return {'deleted': 0, 'unread_deleted': 0}
+    table = connection.ops.quote_name(Notification._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH deleted AS (DELETE FROM {table} WHERE id IN ({inner}) RETURNING is_read) "
+            "SELECT COUNT(*), COUNT(*) FILTER (WHERE NOT is_read) FROM deleted",
+            params,
+        )
+        deleted, unread = cursor.fetchone()
+        adjust_unread_counts({user.pk: -unread})
+    return {'deleted': deleted, 'unread_deleted': unread}
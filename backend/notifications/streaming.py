@@ -0,0 +1,109 @@
+"""Server-Sent Events stream of a user's new notifications.
+
+Each open stream is a coroutine parked on its subscriber queue, so an ASGI
+worker holds thousands of idle connections without a thread per client.
+Streams send a comment line every ``SSE_HEARTBEAT_SECONDS`` to keep proxies
+from closing them, and end after ``SSE_MAX_STREAM_SECONDS``. Django 4.2 does
+not cancel a response when its client disconnects, so that limit is also what
+bounds how long a departed client keeps its subscription. The browser then
+reconnects with ``Last-Event-ID`` and receives anything it missed from the
+database, or a ``resync`` event when it missed more than ``SSE_REPLAY_LIMIT``.
+
+``EventSource`` cannot send headers, so browsers authenticate with a
+single-use ticket from ``issue_stream_ticket`` rather than putting a JWT in a
+URL that ends up in access logs.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import secrets
+from typing import AsyncIterator
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .broker import LocalBroker, notification_broker, notification_payload
+from .models import Notification
+
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_STREAM_SECONDS = 60 * 5
+SSE_RETRY_MILLISECONDS = 3000
+SSE_REPLAY_LIMIT = 100
+SSE_TICKET_SECONDS = 30
+_TICKET_KEY = 'notifications:stream-ticket:{ticket}'
+
+
+def issue_stream_ticket(user_id: int) -> str:
+    """Single-use ticket that opens one stream for ``user_id`` within ``SSE_TICKET_SECONDS``."""
+
+    ticket = secrets.token_urlsafe(32)
+    cache.set(_TICKET_KEY.format(ticket=ticket), user_id, SSE_TICKET_SECONDS)
+    return ticket
+
+
+async def redeem_stream_ticket(ticket: str) -> int | None:
+    """User id of an unused, unexpired ticket, which is spent by this call."""
+
+    key = _TICKET_KEY.format(ticket=ticket)
+    user_id = await cache.aget(key)
+    # Only the caller whose delete removed the key may use it.
+    if user_id is None or not await cache.adelete(key):
+        return None
+    return user_id
+
+
+def format_event(payload: dict) -> str:
+    data = json.dumps(payload, cls=DjangoJSONEncoder)
+    return f"id: {payload['id']}\nevent: notification\ndata: {data}\n\n"
+
+
+def format_resync(last_event_id: int) -> str:
+    data = json.dumps({'last_event_id': last_event_id})
+    return f"id: {last_event_id}\nevent: resync\ndata: {data}\n\n"
+
+
+async def _missed_since(user_id: int, last_event_id: int) -> tuple[list[dict], int | None]:
+    """Notifications after ``last_event_id`` to replay, or none and the newest id when there are too many."""
+
+    missed = Notification.objects.filter(recipient_id=user_id, pk__gt=last_event_id)
+    payloads = [notification_payload(notification) async for notification in missed.order_by('pk')[:SSE_REPLAY_LIMIT + 1]]
+    if len(payloads) <= SSE_REPLAY_LIMIT:
+        return payloads, None
+    return [], await missed.order_by('-pk').values_list('pk', flat=True).afirst()
+
+
+async def notification_events(
+    user_id: int,
+    *,
+    last_event_id: int | None = None,
+    broker: LocalBroker | None = None,
+    heartbeat: float = SSE_HEARTBEAT_SECONDS,
+    max_duration: float = SSE_MAX_STREAM_SECONDS,
+) -> AsyncIterator[str]:
+    broker = broker or notification_broker()
+    loop = asyncio.get_running_loop()
+    # Subscribe before replaying so nothing created in between is lost.
+    async with broker.subscribe(user_id) as queue:
+        yield f"retry: {SSE_RETRY_MILLISECONDS}\n\n"
+        seen = last_event_id or 0
+        if last_event_id is not None:
+            payloads, resync_at = await _missed_since(user_id, last_event_id)
+            if resync_at is not None:
+                # Too much to replay: the client reloads its inbox and streams on from here.
+                seen = resync_at
+                yield format_resync(resync_at)
+            for payload in payloads:
+                seen = payload['id']
+                yield format_event(payload)
+
+        deadline = loop.time() + max_duration
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                payload = await asyncio.wait_for(queue.get(), min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if payload['id'] > seen:
+                yield format_event(payload)
@@ -0,0 +1,65 @@
+"""Celery tasks for notification workflows."""
+
+from __future__ import annotations
+
+from celery import shared_task
+from django.db import DatabaseError
+
+
+@shared_task
+def plan_broadcast_delivery(broadcast_id: int) -> int:
+    """Split a broadcast's audience into chunks and queue their delivery."""
+
+    from .broadcasts import plan_broadcast
+
+    return plan_broadcast(broadcast_id)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def deliver_broadcast_chunk(self, chunk_id: int) -> int:
+    """Write the notifications of one broadcast chunk, retrying transient database errors.
+
+    Any other error would fail the same way on every attempt, so it fails the
+    broadcast at once rather than leaving it running with a chunk never done.
+    """
+
+    from .broadcasts import deliver_chunk, fail_broadcast
+
+    try:
+        return deliver_chunk(chunk_id)
+    except DatabaseError as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+        fail_broadcast(chunk_id, str(exc))
+        raise
+    except Exception as exc:
+        fail_broadcast(chunk_id, str(exc) or exc.__class__.__name__)
+        raise
+
+
+@shared_task
+def fail_stale_broadcasts() -> int:
+    """Fail broadcasts whose chunks a crashed worker or lost message left undelivered."""
+
+    from .broadcasts import fail_stale_broadcasts as fail_stale
+
+    return fail_stale()
+
+
+@shared_task
+def archive_read_notifications() -> dict:
+    """Archive read notifications past their retention and expire old archive rows."""
+
+    from .retention import archive_notifications, expire_archive
+
+    moved = archive_notifications(pause=0.05)
+    return {**moved, 'expired': expire_archive()}
+
+
+@shared_task
+def deliver_outbound_email() -> dict:
+    """Send due outbox messages in batches over pooled connections."""
+
+    from .outbox import deliver_outbox
+
+    return deliver_outbox()
@@ -1,3 +1,467 @@
-from django.test import TestCase
+"""Notification tests."""
 
-# Create your tests here.
+from __future__ import annotations
+
+import asyncio
+import socketserver
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from farms.models import Farm
+
+from . import broadcasts, outbox, streaming
+from .broker import LocalBroker
+from .models import Broadcast, BroadcastChunk, Notification, NotificationArchive, OutboundEmail
+from .outbox import deliver_outbox, queue_email
+from .retention import archive_notifications
+from .services import delete_notifications
+from .streaming import notification_events, redeem_stream_ticket
+from .tasks import deliver_broadcast_chunk, deliver_outbound_email, plan_broadcast_delivery
+
+
+class NotificationAPITestCase(APITestCase):
+	"""Inbox listing, read state and the unread badge counter."""
+
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		User = get_user_model()
+		self.user = User.objects.create_user(email='inbox@example.com', password='Testpass123!')
+		self.other = User.objects.create_user(email='other-inbox@example.com', password='Testpass123!')
+		self.client.force_authenticate(self.user)
+
+	def _notify(self, recipient, count=1, **extra):
+		with self.captureOnCommitCallbacks(execute=True):
+			return Notification.objects.bulk_create(
+				Notification(recipient=recipient, title=f"Alert {index}", message='Body', **extra) for index in range(count)
+			)
+
+	def test_unread_count_follows_creates_reads_and_deletes(self):
+		url = reverse('notification-unread-count')
+		self._notify(self.user, 3)
+		self._notify(self.other, 2)
+		self._notify(self.user, 1, is_read=True)
+		self.assertEqual(self.client.get(url).data, {'unread': 3})
+
+		# Served from the counter: changes are applied to it, not recounted.
+		with self.assertNumQueries(0):
+			self.assertEqual(self.client.get(url).data, {'unread': 3})
+		self._notify(self.user, 2)
+		first = Notification.objects.filter(recipient=self.user, is_read=False).first()
+		with self.captureOnCommitCallbacks(execute=True):
+			response = self.client.post(reverse('notification-mark-read', args=[first.pk]))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		with self.captureOnCommitCallbacks(execute=True):
+			self.client.post(reverse('notification-mark-read', args=[first.pk]))
+		with self.captureOnCommitCallbacks(execute=True):
+			Notification.objects.filter(recipient=self.user, is_read=False).first().delete()
+		with self.captureOnCommitCallbacks(execute=True):
+			response = self.client.post(reverse('notification-list'), {'title': 'Note', 'message': 'To self'})
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+		with self.assertNumQueries(0):
+			self.assertEqual(self.client.get(url).data, {'unread': 4})
+
+		cache.clear()
+		self.assertEqual(self.client.get(url).data, {'unread': 4})
+		self.client.force_authenticate(self.other)
+		self.assertEqual(self.client.get(url).data, {'unread': 2})
+
+	def test_bulk_mark_read_and_delete(self):
+		self._notify(self.user, 3, category='marketplace')
+		self._notify(self.user, 2, category='analytics')
+		self._notify(self.other, 2, category='marketplace')
+		counter = reverse('notification-unread-count')
+		self.assertEqual(self.client.get(counter).data['unread'], 5)
+		ids = list(Notification.objects.filter(recipient=self.user, category='analytics').values_list('id', flat=True))
+		foreign = Notification.objects.filter(recipient=self.other).first()
+
+		with self.captureOnCommitCallbacks(execute=True):
+			response = self.client.post(reverse('notification-mark-many-read'), {'ids': [*ids, foreign.pk]}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+		self.assertEqual(response.data['updated'], 2)
+		self.assertEqual(self.client.get(counter).data['unread'], 3)
+		self.assertFalse(Notification.objects.get(pk=foreign.pk).is_read)
+		response = self.client.post(reverse('notification-mark-many-read'), {}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		response = self.client.post(reverse('notification-bulk-delete'), {'ids': []}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertIn('ids', response.data)
+		self.assertEqual(delete_notifications(self.user, ids=[]), {'deleted': 0, 'unread_deleted': 0})
+
+		with self.captureOnCommitCallbacks(execute=True):
+			response = self.client.post(reverse('notification-bulk-delete'), {'ids': [ids[0]]}, format='json')
+		self.assertEqual((response.data['deleted'], response.data['unread_deleted']), (1, 0))
+		with self.captureOnCommitCallbacks(execute=True):
+			response = self.client.post(reverse('notification-bulk-delete'), {'category': 'marketplace'}, format='json')
+		self.assertEqual((response.data['deleted'], response.data['unread_deleted']), (3, 3))
+		self.assertEqual(self.client.get(counter).data['unread'], 0)
+		self.assertEqual(Notification.objects.filter(recipient=self.other).count(), 2)
+
+		self._notify(self.user, 2, category='system')
+		with self.captureOnCommitCallbacks(execute=True):
+			response = self.client.post(reverse('notification-mark-all-read'), {}, format='json')
+		self.assertEqual(response.data['updated'], 2)
+		self.assertEqual(self.client.get(counter).data['unread'], 0)
+		cache.clear()
+		self.assertEqual(self.client.get(counter).data['unread'], 0)
+		self.client.force_authenticate(self.other)
+		self.assertEqual(self.client.get(counter).data['unread'], 2)
+
+	@override_settings(NOTIFICATION_BROKER='local')
+	def test_new_notifications_are_published_after_commit(self):
+		with mock.patch.object(LocalBroker, 'publish') as publish:
+			with self.captureOnCommitCallbacks() as callbacks:
+				single = Notification.objects.create(recipient=self.user, title='Single', message='Body')
+				batch = Notification.objects.bulk_create(
+					Notification(recipient=recipient, title='Batch', message='Body') for recipient in (self.user, self.other)
+				)
+			publish.assert_not_called()
+			for callback in callbacks:
+				callback()
+			single.is_read = True
+			single.save()
+		published = [message for call in publish.call_args_list for message in call.args[0]]
+		self.assertEqual(
+			[(user_id, payload['id']) for user_id, payload in published],
+			[(self.user.pk, single.pk), (self.user.pk, batch[0].pk), (self.other.pk, batch[1].pk)],
+		)
+		self.assertEqual(published[0][1]['title'], 'Single')
+
+	def test_event_stream_delivers_published_notifications(self):
+		broker = LocalBroker()
+
+		async def scenario():
+			stream = notification_events(self.user.pk, broker=broker, heartbeat=0.05, max_duration=0.5)
+			self.assertTrue((await anext(stream)).startswith('retry:'))
+			self.assertEqual(broker.subscriber_count(self.user.pk), 1)
+			broker.publish([(self.other.pk, {'id': 1, 'title': 'Not yours'}), (self.user.pk, {'id': 2, 'title': 'Rain'})])
+			event = await asyncio.wait_for(anext(stream), 1)
+			self.assertTrue(event.startswith('id: 2\nevent: notification\n'))
+			self.assertIn('"Rain"', event)
+			self.assertEqual(await asyncio.wait_for(anext(stream), 1), ': keep-alive\n\n')
+			await stream.aclose()
+
+		asyncio.run(scenario())
+		self.assertEqual(broker.subscriber_count(), 0)
+
+	async def test_event_stream_asks_for_a_resync_past_the_replay_limit(self):
+		missed = await Notification.objects.abulk_create(
+			[Notification(recipient=self.user, title=f"Missed {index}", message='Body') for index in range(3)]
+		)
+		with mock.patch.object(streaming, 'SSE_REPLAY_LIMIT', 2):
+			stream = notification_events(self.user.pk, last_event_id=0, broker=LocalBroker(), heartbeat=0.05, max_duration=0.2)
+			self.assertTrue((await anext(stream)).startswith('retry:'))
+			event = await anext(stream)
+			await stream.aclose()
+		self.assertEqual(event, f"id: {missed[-1].pk}\nevent: resync\ndata: {{\"last_event_id\": {missed[-1].pk}}}\n\n")
+
+	async def test_event_stream_requires_a_valid_ticket(self):
+		url = reverse('notification-stream')
+		self.assertEqual((await self.async_client.get(url)).status_code, status.HTTP_401_UNAUTHORIZED)
+		self.assertEqual((await self.async_client.get(url, {'ticket': 'garbage'})).status_code, status.HTTP_401_UNAUTHORIZED)
+
+	def test_event_stream_is_asgi_only_and_tickets_are_single_use(self):
+		self.assertEqual(self.client.get(reverse('notification-stream')).status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+		response = self.client.post(reverse('notification-stream-ticket'))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		ticket = response.data['ticket']
+		self.assertEqual(asyncio.run(redeem_stream_ticket(ticket)), self.user.pk)
+		self.assertIsNone(asyncio.run(redeem_stream_ticket(ticket)))
+		self.client.force_authenticate(None)
+		self.assertEqual(self.client.post(reverse('notification-stream-ticket')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+	@override_settings(NOTIFICATION_RETENTION_DAYS={'marketplace': 30, 'analytics': 7})
+	def test_read_notifications_past_retention_are_archived(self):
+		old = timezone.now() - timedelta(days=45)
+		self._notify(self.user, 3, category='marketplace', is_read=True)
+		self._notify(self.user, 1, category='marketplace')
+		self._notify(self.user, 2, category='system', is_read=True)
+		Notification.objects.update(created_at=old)
+		self._notify(self.user, 1, category='marketplace', is_read=True)
+		self._notify(self.other, 1, category='analytics', is_read=True)
+		Notification.objects.filter(category='analytics').update(created_at=timezone.now() - timedelta(days=8))
+
+		moved = archive_notifications(batch_size=2)
+		self.assertEqual(moved, {'system': 0, 'marketplace': 3, 'inventory': 0, 'analytics': 1})
+		self.assertEqual(NotificationArchive.objects.filter(recipient=self.user).count(), 3)
+		# Unread, recent and within-retention (system: 90 days by default) rows stay live.
+		self.assertEqual(Notification.objects.filter(recipient=self.user).count(), 4)
+		self.assertEqual(self.client.get(reverse('notification-unread-count')).data, {'unread': 1})
+		response = self.client.get(reverse('notification-archived'))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data['count'], 3)
+
+		output = StringIO()
+		call_command('archive_notifications', stdout=output)
+		self.assertIn('Before:', output.getvalue())
+		self.assertIn('notification_archive_inbox_idx', output.getvalue())
+		self.assertIn('marketplace: 0', output.getvalue())
+
+
+class NotificationBulkCommitTestCase(APITransactionTestCase):
+	"""The ``unread`` returned by bulk changes once their counter adjustments have committed."""
+
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		self.user = get_user_model().objects.create_user(email='bulk-commit@example.com', password='Testpass123!')
+		self.client.force_authenticate(self.user)
+		Notification.objects.bulk_create(
+			Notification(recipient=self.user, title=f"Alert {index}", message='Body', category=category)
+			for index, category in enumerate(['marketplace'] * 3 + ['analytics'] * 2)
+		)
+
+	def test_bulk_responses_report_the_committed_unread_count(self):
+		counter = reverse('notification-unread-count')
+		self.assertEqual(self.client.get(counter).data['unread'], 5)
+
+		response = self.client.post(reverse('notification-mark-many-read'), {'category': 'analytics'}, format='json')
+		self.assertEqual((response.data['updated'], response.data['unread']), (2, 3))
+		unread = Notification.objects.filter(is_read=False).first()
+		response = self.client.post(reverse('notification-bulk-delete'), {'ids': [unread.pk]}, format='json')
+		self.assertEqual((response.data['deleted'], response.data['unread_deleted'], response.data['unread']), (1, 1, 2))
+		response = self.client.post(reverse('notification-mark-all-read'), {}, format='json')
+		self.assertEqual((response.data['updated'], response.data['unread']), (2, 0))
+		with self.assertNumQueries(0):
+			self.assertEqual(self.client.get(counter).data['unread'], 0)
+
+
+class BroadcastTestCase(APITestCase):
+	"""Audience resolution and chunked broadcast delivery."""
+
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		User = get_user_model()
+		self.admin = User.objects.create_user(email='ops@example.com', password='Testpass123!', is_staff=True, role='admin')
+		self.farmers = [
+			User.objects.create_user(email=f"farmer{index}@example.com", password='Testpass123!', role='farmer')
+			for index in range(5)
+		]
+		self.buyer = User.objects.create_user(email='buyer@example.com', password='Testpass123!', role='buyer')
+		Farm.objects.create(owner=self.farmers[0], name='Kitale plot', location='Kitale', total_area='3.00')
+		Farm.objects.create(owner=self.farmers[1], name='Eldoret plot', location='Eldoret', total_area='3.00')
+		self.client.force_authenticate(self.admin)
+
+	def _broadcast(self, payload):
+		with mock.patch.object(plan_broadcast_delivery, 'delay', side_effect=plan_broadcast_delivery), \
+			mock.patch.object(deliver_broadcast_chunk, 'delay', side_effect=deliver_broadcast_chunk), \
+			mock.patch.object(broadcasts, 'BROADCAST_CHUNK_SIZE', 2), \
+			self.captureOnCommitCallbacks(execute=True):
+			return self.client.post(reverse('broadcast-list'), payload, format='json')
+
+	def test_broadcast_to_role_is_delivered_in_chunks(self):
+		response = self._broadcast({'title': 'Board update', 'message': 'Maize prices moved.', 'audience': {'roles': ['farmer']}})
+		self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+		broadcast = Broadcast.objects.get(pk=response.data['id'])
+		self.assertEqual(broadcast.status, Broadcast.Status.COMPLETED)
+		self.assertEqual((broadcast.total_recipients, broadcast.delivered_count), (5, 5))
+		self.assertEqual((broadcast.chunk_count, broadcast.completed_chunks), (3, 3))
+		notifications = Notification.objects.filter(metadata__broadcast=broadcast.pk)
+		self.assertEqual(sorted(notifications.values_list('recipient_id', flat=True)), sorted(user.pk for user in self.farmers))
+
+		chunk = BroadcastChunk.objects.filter(broadcast=broadcast).first()
+		self.assertEqual(broadcasts.deliver_chunk(chunk.pk), 0)
+		self.assertEqual(notifications.count(), 5)
+		detail = self.client.get(reverse('broadcast-detail', args=[broadcast.pk])).data
+		self.assertEqual(detail['progress'], 1.0)
+
+	def test_region_audience_and_permissions(self):
+		trans_nzoia = Farm.objects.get(name='Kitale plot').region
+		preview = self.client.post(reverse('broadcast-preview'), {'region': trans_nzoia.parent_id}, format='json')
+		self.assertEqual(preview.data, {'recipients': 2})
+		response = self._broadcast({'title': 'Fall armyworm', 'message': 'Scout your maize.', 'audience': {'region': trans_nzoia.pk}})
+		self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+		self.assertEqual(list(Notification.objects.values_list('recipient_id', flat=True)), [self.farmers[0].pk])
+
+		response = self.client.post(reverse('broadcast-preview'), {'roles': ['pilot']}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.client.force_authenticate(self.buyer)
+		response = self.client.post(reverse('broadcast-list'), {'title': 'Spam', 'message': 'Hi'}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+	def test_failing_chunk_or_stalled_delivery_fails_the_broadcast(self):
+		broadcast = Broadcast.objects.create(
+			created_by=self.admin, title='Board update', message='Maize prices moved.', audience={'roles': ['farmer']}
+		)
+		with mock.patch.object(deliver_broadcast_chunk, 'delay'), self.captureOnCommitCallbacks(execute=True):
+			self.assertEqual(broadcasts.plan_broadcast(broadcast.pk, chunk_size=2), 3)
+		chunk = BroadcastChunk.objects.filter(broadcast=broadcast).first()
+
+		with mock.patch.object(broadcasts, 'deliver_chunk', side_effect=ValueError('Bad audience')):
+			self.assertTrue(deliver_broadcast_chunk.apply(args=[chunk.pk]).failed())
+		broadcast.refresh_from_db()
+		self.assertEqual((broadcast.status, broadcast.error), (Broadcast.Status.FAILED, 'Bad audience'))
+
+		Broadcast.objects.filter(pk=broadcast.pk).update(status=Broadcast.Status.RUNNING)
+		self.assertEqual(broadcasts.fail_stale_broadcasts(), 0)
+		Broadcast.objects.filter(pk=broadcast.pk).update(started_at=timezone.now() - broadcasts.BROADCAST_STALE_AFTER * 2)
+		self.assertEqual(broadcasts.fail_stale_broadcasts(), 1)
+		self.assertEqual(Broadcast.objects.get(pk=broadcast.pk).status, Broadcast.Status.FAILED)
+
+
+class _SMTPStandIn(socketserver.ThreadingTCPServer):
+	"""Minimal local SMTP server recording sessions and messages; refuses ``refused`` recipients."""
+
+	allow_reuse_address = True
+	daemon_threads = True
+
+	def __init__(self, refused=()):
+		super().__init__(('127.0.0.1', 0), _SMTPHandler)
+		self.refused = set(refused)
+		self.sessions = 0
+		self.messages = []
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+	def reply(self, line):
+		self.wfile.write(f"{line}\r\n".encode())
+
+	def handle(self):
+		self.server.sessions += 1
+		self.reply('220 stand-in ESMTP')
+		recipients = []
+		for raw in self.rfile:
+			command = raw.decode().strip()
+			verb = command.split(' ', 1)[0].upper()
+			if verb in ('EHLO', 'HELO'):
+				self.reply('250 stand-in')
+			elif verb == 'RCPT':
+				address = command.split(':', 1)[1].strip().strip('<>')
+				if address in self.server.refused:
+					self.reply('550 No such user')
+				else:
+					recipients.append(address)
+					self.reply('250 OK')
+			elif verb == 'DATA':
+				self.reply('354 End data with <CR><LF>.<CR><LF>')
+				lines = []
+				for data in self.rfile:
+					if data == b'.\r\n':
+						break
+					lines.append(data)
+				self.server.messages.append((recipients, b''.join(lines)))
+				self.reply('250 OK')
+			elif verb == 'QUIT':
+				self.reply('221 Bye')
+				return
+			else:
+				# MAIL, RSET and NOOP start over or keep the session alive.
+				recipients = [] if verb in ('MAIL', 'RSET') else recipients
+				self.reply('250 OK')
+
+
+class MailOutboxTestCase(APITestCase):
+	"""Queued email delivery in batches over shared connections."""
+
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		patcher = mock.patch.object(deliver_outbound_email, 'delay')
+		self.kick = patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def _queue(self, count, **extra):
+		with self.captureOnCommitCallbacks(execute=True):
+			return [
+				queue_email(f"user{index}@example.com", f"Subject {index}", 'Body', tag='test', **extra)
+				for index in range(count)
+			]
+
+	def test_queued_mail_is_sent_in_batches_over_one_connection_each(self):
+		self._queue(5, html_body='<p>Body</p>')
+		self.assertEqual(self.kick.call_count, 1)
+		stats = deliver_outbox(batch_size=2, rate_per_minute=60000)
+		self.assertEqual((stats['batches'], stats['connections'], stats['sent']), (3, 3, 5))
+		self.assertEqual(len(mail.outbox), 5)
+		self.assertEqual(mail.outbox[0].alternatives, [('<p>Body</p>', 'text/html')])
+		self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.Status.SENT).count(), 5)
+		self.assertEqual(deliver_outbox()['batches'], 0)
+
+		admin = get_user_model().objects.create_user(email='ops@example.com', password='Testpass123!', is_staff=True)
+		self.client.force_authenticate(admin)
+		metrics = self.client.get(reverse('mail-outbox-metrics')).data
+		self.assertEqual(metrics['queued'], 0)
+		self.assertEqual(metrics['last_24h'], {'test': {'sent': 5, 'failed': 0}})
+
+	def test_each_message_is_marked_sent_at_once_and_a_lost_lock_stops_the_run(self):
+		self._queue(3)
+		send = outbox._send_one
+
+		def send_then_lose_lock(connection, email, stats):
+			send(connection, email, stats)
+			cache.delete(outbox._WORKER_LOCK_KEY)
+
+		with mock.patch.object(outbox, '_send_one', side_effect=send_then_lose_lock):
+			self.assertEqual(deliver_outbox(rate_per_minute=60000)['sent'], 1)
+		self.assertEqual(
+			sorted(OutboundEmail.objects.values_list('status', 'attempts')),
+			[(OutboundEmail.Status.PENDING, 0), (OutboundEmail.Status.PENDING, 0), (OutboundEmail.Status.SENT, 1)],
+		)
+
+		class WorkerDied(BaseException):
+			pass
+
+		def send_once_then_die(connection, email, stats):
+			if len(mail.outbox) > 1:
+				raise WorkerDied
+			send(connection, email, stats)
+
+		with mock.patch.object(outbox, '_send_one', side_effect=send_once_then_die), self.assertRaises(WorkerDied):
+			deliver_outbox(rate_per_minute=60000)
+		self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.Status.SENT).count(), 2)
+		self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.Status.SENDING).count(), 1)
+		self.assertIsNone(cache.get(outbox._WORKER_LOCK_KEY))
+
+	def test_smtp_stand_in_session_reuse_refusals_and_retries(self):
+		server = _SMTPStandIn(refused={'user1@example.com'})
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		self.addCleanup(server.server_close)
+		self.addCleanup(server.shutdown)
+		self._queue(4)
+		smtp = {
+			'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+			'EMAIL_HOST': '127.0.0.1',
+			'EMAIL_PORT': server.server_address[1],
+			'EMAIL_HOST_USER': '',
+			'EMAIL_HOST_PASSWORD': '',
+			'EMAIL_USE_TLS': False,
+			'EMAIL_USE_SSL': False,
+			'EMAIL_TIMEOUT': 5,
+		}
+		with override_settings(**smtp):
+			stats = deliver_outbox(batch_size=10, rate_per_minute=6000)
+		self.assertEqual(server.sessions, 1)
+		self.assertEqual((stats['sent'], stats['failed']), (3, 1))
+		self.assertEqual(sorted(recipients[0] for recipients, _body in server.messages), [
+			'user0@example.com', 'user2@example.com', 'user3@example.com',
+		])
+		refused = OutboundEmail.objects.get(to=['user1@example.com'])
+		self.assertEqual(refused.status, OutboundEmail.Status.FAILED)
+		self.assertIn('SMTPRecipientsRefused', refused.last_error)
+
+		# Nothing listens on the old port once the server is gone: the message is retried later.
+		port = server.server_address[1]
+		server.shutdown()
+		server.server_close()
+		self._queue(1)
+		with override_settings(**{**smtp, 'EMAIL_PORT': port}):
+			stats = deliver_outbox(rate_per_minute=60000)
+		self.assertEqual((stats['sent'], stats['retried']), (0, 1))
+		retry = OutboundEmail.objects.get(status=OutboundEmail.Status.PENDING)
+		self.assertEqual(retry.attempts, 1)
+		self.assertGreater(retry.next_attempt_at, timezone.now())
@@ -3,11 +3,14 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import NotificationViewSet
+from .views import BroadcastViewSet, MailOutboxMetricsView, NotificationViewSet, notification_stream
 
 router = DefaultRouter()
 router.register('notifications', NotificationViewSet, basename='notification')
+router.register('broadcasts', BroadcastViewSet, basename='broadcast')
 
 urlpatterns = [
+    path('notifications/stream/', notification_stream, name='notification-stream'),
+    path('notifications/mail-outbox/', MailOutboxMetricsView.as_view(), name='mail-outbox-metrics'),
     path('', include(router.urls)),
 ]
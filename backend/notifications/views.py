@@ -1,11 +1,29 @@
 """Notification API views."""
 
-from rest_framework import permissions, status, viewsets
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
 
-from .models import Notification
-from .serializers import NotificationSerializer
+from .broadcasts import broadcast_audience, create_broadcast
+from .models import Broadcast, Notification, NotificationArchive
+from .serializers import (
+	BroadcastAudienceSerializer,
+	BroadcastSerializer,
+	NotificationArchiveSerializer,
+	NotificationBulkSerializer,
+	NotificationSerializer,
+)
+from .outbox import outbox_metrics
+from .services import delete_notifications, mark_notifications_read, unread_count
+from .streaming import SSE_TICKET_SECONDS, issue_stream_ticket, notification_events, redeem_stream_ticket
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
@@ -21,9 +39,142 @@ class NotificationViewSet(viewsets.ModelViewSet):
 	def perform_create(self, serializer):
 		serializer.save(recipient=self.request.user)
 
+	@action(detail=False, methods=['get'], url_path='unread-count')
+	def unread_count(self, request):
+		"""Unread badge count for the current user, served from a cached counter."""
+
+		return Response({'unread': unread_count(request.user.pk)})
+
+	@action(detail=False, methods=['post'], url_path='stream-ticket')
+	def stream_ticket(self, request):
+		"""Single-use ticket for opening ``/api/notifications/stream/?ticket=`` from ``EventSource``."""
+
+		return Response({'ticket': issue_stream_ticket(request.user.pk), 'expires_in': SSE_TICKET_SECONDS})
+
+	@action(detail=False, methods=['get'], url_path='archived')
+	def archived(self, request):
+		"""The caller's read notifications that passed retention and moved to the archive."""
+
+		archived = NotificationArchive.objects.filter(recipient=request.user)
+		if request.query_params.get('category'):
+			archived = archived.filter(category=request.query_params['category'])
+		page = self.paginate_queryset(archived)
+		return self.get_paginated_response(NotificationArchiveSerializer(page, many=True).data)
+
 	@action(detail=True, methods=['post'])
 	def mark_read(self, request, pk=None):
 		notification = self.get_object()
 		notification.is_read = True
 		notification.save(update_fields=['is_read'])
 		return Response({'detail': 'Notification marked as read.'}, status=status.HTTP_200_OK)
+
+	def _bulk_filters(self, request, *, require_filter: bool = False) -> dict:
+		params = NotificationBulkSerializer(data=request.data, require_filter=require_filter)
+		params.is_valid(raise_exception=True)
+		return params.validated_data
+
+	@action(detail=False, methods=['post'], url_path='mark-read')
+	def mark_many_read(self, request):
+		"""Mark the caller's notifications read by ``ids``, ``category`` and/or ``before``."""
+
+		updated = mark_notifications_read(request.user, **self._bulk_filters(request, require_filter=True))
+		return Response({'updated': updated, 'unread': unread_count(request.user.pk)})
+
+	@action(detail=False, methods=['post'], url_path='mark-all-read')
+	def mark_all_read(self, request):
+		updated = mark_notifications_read(request.user, **self._bulk_filters(request))
+		return Response({'updated': updated, 'unread': unread_count(request.user.pk)})
+
+	@action(detail=False, methods=['post'], url_path='bulk-delete')
+	def bulk_delete(self, request):
+		"""Delete the caller's notifications by ``ids``, ``category`` and/or ``before``."""
+
+		result = delete_notifications(request.user, **self._bulk_filters(request, require_filter=True))
+		return Response({**result, 'unread': unread_count(request.user.pk)})
+
+
+class IsBroadcaster(permissions.BasePermission):
+	def has_permission(self, request, view):
+		user = request.user
+		return bool(user and user.is_authenticated and (user.is_staff or user.role == user.Roles.ADMIN))
+
+
+class BroadcastViewSet(
+	mixins.CreateModelMixin,
+	mixins.ListModelMixin,
+	mixins.RetrieveModelMixin,
+	viewsets.GenericViewSet,
+):
+	"""Send one notification to a whole audience and follow its chunked delivery."""
+
+	serializer_class = BroadcastSerializer
+	permission_classes = [permissions.IsAuthenticated, IsBroadcaster]
+	queryset = Broadcast.objects.select_related('created_by')
+
+	def create(self, request, *args, **kwargs):
+		serializer = self.get_serializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+		broadcast = create_broadcast(request.user, **serializer.validated_data)
+		return Response(self.get_serializer(broadcast).data, status=status.HTTP_202_ACCEPTED)
+
+	@action(detail=False, methods=['post'], url_path='preview')
+	def preview(self, request):
+		"""Number of users an audience currently resolves to."""
+
+		audience = BroadcastAudienceSerializer(data=request.data)
+		audience.is_valid(raise_exception=True)
+		return Response({'recipients': broadcast_audience(audience.validated_data).count()})
+
+
+class MailOutboxMetricsView(APIView):
+	"""Outbound email queue depth and recent delivery counts per tag."""
+
+	permission_classes = [permissions.IsAdminUser]
+
+	def get(self, request):
+		return Response(outbox_metrics())
+
+
+async def _stream_user(request):
+	"""Authenticate with the usual bearer header, or ``?ticket=`` since ``EventSource`` cannot set headers."""
+
+	authenticator = JWTAuthentication()
+	header = authenticator.get_header(request)
+	if header is None:
+		ticket = request.GET.get('ticket')
+		user_id = await redeem_stream_ticket(ticket) if ticket else None
+		if user_id is None:
+			return None
+		return await get_user_model().objects.filter(pk=user_id, is_active=True).afirst()
+	raw_token = authenticator.get_raw_token(header)
+	if raw_token is None:
+		return None
+	try:
+		token = authenticator.get_validated_token(raw_token)
+		return await sync_to_async(authenticator.get_user)(token)
+	except (InvalidToken, AuthenticationFailed):
+		return None
+
+
+@require_GET
+async def notification_stream(request):
+	"""Server-Sent Events stream pushing the caller's new notifications as they are created.
+
+	Only served by the ASGI application: a WSGI server would buffer the whole
+	stream and hold a worker thread for its lifetime.
+	"""
+
+	if not isinstance(request, ASGIRequest):
+		return JsonResponse({'detail': 'The notification stream is only available from the ASGI server.'}, status=501)
+	user = await _stream_user(request)
+	if user is None:
+		return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+	last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+	if last_event_id is not None and not last_event_id.isdigit():
+		return JsonResponse({'last_event_id': 'Must be a notification id.'}, status=400)
+	events = notification_events(user.pk, last_event_id=int(last_event_id) if last_event_id else None)
+	response = StreamingHttpResponse(events, content_type='text/event-stream')
+	response['Cache-Control'] = 'no-cache'
+	# Stop nginx from buffering the stream.
+	response['X-Accel-Buffering'] = 'no'
+	return response
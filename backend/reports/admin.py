@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import ReportJob
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+	list_display = ('kind', 'owner', 'status', 'row_count', 'size_bytes', 'created_at', 'expires_at')
+	list_filter = ('kind', 'status')
+	search_fields = ('owner__email', 'params_hash')
+	readonly_fields = ('params_hash', 'started_at', 'finished_at')
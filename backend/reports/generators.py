@@ -0,0 +1,152 @@
+"""Report kinds that can be generated in the background.
+
+Each kind validates its parameters with a serializer and writes its rows
+into a text stream, reading querysets with ``iterator()`` so exports of any
+size run in constant memory inside the worker.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from dataclasses import dataclass
+from typing import Callable, TextIO
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework import serializers
+
+from analytics.serializers import MetricSummaryQuerySerializer
+from analytics.services import farm_metric_summary, metric_distribution
+from farms.models import Activity, Farm
+from inventory.models import InventoryItem, InventoryTransaction
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+@dataclass(frozen=True)
+class ReportDefinition:
+    extension: str
+    content_type: str
+    parameters: type[serializers.Serializer]
+    write: Callable[[object, dict, TextIO], int]
+
+
+class FarmParameters(serializers.Serializer):
+    farm = serializers.IntegerField(required=False, min_value=1)
+
+    def validate_farm(self, value):
+        user = self.context['user']
+        farms = Farm.objects.filter(pk=value)
+        if not user.is_staff:
+            farms = farms.filter(owner=user)
+        if not farms.exists():
+            raise serializers.ValidationError('Unknown farm.')
+        return value
+
+
+class FarmActivitiesParameters(FarmParameters):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+
+class MetricSummaryParameters(MetricSummaryQuerySerializer):
+    def validate_percentiles(self, value):
+        # Stored back as text so the job parameters stay valid query input.
+        return ','.join(str(fraction) for fraction in super().validate_percentiles(value))
+
+
+def _farm_activities(user, params: dict, stream: TextIO) -> int:
+    activities = Activity.objects.select_related('field__farm', 'performed_by').order_by(
+        'field__farm_id', 'field__field_name', 'date', 'id'
+    )
+    if not user.is_staff:
+        activities = activities.filter(field__farm__owner=user)
+    if params.get('farm'):
+        activities = activities.filter(field__farm_id=params['farm'])
+    if params.get('start'):
+        activities = activities.filter(date__gte=params['start'])
+    if params.get('end'):
+        activities = activities.filter(date__lte=params['end'])
+
+    writer = csv.writer(stream)
+    writer.writerow(['Farm', 'Field Name', 'Activity Type', 'Date', 'Quantity', 'Unit', 'Cost', 'Performed By'])
+    count = 0
+    for activity in activities.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        writer.writerow([
+            activity.field.farm.name,
+            activity.field.field_name,
+            activity.get_activity_type_display(),
+            activity.date,
+            activity.quantity,
+            activity.unit,
+            activity.cost,
+            activity.performed_by.email if activity.performed_by else '',
+        ])
+        count += 1
+    return count
+
+
+INVENTORY_ITEM_COLUMNS = (
+    'id', 'farm', 'category', 'name', 'description', 'quantity', 'unit',
+    'minimum_stock_level', 'purchase_price', 'selling_price', 'expiry_date',
+    'storage_location', 'supplier_info', 'last_audited', 'created_at', 'updated_at',
+)
+
+
+def _inventory_items(user, params: dict, stream: TextIO) -> int:
+    items = InventoryItem.objects.order_by('farm_id', 'name', 'id')
+    if not user.is_staff:
+        items = items.filter(owner=user)
+    if params.get('farm'):
+        items = items.filter(farm_id=params['farm'])
+
+    writer = csv.writer(stream)
+    writer.writerow(INVENTORY_ITEM_COLUMNS)
+    columns = ['farm_id' if column == 'farm' else column for column in INVENTORY_ITEM_COLUMNS]
+    count = 0
+    for row in items.values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def _inventory_transactions(user, params: dict, stream: TextIO) -> int:
+    transactions = InventoryTransaction.objects.order_by('transaction_date', 'id')
+    if not user.is_staff:
+        transactions = transactions.filter(item__owner=user)
+    if params.get('farm'):
+        transactions = transactions.filter(item__farm_id=params['farm'])
+
+    writer = csv.writer(stream)
+    writer.writerow([
+        'id', 'transaction_date', 'farm', 'item', 'item_name', 'unit', 'transaction_type',
+        'quantity_change', 'previous_quantity', 'new_quantity', 'related_activity', 'related_listing', 'notes',
+    ])
+    count = 0
+    rows = transactions.values_list(
+        'id', 'transaction_date', 'item__farm_id', 'item_id', 'item__name', 'item__unit', 'transaction_type',
+        'quantity_change', 'previous_quantity', 'new_quantity', 'related_activity_id', 'related_listing_id', 'notes',
+    )
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def _metric_summary(user, params: dict, stream: TextIO) -> int:
+    query = MetricSummaryQuerySerializer(data=params)
+    query.is_valid(raise_exception=True)
+    if query.wants_distribution:
+        rows = metric_distribution(user=user, **query.validated_data)
+    else:
+        rows = farm_metric_summary(user, query.validated_data.get('metric_type'))
+    json.dump(rows, stream, cls=DjangoJSONEncoder)
+    return len(rows)
+
+
+REPORTS: dict[str, ReportDefinition] = {
+    'farm_activities': ReportDefinition('csv', 'text/csv', FarmActivitiesParameters, _farm_activities),
+    'inventory_items': ReportDefinition('csv', 'text/csv', FarmParameters, _inventory_items),
+    'inventory_transactions': ReportDefinition('csv', 'text/csv', FarmParameters, _inventory_transactions),
+    'metric_summary': ReportDefinition('json', 'application/json', MetricSummaryParameters, _metric_summary),
+}
@@ -0,0 +1,54 @@
+"""Report job models."""
+
+from django.conf import settings
+from django.db import models
+
+
+class ReportJob(models.Model):
+	"""Report generated in the background and stored gzip-compressed in media storage.
+
+	``params_hash`` fingerprints the kind and normalised parameters so an
+	identical request from the same owner reuses a queued, running or
+	unexpired job instead of generating the file again.
+	"""
+
+	class Status(models.TextChoices):
+		PENDING = 'pending', 'Pending'
+		RUNNING = 'running', 'Running'
+		SUCCEEDED = 'succeeded', 'Succeeded'
+		FAILED = 'failed', 'Failed'
+
+	owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='report_jobs')
+	kind = models.CharField(max_length=50)
+	parameters = models.JSONField(default=dict, blank=True)
+	params_hash = models.CharField(max_length=64)
+	status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+	result = models.FileField(upload_to='reports/%Y/%m/', blank=True)
+	row_count = models.PositiveIntegerField(null=True, blank=True)
+	size_bytes = models.PositiveBigIntegerField(null=True, blank=True)
+	error = models.TextField(blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+	expires_at = models.DateTimeField()
+
+	class Meta:
+		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['owner', 'kind', 'params_hash', '-created_at'], name='report_job_dedupe_idx'),
+			models.Index(fields=['expires_at'], name='report_job_expiry_idx'),
+		]
+		constraints = [
+			models.UniqueConstraint(
+				fields=['owner', 'kind', 'params_hash'],
+				name='report_job_in_flight_unique',
+				condition=models.Q(status__in=['pending', 'running']),
+			),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.kind} #{self.pk} ({self.status})"
+
+	@property
+	def is_ready(self) -> bool:
+		return self.status == self.Status.SUCCEEDED and bool(self.result)
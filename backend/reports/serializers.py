@@ -0,0 +1,49 @@
+"""Report job serializers."""
+
+from django.urls import reverse
+from rest_framework import serializers
+
+from .generators import REPORTS
+from .models import ReportJob
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    kind = serializers.ChoiceField(choices=tuple(REPORTS))
+    parameters = serializers.DictField(required=False, default=dict)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = (
+            'id',
+            'kind',
+            'parameters',
+            'status',
+            'row_count',
+            'size_bytes',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+            'expires_at',
+            'download_url',
+        )
+        read_only_fields = (
+            'id',
+            'status',
+            'row_count',
+            'size_bytes',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+            'expires_at',
+            'download_url',
+        )
+
+    def get_download_url(self, obj):
+        if not obj.is_ready:
+            return None
+        url = reverse('report-job-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,168 @@
+"""Report job services: deduplicated enqueueing, generation and expiry."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import json
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .generators import REPORTS
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+REPORT_RESULT_TTL = timedelta(hours=6)
+REPORT_PURGE_BATCH_SIZE = 500
+# Longer than the worker's time limit on ``run_report_job``, so a job still
+# pending or running after this was lost with its worker (or its queue message).
+REPORT_STALE_AFTER = timedelta(minutes=30)
+
+
+def _normalise(kind: str, parameters: dict, user) -> dict:
+    """Validate ``parameters`` for ``kind`` and return them as canonical JSON data."""
+
+    if kind not in REPORTS:
+        raise ValueError(f"Unknown report kind; choose from {', '.join(REPORTS)}.")
+    serializer = REPORTS[kind].parameters(data=parameters, context={'user': user})
+    serializer.is_valid(raise_exception=True)
+    return json.loads(json.dumps(serializer.validated_data, cls=DjangoJSONEncoder))
+
+
+def parameters_hash(kind: str, parameters: dict) -> str:
+    payload = json.dumps({'kind': kind, 'parameters': parameters}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def fail_stale_reports(jobs=None) -> int:
+    """Mark pending or running jobs that no worker will finish as failed; returns how many.
+
+    Failing them releases the in-flight constraint, so an identical request
+    queues a fresh job instead of waiting on one that never completes.
+    """
+
+    now = timezone.now()
+    cutoff = now - REPORT_STALE_AFTER
+    jobs = ReportJob.objects.all() if jobs is None else jobs
+    return jobs.filter(
+        Q(status=ReportJob.Status.PENDING, created_at__lt=cutoff)
+        | Q(status=ReportJob.Status.RUNNING, started_at__lt=cutoff)
+        | Q(status__in=[ReportJob.Status.PENDING, ReportJob.Status.RUNNING], expires_at__lte=now)
+    ).update(status=ReportJob.Status.FAILED, error='The report worker stopped before finishing.', finished_at=now)
+
+
+def _reusable(user, kind: str, params_hash: str) -> ReportJob | None:
+    fail_stale_reports(ReportJob.objects.filter(owner=user, kind=kind, params_hash=params_hash))
+    return (
+        ReportJob.objects.filter(
+            owner=user,
+            kind=kind,
+            params_hash=params_hash,
+            status__in=[ReportJob.Status.PENDING, ReportJob.Status.RUNNING, ReportJob.Status.SUCCEEDED],
+            expires_at__gt=timezone.now(),
+        )
+        .order_by('-created_at')
+        .first()
+    )
+
+
+def enqueue_report(user, kind: str, parameters: dict | None = None) -> tuple[ReportJob, bool]:
+    """Queue a report for ``user`` or reuse an identical queued, running or unexpired one.
+
+    Returns ``(job, created)``. Parameter errors surface as DRF validation
+    errors, unknown kinds as ``ValueError``.
+    """
+
+    from .tasks import run_report_job
+
+    parameters = _normalise(kind, parameters or {}, user)
+    params_hash = parameters_hash(kind, parameters)
+    for attempt in range(2):
+        existing = _reusable(user, kind, params_hash)
+        if existing is not None:
+            return existing, False
+        try:
+            with transaction.atomic():
+                job = ReportJob.objects.create(
+                    owner=user,
+                    kind=kind,
+                    parameters=parameters,
+                    params_hash=params_hash,
+                    expires_at=timezone.now() + REPORT_RESULT_TTL,
+                )
+            break
+        except IntegrityError:
+            # An identical request was queued concurrently, or a stale job held the
+            # in-flight constraint; the next pass reuses the former or fails the latter.
+            if attempt:
+                raise
+    transaction.on_commit(lambda: run_report_job.delay(job.pk))
+    return job, True
+
+
+def run_report(job_id: int) -> ReportJob | None:
+    """Generate a pending job into a gzip file in media storage.
+
+    The report is written through ``gzip`` into a temporary file, so memory
+    use does not grow with the report size, then handed to the storage backend.
+    """
+
+    with transaction.atomic():
+        job = ReportJob.objects.select_for_update().select_related('owner').filter(pk=job_id).first()
+        if job is None or job.status != ReportJob.Status.PENDING:
+            return job
+        job.status = ReportJob.Status.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+
+    definition = REPORTS[job.kind]
+    try:
+        parameters = definition.parameters(data=job.parameters, context={'user': job.owner})
+        parameters.is_valid(raise_exception=True)
+        with tempfile.TemporaryFile() as spool:
+            with gzip.GzipFile(fileobj=spool, mode='wb') as compressed:
+                with io.TextIOWrapper(compressed, encoding='utf-8', newline='') as stream:
+                    row_count = definition.write(job.owner, parameters.validated_data, stream)
+            size = spool.tell()
+            spool.seek(0)
+            name = f"{job.kind}-{job.pk}-{job.params_hash[:12]}.{definition.extension}.gz"
+            job.result.save(name, File(spool), save=False)
+    except Exception as exc:
+        logger.exception('Report job %s failed', job.pk)
+        job.status = ReportJob.Status.FAILED
+        job.error = str(exc)[:2000]
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        return job
+
+    job.status = ReportJob.Status.SUCCEEDED
+    job.row_count = row_count
+    job.size_bytes = size
+    job.finished_at = timezone.now()
+    job.expires_at = job.finished_at + REPORT_RESULT_TTL
+    job.save(update_fields=['status', 'result', 'row_count', 'size_bytes', 'finished_at', 'expires_at'])
+    return job
+
+
+def purge_expired_reports(batch_size: int = REPORT_PURGE_BATCH_SIZE) -> int:
+    """Delete expired jobs and their stored files; returns the number of jobs removed."""
+
+    removed = 0
+    while True:
+        jobs = list(ReportJob.objects.filter(expires_at__lte=timezone.now()).order_by('expires_at')[:batch_size])
+        if not jobs:
+            return removed
+        for job in jobs:
+            if job.result:
+                job.result.delete(save=False)
+        ReportJob.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+        removed += len(jobs)
@@ -0,0 +1,38 @@
+"""Celery tasks for background reports."""
+
+from __future__ import annotations
+
+from celery import shared_task
+
+
+# Kept below ``REPORT_STALE_AFTER`` so a job is only swept as stale once its
+# worker can no longer be writing it; the soft limit fails the job cleanly.
+REPORT_JOB_SOFT_TIME_LIMIT = 25 * 60
+
+
+@shared_task(soft_time_limit=REPORT_JOB_SOFT_TIME_LIMIT, time_limit=REPORT_JOB_SOFT_TIME_LIMIT + 60)
+def run_report_job(job_id: int) -> str | None:
+    """Generate one queued report and store its compressed result."""
+
+    from .services import run_report
+
+    job = run_report(job_id)
+    return job.status if job else None
+
+
+@shared_task
+def purge_expired_report_jobs() -> int:
+    """Remove report jobs past their TTL together with their files."""
+
+    from .services import purge_expired_reports
+
+    return purge_expired_reports()
+
+
+@shared_task
+def fail_stale_report_jobs() -> int:
+    """Fail report jobs left pending or running by a crashed worker."""
+
+    from .services import fail_stale_reports
+
+    return fail_stale_reports()
@@ -0,0 +1,153 @@
+"""Report job tests."""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from farms.models import Farm
+from inventory.models import InventoryItem
+
+from .models import ReportJob
+from .services import REPORT_STALE_AFTER, fail_stale_reports, purge_expired_reports
+from .tasks import run_report_job
+
+
+class ReportJobTestCase(APITestCase):
+	"""Queue, poll, download and expire background reports."""
+
+	def setUp(self):
+		self.temp_media = tempfile.mkdtemp()
+		self.addCleanup(lambda: shutil.rmtree(self.temp_media, ignore_errors=True))
+		self.override = override_settings(MEDIA_ROOT=self.temp_media)
+		self.override.enable()
+		self.addCleanup(self.override.disable)
+		User = get_user_model()
+		self.owner = User.objects.create_user(email='report-owner@example.com', password='Testpass123!')
+		self.other = User.objects.create_user(email='report-other@example.com', password='Testpass123!')
+		self.farm = Farm.objects.create(owner=self.owner, name='Report farm', location='Nyeri', total_area=Decimal('4.00'))
+		self.other_farm = Farm.objects.create(owner=self.other, name='Other farm', location='Meru', total_area=Decimal('2.00'))
+		InventoryItem.objects.create(
+			farm=self.farm, owner=self.owner, category=InventoryItem.Category.SEEDS, name='Maize seed', quantity=Decimal('40.00')
+		)
+		InventoryItem.objects.create(
+			farm=self.other_farm, owner=self.other, category=InventoryItem.Category.SEEDS, name='Bean seed', quantity=Decimal('9.00')
+		)
+		self.url = reverse('report-job-list')
+		self.client.force_authenticate(self.owner)
+
+	def _enqueue(self, payload):
+		with mock.patch.object(run_report_job, 'delay', side_effect=run_report_job) as delay:
+			with self.captureOnCommitCallbacks(execute=True):
+				response = self.client.post(self.url, payload, format='json')
+		return response, delay
+
+	def test_report_is_generated_compressed_and_downloadable(self):
+		response, delay = self._enqueue({'kind': 'inventory_items'})
+		self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+		self.assertFalse(response.data['reused'])
+		delay.assert_called_once()
+
+		detail = self.client.get(reverse('report-job-detail', args=[response.data['id']]))
+		self.assertEqual(detail.data['status'], ReportJob.Status.SUCCEEDED)
+		self.assertEqual(detail.data['row_count'], 1)
+		self.assertTrue(detail.data['download_url'].endswith(reverse('report-job-download', args=[response.data['id']])))
+
+		download = self.client.get(reverse('report-job-download', args=[response.data['id']]))
+		self.assertEqual(download.status_code, status.HTTP_200_OK)
+		self.assertEqual(download['Content-Type'], 'application/gzip')
+		rows = list(csv.reader(io.StringIO(gzip.decompress(b''.join(download.streaming_content)).decode())))
+		self.assertEqual(rows[0][:4], ['id', 'farm', 'category', 'name'])
+		self.assertEqual([row[3] for row in rows[1:]], ['Maize seed'])
+
+	def test_identical_requests_reuse_the_job_until_it_expires(self):
+		first, _ = self._enqueue({'kind': 'farm_activities', 'parameters': {'farm': self.farm.pk, 'start': '2025-01-01'}})
+		second, delay = self._enqueue({'kind': 'farm_activities', 'parameters': {'start': '2025-01-01', 'farm': self.farm.pk}})
+		self.assertEqual(second.data['id'], first.data['id'])
+		self.assertTrue(second.data['reused'])
+		delay.assert_not_called()
+
+		ReportJob.objects.filter(pk=first.data['id']).update(expires_at=timezone.now() - timedelta(seconds=1))
+		third, delay = self._enqueue({'kind': 'farm_activities', 'parameters': {'farm': self.farm.pk, 'start': '2025-01-01'}})
+		self.assertNotEqual(third.data['id'], first.data['id'])
+		delay.assert_called_once()
+
+	def test_parameters_are_validated_and_jobs_are_private(self):
+		response, _ = self._enqueue({'kind': 'farm_activities', 'parameters': {'farm': self.other_farm.pk}})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertIn('parameters', response.data)
+		response, _ = self._enqueue({'kind': 'payroll'})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+		response, _ = self._enqueue({'kind': 'inventory_transactions'})
+		self.client.force_authenticate(self.other)
+		self.assertEqual(
+			self.client.get(reverse('report-job-detail', args=[response.data['id']])).status_code,
+			status.HTTP_404_NOT_FOUND,
+		)
+
+	def test_inventory_reports_reject_another_owners_farm(self):
+		for kind in ('inventory_items', 'inventory_transactions'):
+			response, delay = self._enqueue({'kind': kind, 'parameters': {'farm': self.other_farm.pk}})
+			self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+			self.assertIn('parameters', response.data)
+			delay.assert_not_called()
+
+	def test_jobs_left_by_a_crashed_worker_are_failed_and_requeued(self):
+		with mock.patch.object(run_report_job, 'delay'):
+			with self.captureOnCommitCallbacks(execute=True):
+				stuck = self.client.post(self.url, {'kind': 'inventory_items'}, format='json')
+		ReportJob.objects.filter(pk=stuck.data['id']).update(
+			status=ReportJob.Status.RUNNING, started_at=timezone.now() - REPORT_STALE_AFTER - timedelta(minutes=1)
+		)
+
+		response, delay = self._enqueue({'kind': 'inventory_items'})
+		self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+		self.assertNotEqual(response.data['id'], stuck.data['id'])
+		delay.assert_called_once()
+		self.assertEqual(ReportJob.objects.get(pk=stuck.data['id']).status, ReportJob.Status.FAILED)
+		self.assertEqual(ReportJob.objects.get(pk=response.data['id']).status, ReportJob.Status.SUCCEEDED)
+
+	def test_sweep_fails_only_stale_jobs(self):
+		def job(params_hash, **fields):
+			return ReportJob.objects.create(
+				owner=self.owner, kind='inventory_items', params_hash=params_hash,
+				expires_at=timezone.now() + timedelta(hours=1), **fields,
+			)
+
+		fresh = job('fresh', status=ReportJob.Status.RUNNING, started_at=timezone.now())
+		running = job('running', status=ReportJob.Status.RUNNING, started_at=timezone.now() - REPORT_STALE_AFTER * 2)
+		pending = job('pending')
+		ReportJob.objects.filter(pk=pending.pk).update(created_at=timezone.now() - REPORT_STALE_AFTER * 2)
+
+		self.assertEqual(fail_stale_reports(), 2)
+		statuses = dict(ReportJob.objects.values_list('pk', 'status'))
+		self.assertEqual(statuses[fresh.pk], ReportJob.Status.RUNNING)
+		self.assertEqual(statuses[running.pk], ReportJob.Status.FAILED)
+		self.assertEqual(statuses[pending.pk], ReportJob.Status.FAILED)
+
+	def test_purge_removes_expired_jobs_and_files(self):
+		response, _ = self._enqueue({'kind': 'metric_summary'})
+		job = ReportJob.objects.get(pk=response.data['id'])
+		self.assertEqual(job.status, ReportJob.Status.SUCCEEDED)
+		storage, name = job.result.storage, job.result.name
+		self.assertTrue(storage.exists(name))
+
+		self.assertEqual(purge_expired_reports(), 0)
+		ReportJob.objects.filter(pk=job.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+		self.assertEqual(purge_expired_reports(), 1)
+		self.assertFalse(storage.exists(name))
+		self.assertFalse(ReportJob.objects.exists())
@@ -0,0 +1,13 @@
+"""Report job routes."""
+
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from .views import ReportJobViewSet
+
+router = DefaultRouter()
+router.register('reports', ReportJobViewSet, basename='report-job')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -0,0 +1,54 @@
+"""Report job API views."""
+
+from django.http import FileResponse
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .generators import REPORTS
+from .models import ReportJob
+from .serializers import ReportJobSerializer
+from .services import enqueue_report
+
+
+class ReportJobViewSet(
+	mixins.CreateModelMixin,
+	mixins.ListModelMixin,
+	mixins.RetrieveModelMixin,
+	viewsets.GenericViewSet,
+):
+	"""Queue background reports, poll their status and download the stored result."""
+
+	serializer_class = ReportJobSerializer
+	permission_classes = [permissions.IsAuthenticated]
+
+	def get_queryset(self):
+		return ReportJob.objects.filter(owner=self.request.user)
+
+	def create(self, request, *args, **kwargs):
+		serializer = self.get_serializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+		try:
+			job, created = enqueue_report(request.user, serializer.validated_data['kind'], serializer.validated_data['parameters'])
+		except ValueError as exc:
+			raise ValidationError({'kind': str(exc)})
+		except ValidationError as exc:
+			raise ValidationError({'parameters': exc.detail})
+		data = self.get_serializer(job).data
+		return Response({**data, 'reused': not created}, status=status.HTTP_202_ACCEPTED)
+
+	@action(detail=True, methods=['get'], url_path='download')
+	def download(self, request, pk=None):
+		"""Stream the gzip-compressed result of a finished report."""
+
+		job = self.get_object()
+		if not job.is_ready:
+			return Response({'detail': f"Report is {job.status}."}, status=status.HTTP_409_CONFLICT)
+		definition = REPORTS[job.kind]
+		return FileResponse(
+			job.result.open('rb'),
+			as_attachment=True,
+			filename=f"{job.kind}-{job.pk}.{definition.extension}.gz",
+			content_type='application/gzip',
+		)